@@ -2,7 +2,7 @@ from flask import Flask
 from app.config import AppConfig
 from app.routes import routes_bp
 import threading
-from app.utils import background_scheduler
+from app.utils import background_scheduler, warm_systems
 
 def create_app():
     app = Flask(__name__,instance_relative_config=True,template_folder='templates', static_folder='static')
@@ -14,8 +14,12 @@ def create_app():
     # Register Blueprints
     app.register_blueprint(routes_bp)
 
+    # Load the catalogs before the first requests ask for them
+    if app_config.warmup_on_start:
+        threading.Thread(target=warm_systems, args=(app,), daemon=True, name="modscout-warmup").start()
+
     # Schedule the auto update in background
     if app_config.auto_update_database == True:
-        scheduler_thread = threading.Thread(target=background_scheduler, daemon=True)
+        scheduler_thread = threading.Thread(target=background_scheduler, args=(app,), daemon=True)
         scheduler_thread.start()
     return app
\ No newline at end of file
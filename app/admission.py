@@ -0,0 +1,81 @@
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import Future
+from typing import Iterator, Optional
+
+
+class Rejected(Exception):
+    """A request turned away by an `AdmissionGate`, with the HTTP status to answer."""
+
+    def __init__(self, status: int, reason: str, message: str, retry_after: int):
+        super().__init__(message)
+        self.status: int = status
+        self.reason: str = reason
+        self.retry_after: int = retry_after
+
+
+class Admission:
+    """A slot of an `AdmissionGate`, held for the `with` block of `admit`."""
+
+    def __init__(self, waited: float):
+        self.waited: float = waited
+        self.held_by: Optional[Future] = None
+
+    def hold_until(self, future: Future):
+        """Keep the slot after the block until `future` is done, e.g. a search still running in a pool process."""
+        self.held_by = future
+
+
+class AdmissionGate:
+    """Caps how many requests of an expensive path run at once in a worker.
+
+    At most `limit` requests run; up to `max_queue` more wait for a slot, in
+    arrival order as far as the condition variable goes. A request finding the
+    queue full is rejected at once with 429, one still waiting after
+    `queue_timeout` seconds with 503. Cheap requests never pass the gate, so
+    they are not held up by a backlog of expensive ones. Work handed to a
+    pool that outlives its request can keep the slot (`Admission.hold_until`),
+    so the gate never admits more than the pool can run.
+    """
+
+    def __init__(self, limit: int, max_queue: int, queue_timeout: float):
+        self.limit: int = max(1, limit)
+        self.max_queue: int = max(0, max_queue)
+        self.queue_timeout: float = queue_timeout
+        self.running: int = 0
+        self.waiting: int = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def admit(self) -> Iterator[Admission]:
+        """Hold a slot for the body of the `with` block; yields it with the seconds spent waiting."""
+        started = time.perf_counter()
+        with self._cond:
+            if self.running >= self.limit:
+                if self.waiting >= self.max_queue:
+                    raise Rejected(429, "queue_full", "Too many concurrent requests, retry shortly", 1)
+                self.waiting += 1
+                try:
+                    admitted = self._cond.wait_for(lambda: self.running < self.limit, self.queue_timeout)
+                finally:
+                    self.waiting -= 1
+                if not admitted:
+                    raise Rejected(
+                        503, "queue_timeout", "Server busy, no slot freed up in time", max(1, int(self.queue_timeout))
+                    )
+            self.running += 1
+        admission = Admission(time.perf_counter() - started)
+        try:
+            yield admission
+        finally:
+            if admission.held_by is not None:
+                # Called at once if the future is already done
+                admission.held_by.add_done_callback(lambda _: self._release())
+            else:
+                self._release()
+
+    def _release(self):
+        with self._cond:
+            self.running -= 1
+            self._cond.notify()
@@ -0,0 +1,89 @@
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.catalog import CatalogSnapshot
+from app.suggestion_engine import version_key, version_matches
+
+
+class AvailabilityIndex:
+    """Global index of where each package can be loaded, across all systems.
+
+    For every system it keeps the catalog rows of each package (by lower-cased
+    name), and for every package the set of systems providing it. A system's
+    part is replaced whenever its catalog is republished, as the index is
+    registered as catalog cache listener. A lookup touches only the systems
+    that have the package, so it costs about as much as one single-system
+    lookup.
+    """
+
+    def __init__(self):
+        # system -> (snapshot, {package: rows})
+        self._systems: Dict[str, Tuple[CatalogSnapshot, Dict[str, List[int]]]] = {}
+        self._package_systems: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def update(self, system: str, snapshot: CatalogSnapshot):
+        previous = self._systems.get(system)
+        if previous is not None and previous[0].signature == snapshot.signature:
+            return
+        catalog = snapshot.data
+        record_packages = [record.package.strip().lower() for record in catalog.records]
+        packages: Dict[str, List[int]] = {}
+        for row, record in enumerate(catalog.row_record):
+            packages.setdefault(record_packages[record], []).append(row)
+
+        with self._lock:
+            previous = self._systems.get(system)
+            for package in previous[1] if previous is not None else ():
+                systems = self._package_systems[package]
+                systems.discard(system)
+                if not systems:
+                    del self._package_systems[package]
+            for package in packages:
+                self._package_systems.setdefault(package, set()).add(system)
+            self._systems[system] = (snapshot, packages)
+
+    def lookup(self, package: str, version: Optional[str] = None) -> List[Dict]:
+        """Availability matrix of `package` (optionally one version or version prefix).
+
+        One entry per package/version, newest first, mapping every system that
+        has it to the release/compiler chains it can be loaded in.
+        """
+        package = package.strip().lower()
+        wanted = version.strip().lower() if version else None
+        with self._lock:
+            sources = [
+                (system, *self._systems[system])
+                for system in sorted(self._package_systems.get(package, ()))
+            ]
+
+        matrix: Dict[Tuple[str, str], Dict] = {}
+        for system, snapshot, packages in sources:
+            catalog = snapshot.data
+            seen = set()
+            for row in packages.get(package, ()):
+                entry = catalog.entry(row)
+                if not version_matches(entry.get("version", ""), wanted):
+                    continue
+                placement_key = (entry.get("name"), entry.get("release"), entry.get("compiler"))
+                if placement_key in seen:
+                    continue
+                seen.add(placement_key)
+                item = matrix.setdefault(
+                    (entry.get("package", ""), entry.get("version", "")),
+                    {
+                        "package": entry.get("package", ""),
+                        "version": entry.get("version", ""),
+                        "name": entry.get("name", ""),
+                        "systems": {},
+                    },
+                )
+                placement = {
+                    "release": entry.get("release", ""),
+                    "compiler": entry.get("compiler", ""),
+                    "load_cmd": entry.get("load_cmd", ""),
+                }
+                if entry.get("is_extension"):
+                    placement["extension_of"] = entry.get("parent", "")
+                item["systems"].setdefault(system, []).append(placement)
+        return sorted(matrix.values(), key=lambda item: version_key(item["version"]), reverse=True)
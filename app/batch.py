@@ -0,0 +1,62 @@
+import json
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+# One batch item: (system, dedup key, arguments) or an error message
+BatchItem = Tuple[Optional[str], Optional[Hashable], Any, Optional[str]]
+
+
+def item_error(message: str) -> BatchItem:
+    return None, None, None, message
+
+
+def run_batch(
+    app,
+    items: List[BatchItem],
+    snapshot_of: Callable[[str], Any],
+    compute: Callable[[str, Any, Any], bytes],
+    pool: Optional[Executor] = None,
+    workers: int = 1,
+    parallel_min: int = 0,
+) -> bytes:
+    """Answer every item of a batch and return `{"results": [...]}` in item order.
+
+    Each system's snapshot is looked up once, so all items of a system are
+    answered from the same catalog version. Items with equal (system, key)
+    are computed once. `compute(system, snapshot, args)` returns the JSON
+    body of one item; with a pool and at least `parallel_min` distinct items
+    the work is split into `workers` chunks run on the pool.
+    """
+    snapshots: Dict[str, Any] = {}
+    unique: Dict[Tuple[str, Hashable], Any] = {}
+    for system, key, args, error in items:
+        if error is None:
+            if system not in snapshots:
+                snapshots[system] = snapshot_of(system)
+            unique.setdefault((system, key), args)
+
+    def answer(chunk: List[Tuple[Tuple[str, Hashable], Any]]) -> List[bytes]:
+        with app.app_context():
+            return [_result(compute, system, snapshots[system], args) for (system, _), args in chunk]
+
+    work = list(unique.items())
+    if pool is not None and workers > 1 and len(work) >= max(parallel_min, 2):
+        size = -(-len(work) // workers)
+        chunks = [work[i : i + size] for i in range(0, len(work), size)]
+        bodies = [body for chunk_bodies in pool.map(answer, chunks) for body in chunk_bodies]
+    else:
+        bodies = answer(work)
+    answers = {key: body for (key, _), body in zip(work, bodies)}
+
+    parts = [
+        answers[(system, key)] if error is None else json.dumps({"error": error}).encode()
+        for system, key, _, error in items
+    ]
+    return b'{"results":[' + b",".join(parts) + b"]}"
+
+
+def _result(compute: Callable[[str, Any, Any], bytes], system: str, snapshot: Any, args: Any) -> bytes:
+    try:
+        return b'{"result":' + compute(system, snapshot, args).strip() + b"}"
+    except Exception as e:
+        return json.dumps({"error": str(e)}).encode()
@@ -0,0 +1,577 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app import jsonio
+from app.metrics import Metrics
+from app.publish import BINARY_SUFFIX, current_path, version_of
+
+# Resolved path of the published file, its mtime (ns) and size
+Signature = Tuple[str, int, int]
+
+IS_EXTENSION = 1
+
+# Binary catalog: magic, byte order check, then the section sizes, see `write_binary`
+BINARY_MAGIC = b"MSCAT\x00\x01\x00"
+BINARY_HEADER = struct.Struct("=8s7I")
+BYTE_ORDER_CHECK = 0x01020304
+RECORD_FIELDS = 5
+
+
+class ModuleRecord:
+    """Fields shared by every placement of one package/version."""
+
+    __slots__ = ("package", "version", "name", "description", "url")
+
+    def __init__(self, package: str, version: str, name: str, description: str, url: str):
+        self.package = package
+        self.version = version
+        self.name = name
+        self.description = description
+        self.url = url
+
+
+class CompactCatalog(Mapping):
+    """Interned, array-backed form of a processed module tree.
+
+    Every module placement is a row in parallel arrays holding the release,
+    compiler, record and parent ids plus a flag byte. Descriptions and URLs live
+    once per record, however many compiler chains a module is visible under.
+    The catalog behaves like the read-only nested `{release: {compiler: [...]}}`
+    tree; the module dicts are only built when a bucket is accessed.
+    """
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self._string_ids: Dict[str, int] = {}
+        self.records: List[ModuleRecord] = []
+        self._record_ids: Dict[Tuple[str, str, str, str, str], int] = {}
+
+        self.row_release = array("I")
+        self.row_compiler = array("I")
+        self.row_record = array("I")
+        self.row_parent = array("i")
+        self.row_flags = array("B")
+        # Rows whose dict does not follow the shape written by process_data
+        self.row_overrides: Dict[int, Dict] = {}
+
+        self._buckets: Dict[str, Dict[str, Tuple[int, int]]] = {}
+
+    def _string(self, value: str) -> int:
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = self._string_ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+    def _record(self, mod: Dict) -> int:
+        key = (
+            mod.get("package", ""),
+            mod.get("version", ""),
+            mod.get("name", ""),
+            mod.get("description", ""),
+            mod.get("url", ""),
+        )
+        record_id = self._record_ids.get(key)
+        if record_id is None:
+            record_id = self._record_ids[key] = len(self.records)
+            self.records.append(ModuleRecord(*key))
+        return record_id
+
+    @classmethod
+    def from_tree(cls, tree: Dict) -> "CompactCatalog":
+        catalog = cls()
+        for release, compilers in tree.items():
+            release_id = catalog._string(release)
+            catalog._buckets[release] = {}
+            for compiler, modules in compilers.items():
+                compiler_id = catalog._string(compiler)
+                start = len(catalog.row_record)
+                for mod in modules:
+                    row = len(catalog.row_record)
+                    catalog.row_release.append(release_id)
+                    catalog.row_compiler.append(compiler_id)
+                    catalog.row_record.append(catalog._record(mod))
+                    parent = mod.get("parent")
+                    catalog.row_parent.append(-1 if parent is None else catalog._string(parent))
+                    catalog.row_flags.append(IS_EXTENSION if mod.get("is_extension") else 0)
+                    if catalog.entry(row) != mod:
+                        catalog.row_overrides[row] = mod
+                catalog._buckets[release][compiler] = (start, len(catalog.row_record))
+        # Lookup tables are only needed while building
+        catalog._record_ids = {}
+        return catalog
+
+    def string_id(self, value: str) -> Optional[int]:
+        return self._string_ids.get(value)
+
+    @property
+    def row_count(self) -> int:
+        return len(self.row_record)
+
+    def rows(self, release: str, compiler: str) -> range:
+        start, stop = self._buckets[release][compiler]
+        return range(start, stop)
+
+    def buckets(self) -> Iterator[Tuple[str, str, range]]:
+        for release, compilers in self._buckets.items():
+            for compiler, (start, stop) in compilers.items():
+                yield release, compiler, range(start, stop)
+
+    def row_key(self, row: int) -> Tuple:
+        """Hashable key that is equal for rows whose module dicts are equal."""
+        override = self.row_overrides.get(row)
+        if override is not None:
+            return tuple(sorted(override.items()))
+        return (
+            self.row_release[row],
+            self.row_compiler[row],
+            self.row_record[row],
+            self.row_parent[row],
+            self.row_flags[row],
+        )
+
+    def entry(self, row: int) -> Dict:
+        """Build the module dict of one row in the shape written by process_data."""
+        override = self.row_overrides.get(row)
+        if override is not None:
+            return dict(override)
+
+        record = self.records[self.row_record[row]]
+        release = self.strings[self.row_release[row]]
+        compiler = self.strings[self.row_compiler[row]]
+        if not self.row_flags[row] & IS_EXTENSION:
+            return {
+                "package": record.package,
+                "version": record.version,
+                "name": record.name,
+                "description": record.description,
+                "url": record.url,
+                "release": release,
+                "compiler": compiler,
+                "load_cmd": f"module load {release} {compiler} {record.name}",
+                "is_extension": False,
+            }
+
+        parent = self.strings[self.row_parent[row]] if self.row_parent[row] >= 0 else ""
+        parent_compiler = compiler[: -len(f"{parent}_Ext")].rstrip(" ")
+        return {
+            "package": record.package,
+            "version": record.version,
+            "name": record.name,
+            "description": record.description,
+            "url": record.url,
+            "release": release,
+            "compiler": compiler,
+            "parent": parent,
+            "is_extension": True,
+            "load_cmd": f"module load {release} {parent_compiler} {parent}",
+        }
+
+    def to_tree(self) -> Dict:
+        return {release: dict(compilers) for release, compilers in self.items()}
+
+    def write_binary(self, path: str):
+        """Write the catalog in the layout read by `MappedCatalog`.
+
+        All strings, including the record fields, go into one sorted table of
+        UTF-8 offsets and bytes. Records, rows and buckets follow as fixed-width
+        arrays of string ids. Each section is padded to 8 bytes.
+        """
+        strings = set(self.strings)
+        for record in self.records:
+            strings.update((record.package, record.version, record.name, record.description, record.url))
+        table = sorted(strings)
+        ids = {value: i for i, value in enumerate(table)}
+        old_to_new = [ids[value] for value in self.strings]
+
+        encoded = [value.encode("utf-8") for value in table]
+        offsets = array("I", [0])
+        for value in encoded:
+            offsets.append(offsets[-1] + len(value))
+        record_fields = array("I")
+        for record in self.records:
+            record_fields.extend(
+                ids[value] for value in (record.package, record.version, record.name, record.description, record.url)
+            )
+        bucket_table = array("I")
+        for release, compiler, rows in self.buckets():
+            bucket_table.extend((ids[release], ids[compiler], rows.start, rows.stop))
+        overrides = json.dumps({str(row): mod for row, mod in self.row_overrides.items()}).encode("utf-8")
+
+        sections = [
+            offsets.tobytes(),
+            b"".join(encoded),
+            record_fields.tobytes(),
+            array("I", (old_to_new[i] for i in self.row_release)).tobytes(),
+            array("I", (old_to_new[i] for i in self.row_compiler)).tobytes(),
+            array("I", self.row_record).tobytes(),
+            array("i", (old_to_new[i] if i >= 0 else -1 for i in self.row_parent)).tobytes(),
+            array("B", self.row_flags).tobytes(),
+            bucket_table.tobytes(),
+            overrides,
+        ]
+        header = BINARY_HEADER.pack(
+            BINARY_MAGIC,
+            BYTE_ORDER_CHECK,
+            len(table),
+            len(self.records),
+            self.row_count,
+            len(bucket_table) // 4,
+            offsets[-1],
+            len(overrides),
+        )
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            for section in (header, *sections):
+                f.write(section)
+                f.write(b"\0" * (-len(section) % 8))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def __getitem__(self, release: str) -> "_ReleaseView":
+        return _ReleaseView(self, release, self._buckets[release])
+
+    def __contains__(self, release: object) -> bool:
+        return release in self._buckets
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._buckets)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class _ReleaseView(Mapping):
+    def __init__(self, catalog: CompactCatalog, release: str, buckets: Dict[str, Tuple[int, int]]):
+        self._catalog = catalog
+        self._release = release
+        self._buckets = buckets
+
+    def __getitem__(self, compiler: str) -> List[Dict]:
+        start, stop = self._buckets[compiler]
+        return [self._catalog.entry(row) for row in range(start, stop)]
+
+    def __contains__(self, compiler: object) -> bool:
+        # Mapping's default would build the entries of the whole bucket
+        return compiler in self._buckets
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._buckets)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class _StringTable(Sequence):
+    """Sorted string table of a mapped catalog, decoded on access."""
+
+    def __init__(self, offsets: memoryview, blob: memoryview):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __getitem__(self, i: int) -> str:
+        return str(self._blob[self._offsets[i] : self._offsets[i + 1]], "utf-8")
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def find(self, value: str) -> Optional[int]:
+        i = bisect_left(self, value)
+        return i if i < len(self) and self[i] == value else None
+
+
+class _MappedRecord:
+    __slots__ = ("_strings", "_fields", "_base")
+
+    def __init__(self, strings: _StringTable, fields: memoryview, base: int):
+        self._strings = strings
+        self._fields = fields
+        self._base = base
+
+    @property
+    def package(self) -> str:
+        return self._strings[self._fields[self._base]]
+
+    @property
+    def version(self) -> str:
+        return self._strings[self._fields[self._base + 1]]
+
+    @property
+    def name(self) -> str:
+        return self._strings[self._fields[self._base + 2]]
+
+    @property
+    def description(self) -> str:
+        return self._strings[self._fields[self._base + 3]]
+
+    @property
+    def url(self) -> str:
+        return self._strings[self._fields[self._base + 4]]
+
+
+class _RecordTable(Sequence):
+    def __init__(self, strings: _StringTable, fields: memoryview):
+        self._strings = strings
+        self._fields = fields
+
+    def __getitem__(self, i: int) -> _MappedRecord:
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return _MappedRecord(self._strings, self._fields, i * RECORD_FIELDS)
+
+    def __len__(self) -> int:
+        return len(self._fields) // RECORD_FIELDS
+
+
+class MappedCatalog(CompactCatalog):
+    """A CompactCatalog read straight from a file written by `write_binary`.
+
+    The file is mapped read-only, so every process serving the same version
+    shares one copy in the page cache and opening it parses nothing but the
+    bucket table. Strings are decoded when they are accessed.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        if len(view) < BINARY_HEADER.size:
+            raise ValueError(f"{path} is not a binary catalog")
+        magic, order, n_strings, n_records, n_rows, n_buckets, blob_size, overrides_size = BINARY_HEADER.unpack_from(view)
+        if magic != BINARY_MAGIC or order != BYTE_ORDER_CHECK:
+            raise ValueError(f"{path} is not a binary catalog for this platform")
+
+        position = BINARY_HEADER.size + (-BINARY_HEADER.size % 8)
+
+        def section(size: int, fmt: Optional[str] = None) -> memoryview:
+            nonlocal position
+            part = view[position : position + size]
+            if len(part) != size:
+                raise ValueError(f"{path} is truncated")
+            position += size + (-size % 8)
+            return part.cast(fmt) if fmt else part
+
+        offsets = section(4 * (n_strings + 1), "I")
+        self.strings = _StringTable(offsets, section(blob_size))
+        self.records = _RecordTable(self.strings, section(4 * RECORD_FIELDS * n_records, "I"))
+        self.row_release = section(4 * n_rows, "I")
+        self.row_compiler = section(4 * n_rows, "I")
+        self.row_record = section(4 * n_rows, "I")
+        self.row_parent = section(4 * n_rows, "i")
+        self.row_flags = section(n_rows, "B")
+        bucket_table = section(16 * n_buckets, "I")
+        overrides = json.loads(str(section(overrides_size), "utf-8") or "{}")
+        self.row_overrides = {int(row): mod for row, mod in overrides.items()}
+
+        for i in range(0, len(bucket_table), 4):
+            release_id, compiler_id, start, stop = bucket_table[i : i + 4]
+            release = self._buckets.setdefault(self.strings[release_id], {})
+            release[self.strings[compiler_id]] = (start, stop)
+
+    def string_id(self, value: str) -> Optional[int]:
+        return self.strings.find(value)
+
+
+class CatalogSnapshot:
+    """One loaded version of a system's processed module tree.
+
+    Snapshots are never mutated after they are published, so a request can keep
+    using the one it got even if a newer version is swapped in meanwhile.
+    """
+
+    def __init__(self, system: str, data: CompactCatalog, signature: Signature):
+        self.system: str = system
+        self.data: CompactCatalog = data
+        self.signature: Signature = signature
+        # Versioned files carry their version in the name; others use mtime and size
+        self.version: str = version_of(signature[0], system) or f"{signature[1]:x}-{signature[2]:x}"
+        self.modified_at: float = signature[1] / 1e9 if signature[1] else time.time()
+        self.loaded_at: float = time.time()
+        self._derived: Dict[str, Any] = {}
+        # Reentrant, as a derived structure may be built from another one
+        self._derived_lock = threading.RLock()
+
+    def peek(self, name: str) -> Any:
+        """Return a derived structure if it has been built already."""
+        return self._derived.get(name)
+
+    def derived(self, name: str, builder: Callable[["CatalogSnapshot"], Any]) -> Any:
+        """Return a structure computed once per snapshot (indexes, lookups, ...)."""
+        value = self._derived.get(name)
+        if value is None:
+            with self._derived_lock:
+                value = self._derived.get(name)
+                if value is None:
+                    value = builder(self)
+                    self._derived[name] = value
+        return value
+
+
+def open_binary(path: str) -> Optional[MappedCatalog]:
+    """Map the binary copy of a published file; None if there is no usable one."""
+    try:
+        return MappedCatalog(path + BINARY_SUFFIX)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"[!] Ignoring binary catalog {path + BINARY_SUFFIX}: {e}")
+        return None
+
+
+def open_catalog(path: str) -> CompactCatalog:
+    """Catalog of a published file, mapped from its binary copy when there is one."""
+    data = open_binary(path)
+    if data is None:
+        with open(path, "rb") as f:
+            data = CompactCatalog.from_tree(jsonio.load(f))
+    return data
+
+
+class CatalogCache:
+    """Process-wide cache of processed module trees, one snapshot per system.
+
+    A snapshot is reloaded only when `processed_module_<system>.json` points
+    to another version, or its size or mtime change, or when a new tree is
+    handed over through `publish`. While one thread reloads a system, other
+    threads keep being served the previous snapshot. Listeners registered with
+    `add_listener` are told about every newly installed snapshot. Load times
+    are recorded in `metrics` when given.
+    """
+
+    def __init__(self, data_dir: str, metrics: Optional[Metrics] = None):
+        self.data_dir: str = data_dir
+        self.metrics: Optional[Metrics] = metrics
+        self._snapshots: Dict[str, CatalogSnapshot] = {}
+        self._failed: Dict[str, Signature] = {}
+        self._reload_locks: Dict[str, threading.Lock] = {}
+        self._listeners: List[Callable[[str, CatalogSnapshot], None]] = []
+        self._lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.reloads: int = 0
+
+    def path_for(self, system: str) -> str:
+        return current_path(self.data_dir, system)
+
+    def _signature(self, system: str) -> Optional[Signature]:
+        # Published versions are immutable, so reading the resolved path gives a
+        # consistent file even if the pointer is swapped meanwhile.
+        path = os.path.realpath(self.path_for(system))
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (path, st.st_mtime_ns, st.st_size)
+
+    def add_listener(self, listener: Callable[[str, CatalogSnapshot], None]):
+        self._listeners.append(listener)
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _reload_lock(self, system: str) -> threading.Lock:
+        with self._lock:
+            return self._reload_locks.setdefault(system, threading.Lock())
+
+    def peek(self, system: str) -> Optional[CatalogSnapshot]:
+        """Return the current snapshot without checking the file or counting."""
+        return self._snapshots.get(system)
+
+    def get(self, system: str) -> Optional[CatalogSnapshot]:
+        snapshot = self._snapshots.get(system)
+        signature = self._signature(system)
+
+        if signature is None or (snapshot is not None and snapshot.signature == signature):
+            self._count("hits" if snapshot is not None else "misses")
+            return snapshot
+        if snapshot is not None and self._failed.get(system) == signature:
+            # The file on disk could not be parsed; keep serving the last good one.
+            self._count("hits")
+            return snapshot
+
+        reload_lock = self._reload_lock(system)
+        if snapshot is not None and not reload_lock.acquire(blocking=False):
+            # Another thread is already reloading this system.
+            self._count("hits")
+            return snapshot
+        if snapshot is None:
+            reload_lock.acquire()
+
+        try:
+            current = self._snapshots.get(system)
+            if current is not None and current.signature == signature:
+                self._count("hits")
+                return current
+
+            self._count("misses")
+            started = time.perf_counter()
+            try:
+                data = open_catalog(signature[0])
+                if self.metrics is not None:
+                    source = "binary" if isinstance(data, MappedCatalog) else "json"
+                    self.metrics.observe(
+                        "modscout_catalog_load_seconds", time.perf_counter() - started, system=system, source=source
+                    )
+            except (OSError, ValueError) as e:
+                print(f"[!] Could not load catalog for {system}: {e}")
+                self._failed[system] = signature
+                if current is None:
+                    raise
+                return current
+
+            return self._swap(system, data, signature)
+        finally:
+            reload_lock.release()
+
+    def publish(self, system: str, catalog: CompactCatalog) -> CatalogSnapshot:
+        """Install a freshly built catalog, e.g. right after `process_data` wrote it.
+
+        The mapped binary copy is used instead when one was published, so this
+        process shares its pages with the other workers.
+        """
+        signature = self._signature(system) or (self.path_for(system), 0, 0)
+        with self._reload_lock(system):
+            return self._swap(system, open_binary(signature[0]) or catalog, signature)
+
+    def invalidate(self, system: str):
+        with self._lock:
+            self._snapshots.pop(system, None)
+            self._failed.pop(system, None)
+
+    def _swap(self, system: str, data: CompactCatalog, signature: Signature) -> CatalogSnapshot:
+        snapshot = CatalogSnapshot(system, data, signature)
+        with self._lock:
+            self._snapshots[system] = snapshot
+            self._failed.pop(system, None)
+            self.reloads += 1
+        for listener in self._listeners:
+            listener(system, snapshot)
+        return snapshot
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "systems": {
+                    system: {
+                        "version": snapshot.version,
+                        "loaded_at": snapshot.loaded_at,
+                        "size": snapshot.signature[2],
+                        "mapped": isinstance(snapshot.data, MappedCatalog),
+                    }
+                    for system, snapshot in self._snapshots.items()
+                },
+            }
@@ -0,0 +1,65 @@
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+from app.catalog import CompactCatalog
+
+
+def toolchain_chain(compiler: str) -> FrozenSet[str]:
+    """Modules a bucket depends on, e.g. {"GCC/13.2.0", "OpenMPI/4.1.6"}.
+
+    Extension buckets (`<compiler> <module>_Ext`) need the chain of the module
+    providing them.
+    """
+    tokens = compiler.split()
+    if tokens and tokens[-1].lower().endswith("_ext"):
+        tokens = tokens[:-1]
+    return frozenset(tokens)
+
+
+class CompatibilityGraph:
+    """Per-release lattice of the toolchain chains found in a catalog.
+
+    Every non-extension bucket of a release is an environment that can be
+    loaded. A module is mapped to the bitset of environments containing its
+    own chain, so a selection can be loaded together exactly when the AND of
+    its bitsets is non-zero.
+    """
+
+    def __init__(self, buckets: Dict[str, Iterable[str]]):
+        self._environments: Dict[str, List[FrozenSet[str]]] = {}
+        self._masks: Dict[Tuple[str, str], int] = {}
+        for release, compilers in buckets.items():
+            compilers = list(compilers)
+            environments = {frozenset()}
+            for compiler in compilers:
+                if not compiler.lower().endswith("_ext"):
+                    environments.add(toolchain_chain(compiler))
+            self._environments[release] = sorted(environments, key=sorted)
+            for compiler in compilers:
+                self.mask(release, compiler)
+
+    @classmethod
+    def from_catalog(cls, catalog: CompactCatalog) -> "CompatibilityGraph":
+        return cls({release: list(compilers) for release, compilers in catalog.items()})
+
+    @classmethod
+    def from_selection(cls, selected: List[Dict]) -> "CompatibilityGraph":
+        """Graph whose environments are the chains of the selection itself."""
+        buckets: Dict[str, List[str]] = {}
+        for m in selected:
+            buckets.setdefault(m.get("release", "").strip(), []).append(m.get("compiler", "").strip())
+        return cls(buckets)
+
+    def knows(self, release: str) -> bool:
+        return release in self._environments
+
+    def mask(self, release: str, compiler: str) -> int:
+        key = (release, compiler)
+        mask = self._masks.get(key)
+        if mask is None:
+            chain = toolchain_chain(compiler)
+            mask = 0
+            for bit, environment in enumerate(self._environments.get(release, [])):
+                if chain <= environment:
+                    mask |= 1 << bit
+            self._masks[key] = mask
+        return mask
@@ -1,9 +1,21 @@
 
+import multiprocessing
 import os
 import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from typing import Dict
 from dotenv import load_dotenv
 import schedule
+from app import suggest_worker
+from app.admission import AdmissionGate
+from app.availability import AvailabilityIndex
+from app.catalog import CatalogCache
+from app.jobs import JobTable, worker_id
+from app.metrics import Metrics
+from app.response_cache import ResponseCache
+from app.warmup import WarmupState
 load_dotenv()
 
 class AppConfig:
@@ -16,7 +28,7 @@ class AppConfig:
         self.data_dir: str = os.getenv("DATA_DIR", "./data")
         os.makedirs(self.data_dir, exist_ok=True)
 
-        self.auto_update_database: bool = os.getenv("AUTO_UPDATE_DATABASE", "False").lower() == "True"
+        self.auto_update_database: bool = os.getenv("AUTO_UPDATE_DATABASE", "False").lower() == "true"
         self.update_schedule: str = os.getenv("UPDATE_SCHEDULE")
         self.update_day, self.update_time = self.update_schedule.split()
         self.day_map: Dict[str, any] = {
@@ -28,9 +40,148 @@ class AppConfig:
             "saturday": schedule.every().saturday,
             "sunday": schedule.every().sunday,
         }
-        self.update_job_status: Dict[str, Dict[str, str]] = self._load_job_status()
 
-        self.data_dictionary: Dict[str, Dict] = {}
+        # Fetching spider output
+        self.fetch_command: str = os.getenv("FETCH_COMMAND", "")
+        self.fetch_concurrency: int = int(os.getenv("FETCH_CONCURRENCY", 2))
+        self.fetch_timeout: float = float(os.getenv("FETCH_TIMEOUT", 900))
+        self.fetch_retries: int = int(os.getenv("FETCH_RETRIES", 2))
+        self.fetch_backoff: float = float(os.getenv("FETCH_BACKOFF", 30))
+        self.update_pool = ThreadPoolExecutor(
+            max_workers=self.fetch_concurrency, thread_name_prefix="modscout-update"
+        )
+
+        # Processing of spider output, in worker processes so it does not hold
+        # the GIL of the web worker. 0 processes in the updating thread. Every
+        # gunicorn worker has a pool, so by default they split the CPUs.
+        self.gunicorn_workers: int = max(1, int(os.getenv("GUNICORN_WORKERS", 4)))
+        self.process_workers: int = int(
+            os.getenv("PROCESS_WORKERS", max(1, (os.cpu_count() or 1) // self.gunicorn_workers))
+        )
+        self.process_pool = self.new_process_pool()
+
+        # Update jobs shared by all workers using this DATA_DIR
+        self.worker_id: str = worker_id()
+        self.job_stale_after: float = float(
+            os.getenv(
+                "JOB_STALE_AFTER",
+                self.fetch_timeout * (self.fetch_retries + 1) + self.fetch_backoff * 2 ** self.fetch_retries + 600,
+            )
+        )
+        self.scheduler_lease_ttl: float = float(os.getenv("SCHEDULER_LEASE_TTL", 30))
+        self.jobs: JobTable = JobTable(
+            os.path.join(self.data_dir, "jobs.sqlite3"), self.systems.keys(), self.job_stale_after
+        )
+
+        # Instrumentation, see /metrics
+        self.metrics: Metrics = Metrics(
+            os.path.join(self.data_dir, "metrics"),
+            self.worker_id,
+            float(os.getenv("METRICS_FLUSH_INTERVAL", 5)),
+            float(os.getenv("METRICS_STALE_AFTER", 86400)),
+        )
+        self.profiling: bool = os.getenv("PROFILING", "False").lower() == "true"
+        self.profile_interval: float = float(os.getenv("PROFILE_INTERVAL_MS", 5)) / 1000
+        self.profile_dir: str = os.path.join(self.data_dir, "profiles")
+
+        self.catalog_cache: CatalogCache = CatalogCache(self.data_dir, self.metrics)
+        self.catalog_backend: str = os.getenv("CATALOG_BACKEND", "json").lower()
+        if self.catalog_backend not in ("json", "sqlite"):
+            raise ValueError(f"CATALOG_BACKEND must be 'json' or 'sqlite', not {self.catalog_backend!r}")
+        self.keep_versions: int = int(os.getenv("KEEP_VERSIONS", 5))
+
+        # HTTP caching
+        self.http_max_age: int = int(os.getenv("HTTP_MAX_AGE", 0))
+        self.response_cache: ResponseCache = ResponseCache(int(os.getenv("RESPONSE_CACHE_SIZE", 1024)))
+        self.catalog_cache.add_listener(self.response_cache.invalidate)
+        # Package -> systems index behind /module/availability
+        self.availability: AvailabilityIndex = AvailabilityIndex()
+        self.catalog_cache.add_listener(self.availability.update)
+        self.max_suggestions: int = int(os.getenv("MAX_SUGGESTIONS", 50))
+
+        # Conflict suggestions run in worker processes (0 = in the request
+        # thread) within a time and combination budget, behind a cap on
+        # concurrent suggestion searches per web worker
+        self.suggest_workers: int = int(os.getenv("SUGGEST_WORKERS", 1))
+        self.suggest_timeout: float = float(os.getenv("SUGGEST_TIMEOUT", 2))
+        self.suggest_max_combinations: int = int(os.getenv("SUGGEST_MAX_COMBINATIONS", 200000))
+        self.suggest_nice: int = int(os.getenv("SUGGEST_NICE", 10))
+        self._suggest_warm_lock = threading.Lock()
+        self.suggest_pool = self.new_suggest_pool()
+        self.catalog_cache.add_listener(self.warm_suggest_pool)
+        self.conflict_gate: AdmissionGate = AdmissionGate(
+            int(os.getenv("CONFLICT_CONCURRENCY", max(2, 2 * self.suggest_workers))),
+            int(os.getenv("CONFLICT_QUEUE", 16)),
+            float(os.getenv("CONFLICT_QUEUE_TIMEOUT", 5)),
+        )
+
+        # Catalogs and their indexes are loaded in a background thread at startup
+        # instead of by the first request of each system, see /status/ready
+        self.warmup_on_start: bool = os.getenv("WARMUP_ON_START", "True").lower() == "true"
+        self.warmup: WarmupState = WarmupState(self.systems, self.warmup_on_start)
+
+        # Batch endpoints
+        self.batch_max_items: int = int(os.getenv("BATCH_MAX_ITEMS", 10000))
+        self.batch_workers: int = int(os.getenv("BATCH_WORKERS", 4))
+        self.batch_parallel_min: int = int(os.getenv("BATCH_PARALLEL_MIN", 200))
+        self.batch_pool = (
+            ThreadPoolExecutor(max_workers=self.batch_workers, thread_name_prefix="modscout-batch")
+            if self.batch_workers > 1
+            else None
+        )
+
+    def new_process_pool(self):
+        if self.process_workers <= 0:
+            return None
+        # Spawned, not forked: the web worker runs threads that fork would copy mid-operation
+        return ProcessPoolExecutor(max_workers=self.process_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def new_suggest_pool(self):
+        if self.suggest_workers <= 0:
+            return None
+        context = multiprocessing.get_context("spawn")
+        # Passed to the processes when they start, see `warm_suggest_processes`
+        self._suggest_warm_barrier = context.Barrier(self.suggest_workers)
+        return ProcessPoolExecutor(
+            max_workers=self.suggest_workers,
+            mp_context=context,
+            initializer=suggest_worker.init_process,
+            initargs=(self.suggest_nice, self._suggest_warm_barrier),
+        )
+
+    def warm_suggest_pool(self, system, snapshot):
+        """Catalog cache listener: build the new version's engine in the suggestion processes.
+
+        Runs in the background: the listener may be called by a request.
+        """
+        if self.suggest_pool is None:
+            return
+        threading.Thread(
+            target=self.warm_suggest_processes,
+            args=(system, snapshot.signature),
+            daemon=True,
+            name="modscout-suggest-warmup",
+        ).start()
+
+    def warm_suggest_processes(self, system, signature):
+        """Build the engine of a catalog version in every suggestion process and wait for it."""
+        if self.suggest_pool is None:
+            return
+        # One round at a time: the tasks of a round meet at the barrier
+        with self._suggest_warm_lock:
+            pool = self.suggest_pool
+            self._suggest_warm_barrier.reset()
+            try:
+                futures = [pool.submit(suggest_worker.warm, system, signature) for _ in range(self.suggest_workers)]
+            except RuntimeError:
+                # Pool broken or shut down, it is replaced on the next request
+                return
+            try:
+                for future in futures:
+                    future.result()
+            except BrokenProcessPool:
+                # Replaced by the next conflict check, like in `budgeted_suggestions`
+                print(f"[!] Suggestion processes broke while warming {system}")
 
     def _load_systems(self) -> Dict[str, Dict[str, str]]:
         systems: Dict[str, Dict[str, str]] = {}
@@ -40,12 +191,6 @@ class AppConfig:
                 system_index = match.group(1)
                 system_name = value
                 system_host = os.environ.get(f"SYSTEM_{system_index}_HOST")
-                systems[system_name] = {"host": system_host}
+                system_timeout = os.environ.get(f"SYSTEM_{system_index}_TIMEOUT")
+                systems[system_name] = {"host": system_host, "timeout": system_timeout}
         return systems
-    
-    def _load_job_status(self) -> Dict[str, Dict[str, str]]:
-        job_status: Dict[str, Dict[str,str]] = {}
-
-        for system in self.systems.keys():
-            job_status[system] = {"last_run": "Never", "is_running": False}
-        return job_status
\ No newline at end of file
@@ -0,0 +1,108 @@
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.catalog import IS_EXTENSION, CompactCatalog
+from app.suggestion_engine import version_key, version_matches
+
+
+def provider_chain(compiler: str) -> str:
+    """Compiler chain of the module providing an extension bucket (`<chain> <module>_Ext`)."""
+    return " ".join(compiler.split()[:-1])
+
+
+class ExtensionIndex:
+    """Reverse index of the `provides` lists: extension -> modules providing it.
+
+    Extension rows live in synthetic `<chain> <module>_Ext` buckets. The index
+    maps each lower-cased extension package to its rows, listed once per
+    (extension, release, chain, providing module), and each row to the row of
+    its providing module. It also groups the rows by the (release, chain) they
+    can be loaded in, which the suggestion engine uses to combine extensions
+    with other modules.
+    """
+
+    def __init__(self, catalog: CompactCatalog):
+        self.catalog: CompactCatalog = catalog
+        self._packages: Dict[str, List[int]] = {}
+        self._chains: Dict[Tuple[str, str], List[int]] = {}
+        self._providers: Dict[int, int] = {}
+
+        seen: Set[Tuple] = set()
+        # (release, chain) -> module name -> row, shared by the extension buckets of a chain
+        module_rows: Dict[Tuple[str, str], Dict[str, int]] = {}
+        records = catalog.records
+        for release, compiler, rows in catalog.buckets():
+            if not compiler.lower().endswith("_ext"):
+                continue
+            chain = provider_chain(compiler)
+            provider_rows: Optional[Dict[str, int]] = None
+            for row in rows:
+                if not catalog.row_flags[row] & IS_EXTENSION:
+                    continue
+                key = catalog.row_key(row)
+                if key in seen:
+                    continue
+                seen.add(key)
+                self._packages.setdefault(records[catalog.row_record[row]].package.lower(), []).append(row)
+                self._chains.setdefault((release, chain), []).append(row)
+
+                if provider_rows is None:
+                    provider_rows = module_rows.get((release, chain))
+                    if provider_rows is None:
+                        provider_rows = module_rows[(release, chain)] = self._module_rows(release, chain)
+                parent = catalog.row_parent[row]
+                provider = provider_rows.get(catalog.strings[parent]) if parent >= 0 else None
+                if provider is not None:
+                    self._providers[row] = provider
+
+    def _module_rows(self, release: str, chain: str) -> Dict[str, int]:
+        """Module name -> first row of it in the (release, chain) bucket."""
+        catalog = self.catalog
+        if chain not in catalog.get(release, {}):
+            return {}
+        names: Dict[str, int] = {}
+        for row in catalog.rows(release, chain):
+            names.setdefault(catalog.records[catalog.row_record[row]].name, row)
+        return names
+
+    def rows(self, name: str) -> List[int]:
+        """Extension rows of `name`, an extension package optionally followed by `/version`.
+
+        The version may be a prefix ending at a `.` or `-`. Newest version first.
+        """
+        package, _, version = name.strip().lower().partition("/")
+        records = self.catalog.records
+        row_record = self.catalog.row_record
+        rows = [
+            row
+            for row in self._packages.get(package, ())
+            if version_matches(records[row_record[row]].version, version or None)
+        ]
+        rows.sort(key=lambda row: version_key(records[row_record[row]].version), reverse=True)
+        return rows
+
+    def provider_rows(self, name: str) -> Set[int]:
+        """Rows of the modules providing the extension `name`."""
+        return {self._providers[row] for row in self.rows(name) if row in self._providers}
+
+    def chain_rows(self, release: str, chain: str) -> List[int]:
+        """Extension rows loadable in the (release, chain) environment."""
+        return self._chains.get((release, chain), [])
+
+    def lookup(self, name: str) -> List[Dict]:
+        """The modules providing extension `name`, with the release and chain to load them in."""
+        catalog = self.catalog
+        providers = []
+        for row in self.rows(name):
+            entry = catalog.entry(row)
+            providers.append(
+                {
+                    "extension": entry.get("name", ""),
+                    "package": entry.get("package", ""),
+                    "version": entry.get("version", ""),
+                    "release": entry.get("release", ""),
+                    "compiler": provider_chain(entry.get("compiler", "")),
+                    "provided_by": entry.get("parent", ""),
+                    "load_cmd": entry.get("load_cmd", ""),
+                }
+            )
+        return providers
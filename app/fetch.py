@@ -0,0 +1,92 @@
+import os
+import shlex
+import subprocess
+import time
+from typing import List
+
+REMOTE_CMD = "$LMOD_DIR/spider -o jsonSoftwarePage $MODULEPATH"
+
+
+class FetchError(Exception):
+    pass
+
+
+def build_fetch_command(cfg, system_name: str) -> List[str]:
+    """Command whose stdout is the spider JSON of a system.
+
+    `FETCH_COMMAND` replaces the SSH call, e.g. `cat ./samples/{system}.json`
+    for testing. Otherwise SSH is used with a shared ControlMaster connection
+    per host, so retries and later updates skip the handshake.
+    """
+    host = cfg.systems[system_name]["host"]
+    if cfg.fetch_command:
+        return shlex.split(cfg.fetch_command.format(system=system_name, host=host))
+
+    control_dir = os.path.join(cfg.data_dir, ".ssh")
+    os.makedirs(control_dir, mode=0o700, exist_ok=True)
+    return [
+        "ssh",
+        "-i",
+        f"{cfg.hpc_ssh_key}",
+        "-o", "BatchMode=yes",
+        "-o", "ControlMaster=auto",
+        "-o", f"ControlPath={os.path.join(control_dir, 'cm-%r@%h:%p')}",
+        "-o", "ControlPersist=10m",
+        f"{cfg.hpc_username}@{host}",
+        REMOTE_CMD,
+    ]
+
+
+def _looks_complete(path: str) -> bool:
+    """Cheap check that the output is a whole JSON array and not cut off."""
+    with open(path, "rb") as f:
+        head = f.read(64).lstrip()
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 64))
+        tail = f.read().rstrip()
+    return head.startswith(b"[") and tail.endswith(b"]")
+
+
+def fetch_raw(cfg, system_name: str, local_path: str) -> int:
+    """Stream the spider output of a system into `local_path`.
+
+    stdout goes straight to a temporary file that only replaces `local_path`
+    once the command succeeded and the output is complete. Failed attempts are
+    retried with exponential backoff. Returns the number of bytes fetched and
+    raises FetchError when every attempt failed.
+    """
+    command = build_fetch_command(cfg, system_name)
+    timeout = float(cfg.systems[system_name].get("timeout") or cfg.fetch_timeout)
+    partial_path = f"{local_path}.part-{os.getpid()}"
+
+    error = None
+    for attempt in range(cfg.fetch_retries + 1):
+        if attempt > 0:
+            delay = cfg.fetch_backoff * 2 ** (attempt - 1)
+            print(f"[!] Retrying {system_name} in {delay}s ({attempt}/{cfg.fetch_retries}): {error}")
+            time.sleep(delay)
+        try:
+            with open(partial_path, "wb") as out:
+                proc = subprocess.Popen(command, stdout=out, stderr=subprocess.PIPE)
+                try:
+                    _, stderr = proc.communicate(timeout=timeout)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+                    proc.communicate()
+                    error = f"timed out after {timeout}s"
+                    continue
+            if proc.returncode != 0:
+                error = f"exit code {proc.returncode}: {stderr.decode(errors='replace').strip()}"
+                continue
+            if not _looks_complete(partial_path):
+                error = "incomplete spider output"
+                continue
+            os.replace(partial_path, local_path)
+            return os.path.getsize(local_path)
+        except OSError as e:
+            error = str(e)
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+
+    raise FetchError(f"{system_name}: {error}")
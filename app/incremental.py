@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import pickle
+from typing import Dict, Iterator, List, Tuple
+
+# One processed raw package: the (release, compiler, module) placements it produces
+Fragment = List[Tuple[str, str, Dict]]
+
+
+def fingerprint(entry: Dict, format_version: int) -> str:
+    """Hash of a raw entry and of the version of the code that processes it.
+
+    Fragments kept from a build by another processing format never match, so
+    changing `process_package` reprocesses every package once.
+    """
+    payload = json.dumps([format_version, entry], sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def keyed_entries(raw_data: List[Dict]) -> Iterator[Tuple[str, Dict]]:
+    """Give every raw spider entry a stable key, its package name.
+
+    Repeated package names get a `#<n>` suffix so every entry has its own key.
+    """
+    counts: Dict[str, int] = {}
+    for entry in raw_data:
+        package = entry["package"]
+        n = counts.get(package, 0)
+        counts[package] = n + 1
+        yield (package if n == 0 else f"{package}#{n}"), entry
+
+
+def state_path(data_dir: str, system: str) -> str:
+    return os.path.join(data_dir, f"build_state_{system}.pickle")
+
+
+def load_state(data_dir: str, system: str) -> Dict[str, Tuple[str, Fragment]]:
+    """Fingerprint and fragment of every package of the previous build."""
+    try:
+        with open(state_path(data_dir, system), "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print(f"[!] Ignoring unreadable build state for {system}: {e}")
+        return {}
+
+
+def save_state(data_dir: str, system: str, state: Dict[str, Tuple[str, Fragment]]):
+    path = state_path(data_dir, system)
+    with open(f"{path}.tmp", "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(f"{path}.tmp", path)
+
+
+def clear_state(data_dir: str, system: str):
+    """Forget the previous build, so the next update rebuilds every package."""
+    try:
+        os.remove(state_path(data_dir, system))
+    except FileNotFoundError:
+        pass
+
+
+def _modules_by_name(fragment: Fragment) -> Dict[str, List[Tuple[str, str, Dict]]]:
+    modules: Dict[str, List[Tuple[str, str, Dict]]] = {}
+    for release, compiler, module in fragment:
+        if not module.get("is_extension"):
+            modules.setdefault(module["name"], []).append((release, compiler, module))
+    return modules
+
+
+def module_delta(old: Fragment, new: Fragment) -> Dict[str, List[str]]:
+    """Module names added, removed or changed between two builds of a package."""
+    old_modules = _modules_by_name(old)
+    new_modules = _modules_by_name(new)
+    return {
+        "added": [name for name in new_modules if name not in old_modules],
+        "removed": [name for name in old_modules if name not in new_modules],
+        "changed": [
+            name
+            for name, placements in new_modules.items()
+            if name in old_modules and old_modules[name] != placements
+        ],
+    }
+
+
+def write_delta(data_dir: str, system: str, delta: Dict):
+    path = os.path.join(data_dir, f"delta_{system}.json")
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(delta, f, indent=4)
+    os.replace(f"{path}.tmp", path)
@@ -0,0 +1,67 @@
+import os
+import pickle
+from typing import Any, Dict
+
+from app.catalog import CompactCatalog
+
+# Bumped whenever a serialized structure changes its attributes; older files are ignored
+INDEX_FORMAT = 1
+
+
+class _Pickler(pickle.Pickler):
+    """Writes the catalog the structures refer to as a reference, not as data."""
+
+    def __init__(self, f, catalog: CompactCatalog):
+        super().__init__(f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._catalog = catalog
+
+    def persistent_id(self, obj: Any):
+        return "catalog" if obj is self._catalog else None
+
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, f, catalog: CompactCatalog):
+        super().__init__(f)
+        self._catalog = catalog
+
+    def persistent_load(self, pid: Any):
+        if pid != "catalog":
+            raise pickle.UnpicklingError(f"Unknown reference {pid!r}")
+        return self._catalog
+
+
+def write_index_snapshot(structures: Dict[str, Any], catalog: CompactCatalog, path: str):
+    """Serialize the derived structures (search, extension and typeahead indexes, ...) of a catalog version.
+
+    References to `catalog` are stored as such, so the structures can be
+    loaded against the memory-mapped copy of the same version. The file is a
+    pickle and is trusted like the rest of DATA_DIR.
+    """
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(INDEX_FORMAT, f)
+        pickle.dump(catalog.row_count, f)
+        _Pickler(f, catalog).dump(structures)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_index_snapshot(path: str, catalog: CompactCatalog) -> Dict[str, Any]:
+    """Structures written by `write_index_snapshot`, bound to `catalog`.
+
+    Empty when the version has no index snapshot or it cannot be used (other
+    format, other catalog), in which case the structures are built as usual.
+    """
+    try:
+        with open(path, "rb") as f:
+            if pickle.load(f) != INDEX_FORMAT or pickle.load(f) != catalog.row_count:
+                print(f"[!] Ignoring index snapshot {path}: written for another format or catalog")
+                return {}
+            return _Unpickler(f, catalog).load()
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        # Unpickling can fail in many ways (truncated file, renamed class, ...)
+        print(f"[!] Ignoring index snapshot {path}: {e}")
+        return {}
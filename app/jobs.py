@@ -0,0 +1,179 @@
+import os
+import socket
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+JOB_COLUMNS = (
+    "system",
+    "is_running",
+    "owner",
+    "started_at",
+    "heartbeat",
+    "finished_at",
+    "last_run",
+    "duration_seconds",
+    "bytes_fetched",
+    "version",
+    "error",
+)
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def worker_alive(owner: Optional[str]) -> bool:
+    """False only if `owner` is a process of this host that no longer exists."""
+    if not owner:
+        return False
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (ValueError, PermissionError):
+        pass
+    return True
+
+
+class JobTable:
+    """Update job state shared by every worker using the same DATA_DIR.
+
+    Backed by an SQLite database, so gunicorn workers and replicas on a shared
+    volume agree on which system is being updated. `try_start` claims a system
+    atomically; a claim whose owner died or that was not touched for
+    `stale_after` seconds can be taken over. Leases (`acquire_lease`) elect
+    the single worker running the update schedule.
+    """
+
+    def __init__(self, path: str, systems: Iterable[str], stale_after: float):
+        self.path: str = path
+        self.stale_after: float = stale_after
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    system TEXT PRIMARY KEY,
+                    is_running INTEGER NOT NULL DEFAULT 0,
+                    owner TEXT,
+                    started_at REAL,
+                    heartbeat REAL,
+                    finished_at REAL,
+                    last_run TEXT NOT NULL DEFAULT 'Never',
+                    duration_seconds REAL,
+                    bytes_fetched INTEGER,
+                    version TEXT,
+                    error TEXT
+                )"""
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS claims (name TEXT PRIMARY KEY, owner TEXT NOT NULL, claimed_at REAL NOT NULL)"
+            )
+            db.executemany("INSERT OR IGNORE INTO jobs (system) VALUES (?)", [(s,) for s in systems])
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @contextmanager
+    def _transaction(self):
+        # IMMEDIATE takes the write lock up front, so check-then-update is atomic
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def try_start(self, system: str, owner: str) -> bool:
+        """Claim `system` for an update; False if another live worker holds it."""
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute("SELECT is_running, owner, heartbeat FROM jobs WHERE system = ?", (system,)).fetchone()
+            if row is not None and row[0]:
+                stale = now - (row[2] or 0) > self.stale_after or not worker_alive(row[1])
+                if not stale:
+                    return False
+                print(f"[!] Taking over stale update of {system} from {row[1]}")
+            db.execute(
+                """INSERT INTO jobs (system, is_running, owner, started_at, heartbeat) VALUES (?, 1, ?, ?, ?)
+                   ON CONFLICT(system) DO UPDATE SET
+                   is_running = 1, owner = excluded.owner, started_at = excluded.started_at,
+                   heartbeat = excluded.heartbeat""",
+                (system, owner, now, now),
+            )
+            return True
+
+    def heartbeat(self, system: str, owner: str, **fields: Any):
+        """Mark a running job as alive, optionally recording progress fields."""
+        fields = {k: v for k, v in fields.items() if k in JOB_COLUMNS}
+        assignments = "".join(f", {k} = ?" for k in fields)
+        with self._connect() as db:
+            db.execute(
+                f"UPDATE jobs SET heartbeat = ?{assignments} WHERE system = ? AND owner = ?",
+                (time.time(), *fields.values(), system, owner),
+            )
+
+    def finish(self, system: str, owner: str, error: Optional[str] = None, **fields: Any):
+        now = time.time()
+        fields = {k: v for k, v in fields.items() if k in JOB_COLUMNS}
+        assignments = "".join(f", {k} = ?" for k in fields)
+        with self._connect() as db:
+            db.execute(
+                f"""UPDATE jobs SET is_running = 0, finished_at = ?, heartbeat = ?, last_run = ?,
+                    duration_seconds = ? - started_at, error = ?{assignments}
+                    WHERE system = ? AND owner = ?""",
+                (now, now, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), now, error, *fields.values(), system, owner),
+            )
+
+    def release(self, system: str, owner: str):
+        """Give up a claim without recording a run."""
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET is_running = 0 WHERE system = ? AND owner = ?", (system, owner))
+
+    def is_running(self, system: str) -> bool:
+        return bool(self.status().get(system, {}).get("is_running"))
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        with self._connect() as db:
+            rows = db.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs ORDER BY system").fetchall()
+        status = {}
+        for row in rows:
+            job = dict(zip(JOB_COLUMNS, row))
+            job["is_running"] = bool(job["is_running"])
+            status[job.pop("system")] = job
+        return status
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """Take or renew the lease `name` for `ttl` seconds; False if another owner holds it."""
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute("SELECT owner, expires FROM leases WHERE name = ?", (name,)).fetchone()
+            if row is not None and row[0] != owner and row[1] > now and worker_alive(row[0]):
+                return False
+            db.execute(
+                "INSERT OR REPLACE INTO leases (name, owner, expires) VALUES (?, ?, ?)", (name, owner, now + ttl)
+            )
+            return True
+
+    def claim_once(self, name: str, owner: str) -> bool:
+        """Record that `name` happened; True only for the first caller."""
+        with self._transaction() as db:
+            if db.execute("SELECT 1 FROM claims WHERE name = ?", (name,)).fetchone():
+                return False
+            db.execute("INSERT INTO claims (name, owner, claimed_at) VALUES (?, ?, ?)", (name, owner, time.time()))
+            return True
@@ -0,0 +1,45 @@
+import json
+from typing import Any, BinaryIO
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the standard library is used without it
+    orjson = None
+
+
+def loads(data: bytes) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """Compact JSON of `obj`.
+
+    Without `indent` the standard library uses its C encoder, which is
+    several times faster than the indented pure Python one.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def load(f: BinaryIO) -> Any:
+    """Parse a JSON file opened in binary mode."""
+    return loads(f.read())
+
+
+def dump(obj: Any, f: BinaryIO, depth: int = 2):
+    """Write `obj` as compact JSON to a file opened in binary mode.
+
+    The first `depth` levels of nested dicts are written key by key, so a
+    large tree is encoded in many short calls. Each call holds the GIL only
+    briefly, and request threads keep being served while a catalog is written.
+    """
+    if depth <= 0 or not isinstance(obj, dict):
+        f.write(dumps(obj))
+        return
+    f.write(b"{")
+    for i, (key, value) in enumerate(obj.items()):
+        f.write(b"," if i else b"")
+        f.write(dumps(str(key)) + b":")
+        dump(value, f, depth - 1)
+    f.write(b"}")
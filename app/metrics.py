@@ -0,0 +1,201 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.jobs import worker_alive
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 900.0, 1800.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+COUNT_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64)
+
+# name -> (type, help, histogram buckets)
+METRICS: Dict[str, Tuple[str, str, Sequence[float]]] = {
+    "modscout_http_request_duration_seconds": ("histogram", "Request latency by route.", LATENCY_BUCKETS),
+    "modscout_http_response_size_bytes": ("histogram", "Response body size by route.", SIZE_BUCKETS),
+    "modscout_catalog_load_seconds": ("histogram", "Time to load a catalog version into a worker.", LATENCY_BUCKETS),
+    "modscout_warmup_seconds": (
+        "histogram",
+        "Time to load a catalog and its indexes at worker startup, by index source.",
+        LATENCY_BUCKETS,
+    ),
+    "modscout_search_seconds": ("histogram", "Time to evaluate a search query.", LATENCY_BUCKETS),
+    "modscout_validate_seconds": ("histogram", "Time to resolve the module commands of a job script.", LATENCY_BUCKETS),
+    "modscout_suggestion_seconds": ("histogram", "Time to generate conflict suggestions.", LATENCY_BUCKETS),
+    "modscout_suggestion_combinations": ("histogram", "Combinations evaluated per suggestion request.", COUNT_BUCKETS),
+    "modscout_suggestion_truncated_total": ("counter", "Suggestion searches stopped by their budget.", ()),
+    "modscout_conflict_queue_depth": (
+        "histogram",
+        "Suggestion searches running or queued in the worker when one arrives.",
+        DEPTH_BUCKETS,
+    ),
+    "modscout_conflict_queue_wait_seconds": ("histogram", "Time waited for a suggestion slot.", LATENCY_BUCKETS),
+    "modscout_conflict_rejected_total": ("counter", "Suggestion searches rejected by admission control.", ()),
+    "modscout_update_stage_seconds": ("histogram", "Duration of each update stage per system.", STAGE_BUCKETS),
+    "modscout_update_bytes_total": ("counter", "Spider output bytes fetched per system.", ()),
+    "modscout_updates_total": ("counter", "Finished updates per system and result.", ()),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    pairs = [f'{k}="{_escape(v)}"' for k, v in labels]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metrics:
+    """Prometheus metrics of one worker, merged across workers on scrape.
+
+    Each worker keeps its values in memory and regularly writes them to
+    `<metrics_dir>/<worker>.json`. `render` adds up the files of the live
+    workers, whichever one answers the scrape. Files of workers of this host
+    that exited, and files of workers of other hosts not written for
+    `stale_after` seconds, are deleted on scrape; their counters leave the totals, which
+    Prometheus handles like a counter reset.
+    """
+
+    def __init__(self, metrics_dir: str, worker: str, flush_interval: float, stale_after: float = 86400):
+        self.metrics_dir: str = metrics_dir
+        self.worker: str = worker
+        self.flush_interval: float = flush_interval
+        self.stale_after: float = stale_after
+        os.makedirs(metrics_dir, exist_ok=True)
+        # (name, labels) -> counter value, or histogram [bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, Labels], object] = {}
+        self._lock = threading.Lock()
+        self._flushed_at = 0.0
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+        self._maybe_flush()
+
+    def observe(self, name: str, value: float, **labels):
+        buckets = METRICS[name][2]
+        key = (name, _labels(labels))
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(buckets) + 2)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+        self._maybe_flush()
+
+    def time(self, name: str, **labels) -> "_Timer":
+        return _Timer(self, name, labels)
+
+    def _path(self, worker: str) -> str:
+        return os.path.join(self.metrics_dir, f"{worker.replace('/', '_')}.json")
+
+    def _dump(self) -> List:
+        with self._lock:
+            return [[name, list(labels), value] for (name, labels), value in self._values.items()]
+
+    def _maybe_flush(self):
+        if time.time() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self._flushed_at = time.time()
+        path = self._path(self.worker)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._dump(), f)
+        os.replace(tmp_path, path)
+
+    def _collect(self) -> Dict[Tuple[str, Labels], object]:
+        own = self._path(self.worker)
+        dumps = [self._dump()]
+        now = time.time()
+        for name in os.listdir(self.metrics_dir):
+            path = os.path.join(self.metrics_dir, name)
+            if not name.endswith(".json") or path == own:
+                continue
+            try:
+                worker = name[: -len(".json")]
+                # Workers of this host are checked by pid, those of other hosts by age
+                other_host = worker.rpartition(":")[0] != self.worker.rpartition(":")[0]
+                if not worker_alive(worker) or (other_host and now - os.path.getmtime(path) > self.stale_after):
+                    os.remove(path)
+                    continue
+                with open(path) as f:
+                    dumps.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+
+        merged: Dict[Tuple[str, Labels], object] = {}
+        for dump in dumps:
+            for name, labels, value in dump:
+                if name not in METRICS:
+                    continue
+                key = (name, tuple(tuple(label) for label in labels))
+                current = merged.get(key)
+                if current is None:
+                    merged[key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    merged[key] = [a + b for a, b in zip(current, value)]
+                else:
+                    merged[key] = current + value
+        return merged
+
+    def render(self, extra: Optional[Dict[str, Tuple[str, str, Dict[Labels, float]]]] = None) -> str:
+        """All workers' metrics in the Prometheus text format.
+
+        `extra` adds gauges known only at scrape time: name -> (type, help, {labels: value}).
+        """
+        merged = self._collect()
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            series = sorted((labels, value) for (n, labels), value in merged.items() if n == name)
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in series:
+                if kind != "histogram":
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                for bound, count in zip((*buckets, "+Inf"), (*value[: len(buckets)], value[-1])):
+                    le = bound if bound == "+Inf" else _format_value(bound)
+                    lines.append(f"{name}_bucket{_format_labels((*labels, ('le', le)))} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[-2])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {value[-1]}")
+        for name, (kind, help_text, series) in (extra or {}).items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class _Timer:
+    def __init__(self, metrics: Metrics, name: str, labels: Dict):
+        self._metrics = metrics
+        self._name = name
+        self._labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._started
+        self._metrics.observe(self._name, self.seconds, **self._labels)
@@ -0,0 +1,343 @@
+"""`module load` lines of job scripts, resolved against one catalog.
+
+`module_commands` picks the module commands out of a shell script and
+`ModuleResolver` replays them on a catalog: which module each name loads,
+whether the modules it sits under in the hierarchy (release, compiler and
+MPI chain) are loaded first, and which modules are loaded at the end.
+"""
+import re
+import shlex
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from app.catalog import IS_EXTENSION, CompactCatalog
+from app.compatibility import toolchain_chain
+from app.extension_index import ExtensionIndex
+from app.suggestion_engine import version_key
+from app.typeahead import SuggestIndex
+
+# Lines that may hold a module command; all others are skipped without tokenizing
+_MAYBE_MODULE = re.compile(r"(?:^|[\s;&|(`])(?:module|ml)(?:\s|$)")
+_SEPARATORS = {";", "&&", "||", "|", "&", "(", ")", ";;"}
+
+LOAD, UNLOAD, PURGE = "load", "unload", "purge"
+_SUBCOMMANDS = {
+    "load": LOAD,
+    "add": LOAD,
+    "try-load": LOAD,
+    "try-add": LOAD,
+    "unload": UNLOAD,
+    "rm": UNLOAD,
+    "del": UNLOAD,
+    "purge": PURGE,
+}
+_SWAP = {"swap", "switch", "sw"}
+# Release modules synthesized for spider entries without parents
+CORE_RELEASE = "Core"
+
+# Alternatives listed per problem
+MAX_ALTERNATIVES = 5
+
+# (line number, command text, action, module names)
+ModuleCommand = Tuple[int, str, str, List[str]]
+
+
+def _tokens(line: str) -> List[str]:
+    lexer = shlex.shlex(line, posix=True, punctuation_chars=True)
+    lexer.whitespace_split = True
+    try:
+        return list(lexer)
+    except ValueError:
+        # Unbalanced quotes; good enough for module names
+        return line.split("#", 1)[0].split()
+
+
+def _commands(words: List[str]) -> List[Tuple[str, List[str]]]:
+    """(action, names) of one `module ...` or `ml ...` invocation."""
+    tool, args = words[0], words[1:]
+    options = [arg for arg in args if arg.startswith("--")]
+    args = [arg for arg in args if not arg.startswith("--")]
+    if tool == "module":
+        # Short options (`module -q load x`) come before the subcommand
+        while args and args[0].startswith("-"):
+            args = args[1:]
+    if not args:
+        return []
+    subcommand = args[0]
+    if subcommand in _SWAP and len(args) >= 3:
+        return [(UNLOAD, [args[1]]), (LOAD, [args[2]])]
+    if subcommand in _SWAP and len(args) == 2:
+        # `module swap new` replaces the loaded module of the same package
+        return [(LOAD, [args[1]])]
+    if subcommand in _SUBCOMMANDS:
+        return [(_SUBCOMMANDS[subcommand], args[1:])]
+    if tool == "module" or options:
+        # avail, list, spider, show, ...
+        return []
+    # `ml a b -c` loads a and b and unloads c
+    commands = []
+    unload = [arg[1:] for arg in args if arg.startswith("-")]
+    if unload:
+        commands.append((UNLOAD, unload))
+    load = [arg for arg in args if not arg.startswith("-")]
+    if load:
+        commands.append((LOAD, load))
+    return commands
+
+
+def module_commands(script: str) -> List[ModuleCommand]:
+    """The module commands of a shell script, in order, with their line numbers.
+
+    Understands `module load|add|try-load|unload|rm|del|purge|swap` and Lmod's
+    `ml` shorthand, several commands per line (`;`, `&&`, ...), comments and
+    backslash continuations. Commands of other programs are ignored.
+    """
+    commands: List[ModuleCommand] = []
+    lines = script.splitlines()
+    i = 0
+    while i < len(lines):
+        number, line = i + 1, lines[i]
+        while line.endswith("\\") and i + 1 < len(lines):
+            i += 1
+            line = line[:-1] + " " + lines[i]
+        i += 1
+        if line.lstrip().startswith("#") or not _MAYBE_MODULE.search(line):
+            continue
+        words: List[str] = []
+        for token in [*_tokens(line), ";"]:
+            if token not in _SEPARATORS:
+                words.append(token)
+                continue
+            if words and words[0] in ("module", "ml"):
+                for action, names in _commands(words):
+                    commands.append((number, " ".join(words), action, names))
+            words = []
+    return commands
+
+
+class ModuleResolver:
+    """Name -> rows maps of the loadable modules of one catalog.
+
+    Built once per catalog version. A name resolves to the rows of that
+    module in every release and chain; a bare package name resolves to its
+    default, the newest version visible. A row is visible once its release
+    and every module of its compiler chain are loaded, as in an Lmod
+    hierarchy. Release and chain names are recognized as such even where the
+    catalog has no module row for them.
+    """
+
+    def __init__(self, catalog: CompactCatalog, extensions: Optional[ExtensionIndex] = None):
+        self.catalog: CompactCatalog = catalog
+        self.extensions: Optional[ExtensionIndex] = extensions
+        self._names: Dict[str, List[int]] = {}
+        self._packages: Dict[str, List[int]] = {}
+        # Lower-cased release/chain module name -> name as written in the catalog
+        self._releases: Dict[str, str] = {release.lower(): release for release in catalog}
+        self._toolchains: Dict[str, str] = {}
+        # Row -> lower-cased names that must be loaded to see it; None for extensions
+        self._requires: List[Optional[FrozenSet[str]]] = [None] * catalog.row_count
+
+        records = catalog.records
+        version_keys: Dict[int, Tuple] = {}
+        for release, compiler, rows in catalog.buckets():
+            if compiler.lower().endswith("_ext"):
+                continue
+            chain = toolchain_chain(compiler)
+            for name in chain:
+                self._toolchains.setdefault(name.lower(), name)
+            requires = frozenset(
+                [name.lower() for name in chain] + ([release.lower()] if release != CORE_RELEASE else [])
+            )
+            for row in rows:
+                if catalog.row_flags[row] & IS_EXTENSION:
+                    continue
+                self._requires[row] = requires
+                record_id = catalog.row_record[row]
+                record = records[record_id]
+                self._names.setdefault(record.name.lower(), []).append(row)
+                self._packages.setdefault(record.package.lower(), []).append(row)
+                if record_id not in version_keys:
+                    version_keys[record_id] = version_key(record.version)
+
+        # Newest version first, so the first visible row is Lmod's default
+        row_record = catalog.row_record
+        for rows in (*self._names.values(), *self._packages.values()):
+            rows.sort(key=lambda row: version_keys[row_record[row]], reverse=True)
+
+    def kind(self, name: str) -> Optional[str]:
+        """`release` or `toolchain` for names that only enable other modules, else None."""
+        key = name.lower()
+        if key in self._releases:
+            return "release"
+        if key in self._toolchains and key not in self._names:
+            return "toolchain"
+        return None
+
+    def candidates(self, name: str) -> List[int]:
+        key = name.lower()
+        rows = self._names.get(key)
+        if rows is None and "/" not in key:
+            rows = self._packages.get(key)
+        return rows or []
+
+    def best(self, rows: List[int], loaded: Set[str]) -> Tuple[int, List[str]]:
+        """The row Lmod would load given the `loaded` names, and what is missing to see it.
+
+        Among the visible rows the one deepest in the hierarchy wins, then the
+        newest. Without a visible row the one missing the fewest modules is
+        returned, with their names.
+        """
+        best_row, best_score = rows[0], None
+        for row in rows:
+            requires = self._requires[row]
+            met = len(requires & loaded)
+            score = (met == len(requires), met - len(requires), met)
+            if best_score is None or score > best_score:
+                best_row, best_score = row, score
+        missing = self._requires[best_row] - loaded
+        return best_row, sorted(self._display(name) for name in missing)
+
+    def visible(self, package: str, loaded: Set[str], limit: int = MAX_ALTERNATIVES) -> List[int]:
+        """Rows of other versions of `package` visible with the `loaded` names, newest first."""
+        rows, seen = [], set()
+        records, row_record = self.catalog.records, self.catalog.row_record
+        for row in self._packages.get(package.lower(), ()):
+            name = records[row_record[row]].name
+            if name not in seen and self._requires[row] <= loaded:
+                seen.add(name)
+                rows.append(row)
+                if len(rows) >= limit:
+                    break
+        return rows
+
+    def requirements(self, row: int) -> FrozenSet[str]:
+        return self._requires[row]
+
+    def _display(self, key: str) -> str:
+        return self._releases.get(key) or self._toolchains.get(key) or key
+
+    def module(self, row: int) -> Dict:
+        entry = self.catalog.entry(row)
+        return {
+            "name": entry.get("name", ""),
+            "release": entry.get("release", ""),
+            "compiler": entry.get("compiler", ""),
+            "load_cmd": entry.get("load_cmd", ""),
+        }
+
+
+def _unload(name: str, loaded: Set[str], modules: Dict[str, Tuple[str, int]]):
+    key = name.lower()
+    loaded.discard(key)
+    package = key.split("/", 1)[0]
+    current = modules.get(package)
+    if current is not None and (current[0] == key or package == key):
+        loaded.discard(current[0])
+        del modules[package]
+
+
+def _nearest(suggest_index: SuggestIndex, name: str) -> List[Dict]:
+    """Completions of the longest prefix of `name` that has some."""
+    for end in range(len(name), 1, -1):
+        items = suggest_index.suggest(name[:end], MAX_ALTERNATIVES)
+        if items:
+            return items
+    return []
+
+
+def validate_script(
+    resolver: ModuleResolver, script: str, suggest_index: Optional[SuggestIndex] = None
+) -> Tuple[Dict, List[int]]:
+    """Replay the module commands of `script` and report every name they load.
+
+    Returns the report and the rows of the modules loaded at the end, without
+    those only loaded to make others visible; these are what the conflict
+    check looks at. Loading another version of a loaded package replaces it,
+    like Lmod does. Per name the status is one of:
+
+    - `ok`: resolved, and visible with the modules loaded before it
+    - `hidden`: resolved, but its release or chain modules in `missing` are
+      not loaded before it. A warning: a loaded modulefile may load them
+      itself (e.g. GCC loading GCCcore), which the catalog does not record
+    - `extension`: an extension, available by loading a module in
+      `alternatives`. A warning, like `hidden`
+    - `not_found`: no such module
+    - `dynamic`: built from shell variables or substitutions, not checked
+    """
+    catalog = resolver.catalog
+    loaded: Set[str] = set()
+    # Package -> (lower-cased name, row) of the loaded modules
+    modules: Dict[str, Tuple[str, int]] = {}
+    lines: List[Dict] = []
+    errors = warnings = 0
+
+    for number, command, action, names in module_commands(script):
+        if action == PURGE:
+            loaded.clear()
+            modules.clear()
+        results = []
+        for name in names:
+            if action == UNLOAD:
+                _unload(name, loaded, modules)
+                continue
+            result: Dict = {"token": name}
+            results.append(result)
+            if "$" in name or "`" in name:
+                result["status"] = "dynamic"
+                continue
+            kind = resolver.kind(name)
+            if kind is not None:
+                result.update(kind=kind, status="ok")
+                loaded.add(name.lower())
+                continue
+            rows = resolver.candidates(name)
+            if rows:
+                row, missing = resolver.best(rows, loaded)
+                result.update(resolver.module(row), kind="module", status="hidden" if missing else "ok")
+                if missing:
+                    warnings += 1
+                    result["missing"] = missing
+                    result["alternatives"] = [
+                        resolver.module(alternative)
+                        for alternative in resolver.visible(catalog.records[catalog.row_record[row]].package, loaded)
+                    ]
+                key = result["name"].lower()
+                package = catalog.records[catalog.row_record[row]].package.lower()
+                replaced = modules.get(package)
+                if replaced is not None and replaced[0] != key:
+                    loaded.discard(replaced[0])
+                    result["replaces"] = catalog.records[catalog.row_record[replaced[1]]].name
+                modules[package] = (key, row)
+                loaded.add(key)
+                continue
+
+            providers = resolver.extensions.lookup(name) if resolver.extensions is not None else []
+            if providers:
+                warnings += 1
+                result.update(kind="extension", status="extension", alternatives=providers[:MAX_ALTERNATIVES])
+                continue
+            errors += 1
+            result.update(status="not_found", alternatives=[])
+            package = name.split("/", 1)[0]
+            if resolver.candidates(package):
+                # Known package, unknown version
+                result["alternatives"] = [resolver.module(row) for row in resolver.visible(package, loaded)] or [
+                    resolver.module(row) for row in resolver.candidates(package)[:MAX_ALTERNATIVES]
+                ]
+            elif suggest_index is not None:
+                result["alternatives"] = [
+                    {"name": item["text"], "kind": item["kind"]} for item in _nearest(suggest_index, package)
+                ]
+        lines.append({"line": number, "command": command, "action": action, "modules": results})
+
+    # Modules loaded only so that others are visible are not part of the selection
+    needed: Set[str] = set()
+    for _, row in modules.values():
+        needed |= resolver.requirements(row)
+    selected = [row for key, row in modules.values() if key not in needed]
+    report = {
+        "errors": errors,
+        "warnings": warnings,
+        "lines": lines,
+        "loaded": [catalog.records[catalog.row_record[row]].name for row in selected],
+    }
+    return report, selected
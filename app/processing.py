@@ -0,0 +1,139 @@
+"""Turning raw spider entries into catalog placements, in worker processes.
+
+Nothing here imports Flask state: the functions run in the processes of
+`AppConfig.process_pool`, which keeps the CPU-bound part of an update off
+the GIL of the web worker.
+"""
+import re
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Tuple
+
+from app.incremental import Fragment, fingerprint
+
+_DESCRIPTION_HEADER = re.compile(r"^Description =========== ", re.IGNORECASE)
+_MORE_INFORMATION = re.compile(r" More information ================ ", re.IGNORECASE)
+_INCLUDED_EXTENSIONS = re.compile(r" Included extensions ===================.*", re.IGNORECASE)
+
+# Smallest shard sent to the pool, and shards per pool worker for load balancing
+SHARD_SIZE = 250
+SHARDS_PER_WORKER = 4
+
+# Bumped whenever process_package changes its output, so the fragments of
+# unchanged packages kept from the previous build are not reused
+PROCESSING_FORMAT = 2
+
+# Key of a raw entry, its fingerprint and its fragment (None if unchanged)
+ProcessedEntry = Tuple[str, str, Optional[Fragment]]
+
+
+def normalize_description(help_text: str, extensions: List[str]) -> str:
+    description = help_text.replace("\n", " ").replace("\r", " ").strip().replace("  ", " ").strip()
+    description = _DESCRIPTION_HEADER.sub("Description\n===========\n", description)
+    description = _MORE_INFORMATION.sub("\n\nMore information\n================\n", description)
+    description = _INCLUDED_EXTENSIONS.sub("\n\nIncluded extensions\n===================\n", description)
+    return description + "\n".join(extensions)
+
+
+def process_package(entry):
+    """Turn one raw spider package into its (release, compiler, module) placements."""
+    fragment = []
+    package = entry["package"]
+    # description = entry.get("description", "No description available.")
+    url = entry.get("url", "No URL available.").strip()
+    for version in entry["versions"]:
+        v_name = version["versionName"]
+        full_name = f"{package}/{v_name}"
+
+        extenstions = version.get("provides", [])
+
+        description = normalize_description(version.get("help", "No description available."), extenstions)
+
+        release = None
+        for parent_set in version.get("parent", []):
+            release = parent_set[0] if len(parent_set) > 0 else "Core"
+            compiler = " ".join(parent_set[1:]) if len(parent_set) > 1 else ""
+
+            fragment.append(
+                (
+                    release,
+                    compiler,
+                    {
+                        "package": package,
+                        "version": v_name,
+                        "name": full_name,
+                        "description": description,
+                        "url": url,
+                        "release": release,
+                        "compiler": compiler,
+                        "load_cmd": f"module load {release} {compiler} {full_name}",
+                        # "extension_list": extenstions,
+                        "is_extension": False,
+                    },
+                )
+            )
+
+        # Extensions are listed under the last placement of the version
+        if len(extenstions) == 0 or release is None:
+            continue
+        else:
+            if compiler != "":
+                extension_compiler = f"{compiler} {full_name}_Ext"
+            else:
+                extension_compiler = f"{full_name}_Ext"
+
+            listed = set()
+            for extension_i in extenstions:
+                if extension_i in listed:
+                    continue
+                listed.add(extension_i)
+                extension_package = extension_i.split("/")
+                if len(extension_package) > 1:
+                    extension_package_full = extension_package[0]
+                    extension_version = extension_package[1]
+                else:
+                    extension_package_full = extension_i
+                    extension_version = ""
+                fragment.append(
+                    (
+                        release,
+                        extension_compiler,
+                        {
+                            "package": extension_package_full,
+                            "version": extension_version,
+                            "name": extension_i,
+                            "description": f"This is an extension automatically available by loading {full_name} module.",
+                            "url": "",
+                            "release": release,
+                            "compiler": extension_compiler,
+                            "parent": full_name,
+                            "is_extension": True,
+                            "load_cmd": f"module load {release} {compiler} {full_name}"
+                        },
+                    )
+                )
+    return fragment
+
+
+def process_shard(shard: List[Tuple[str, Dict, Optional[str]]]) -> List[ProcessedEntry]:
+    """Fingerprint a shard of (key, entry, previous fingerprint) and process the changed entries."""
+    processed = []
+    for key, entry, previous in shard:
+        entry_fingerprint = fingerprint(entry, PROCESSING_FORMAT)
+        fragment = process_package(entry) if entry_fingerprint != previous else None
+        processed.append((key, entry_fingerprint, fragment))
+    return processed
+
+
+def process_entries(
+    entries: List[Tuple[str, Dict, Optional[str]]], pool: Optional[Executor] = None, workers: int = 1
+) -> List[ProcessedEntry]:
+    """`process_shard` over all entries, sharded across `pool` when given.
+
+    Results come back in the order of `entries` however the shards were
+    scheduled, so the merged tree does not depend on the pool.
+    """
+    if pool is None:
+        return process_shard(entries)
+    size = max(SHARD_SIZE, -(-len(entries) // (workers * SHARDS_PER_WORKER)))
+    shards = [entries[i : i + size] for i in range(0, len(entries), size)]
+    return [processed for shard in pool.map(process_shard, shards) for processed in shard]
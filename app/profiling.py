@@ -0,0 +1,55 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+
+class SamplingProfiler:
+    """Samples the stack of one thread at a fixed interval.
+
+    A background thread reads the target thread's current frame every
+    `interval` seconds, so the profiled code runs unmodified and the overhead
+    does not depend on how many functions it calls. Stacks are written in the
+    collapsed format (`outer;inner;leaf count`) read by flamegraph.pl and
+    speedscope.
+    """
+
+    def __init__(self, interval: float, thread_id: Optional[int] = None):
+        self.interval: float = interval
+        self.thread_id: int = thread_id if thread_id is not None else threading.get_ident()
+        self.stacks: Counter = Counter()
+        self.samples: int = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="modscout-profiler", daemon=True)
+
+    def start(self) -> "SamplingProfiler":
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.seconds = time.perf_counter() - self.started
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def write(self, path: str):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        os.replace(tmp_path, path)
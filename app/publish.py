@@ -0,0 +1,142 @@
+import hashlib
+import os
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from app import jsonio
+from app.streaming import PRECOMPRESSED_SUFFIXES, write_precompressed
+
+# Memory-mappable copy of a published file, see CompactCatalog.write_binary
+BINARY_SUFFIX = ".bin"
+# SQLite copy used by the sqlite catalog backend, see sqlite_store.write_sqlite
+SQLITE_SUFFIX = ".sqlite3"
+# Precomputed bucket pages of the lazy browsing API, see slices.write_slices
+SLICES_SUFFIX = ".slices"
+# Serialized search/extension/typeahead indexes, see index_snapshot.write_index_snapshot
+INDEX_SUFFIX = ".index"
+ARTIFACT_SUFFIXES = (BINARY_SUFFIX, SQLITE_SUFFIX, SLICES_SUFFIX, INDEX_SUFFIX, *PRECOMPRESSED_SUFFIXES.values())
+
+
+def current_path(data_dir: str, system: str) -> str:
+    """The `current` pointer of a system, a symlink to the published version."""
+    return os.path.join(data_dir, f"processed_module_{system}.json")
+
+
+def versions_dir(data_dir: str, system: str) -> str:
+    return os.path.join(data_dir, "versions", system)
+
+
+def version_path(data_dir: str, system: str, version: str) -> str:
+    return os.path.join(versions_dir(data_dir, system), f"processed_module_{system}-{version}.json")
+
+
+def version_of(path: str, system: str) -> Optional[str]:
+    """Version encoded in the name of a published file, None for other files."""
+    prefix = f"processed_module_{system}-"
+    name = os.path.basename(path)
+    if name.startswith(prefix) and name.endswith(".json"):
+        return name[len(prefix) : -len(".json")]
+    return None
+
+
+def list_versions(data_dir: str, system: str) -> List[str]:
+    """Published versions of a system, oldest first."""
+    try:
+        names = os.listdir(versions_dir(data_dir, system))
+    except FileNotFoundError:
+        return []
+    return sorted(v for v in (version_of(n, system) for n in names) if v is not None)
+
+
+def current_version(data_dir: str, system: str) -> Optional[str]:
+    """Version the `current` pointer refers to.
+
+    Catalogs written before versioned publishing are plain files; their
+    version is derived from mtime and size.
+    """
+    path = current_path(data_dir, system)
+    version = version_of(os.path.realpath(path), system)
+    if version is not None:
+        return version
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+def _swap_link(target: str, link: str):
+    """Atomically point `link` at `target` (symlink, then rename over the old one)."""
+    tmp = f"{link}.tmp-{os.getpid()}"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    os.symlink(os.path.relpath(target, os.path.dirname(link)), tmp)
+    os.replace(tmp, link)
+
+
+def activate_version(data_dir: str, system: str, version: str):
+    """Swap the `current` pointers of a system to an already published version.
+
+    The JSON pointer is swapped before the compressed ones. A compressed copy
+    older than the JSON it belongs to is never served, see
+    `precompressed_path`.
+    """
+    path = version_path(data_dir, system, version)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No published version {version} for {system}")
+    link = current_path(data_dir, system)
+    _swap_link(path, link)
+    for suffix in PRECOMPRESSED_SUFFIXES.values():
+        if os.path.exists(path + suffix):
+            _swap_link(path + suffix, link + suffix)
+        elif os.path.lexists(link + suffix):
+            os.remove(link + suffix)
+
+
+def publish_version(
+    data_dir: str,
+    system: str,
+    tree: Dict,
+    keep: int,
+    artifacts: Optional[Dict[str, Callable[[str], None]]] = None,
+) -> str:
+    """Write a new immutable catalog version and make it the current one.
+
+    Readers opening `processed_module_<system>.json` get either the previous
+    or the new version in full, never a partially written file. The `keep`
+    newest versions are retained for rollback. `artifacts` maps a suffix to a
+    function writing another representation of the version to
+    `<version file><suffix>` before it is activated.
+    """
+    os.makedirs(versions_dir(data_dir, system), exist_ok=True)
+    tmp_path = os.path.join(versions_dir(data_dir, system), f".building-{os.getpid()}.json")
+    with open(tmp_path, "wb") as f:
+        jsonio.dump(tree, f)
+        f.flush()
+        os.fsync(f.fileno())
+
+    digest = hashlib.sha1()
+    with open(tmp_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    version = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{digest.hexdigest()[:8]}"
+    path = version_path(data_dir, system, version)
+    os.replace(tmp_path, path)
+    write_precompressed(path)
+    for suffix, write in (artifacts or {}).items():
+        write(path + suffix)
+
+    activate_version(data_dir, system, version)
+    prune_versions(data_dir, system, keep)
+    return version
+
+
+def prune_versions(data_dir: str, system: str, keep: int):
+    current = current_version(data_dir, system)
+    for version in list_versions(data_dir, system)[:-keep] if keep > 0 else []:
+        if version == current:
+            continue
+        path = version_path(data_dir, system, version)
+        for suffix in ("", *ARTIFACT_SUFFIXES):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
@@ -0,0 +1,80 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+def normalize_query(query: Optional[str]) -> str:
+    """Canonical form of a search query; search is case-insensitive and ignores blanks."""
+    return ",".join(q.strip().lower() for q in (query or "").split(",") if q.strip())
+
+
+def selection_key(selected, max_suggestions: int) -> str:
+    """Hash of a conflict request.
+
+    The order of the selection is kept: the conflict message, the
+    `conflicting` modules and the suggestions all follow it.
+    """
+    canonical = [
+        {k: str(m.get(k, "")).strip() for k in ("name", "package", "version", "release", "compiler")} for m in selected
+    ]
+    return hashlib.sha1(json.dumps([canonical, max_suggestions], sort_keys=True).encode()).hexdigest()
+
+
+class ResponseCache:
+    """Bounded LRU cache of serialized responses.
+
+    Entries are keyed on (system, kind, key) and remember the catalog version
+    they were computed from; an entry of another version is never returned.
+    `invalidate` drops every entry of a system and is registered as catalog
+    cache listener, so republishing a system empties its share of the cache.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries: int = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, Hashable], Tuple[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.invalidations: int = 0
+
+    def get(self, system: str, kind: str, key: Hashable, version: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get((system, kind, key))
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((system, kind, key))
+            self.hits += 1
+            return entry[1]
+
+    def put(self, system: str, kind: str, key: Hashable, version: str, value: Any):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[(system, kind, key)] = (version, value)
+            self._entries.move_to_end((system, kind, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, system: str, snapshot=None):
+        with self._lock:
+            for cache_key in [k for k in self._entries if k[0] == system]:
+                del self._entries[cache_key]
+                self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -1,23 +1,139 @@
+import hashlib
 import os
-import threading
+import time
 from flask import (
+    g,
     jsonify,
     render_template,
     request,
     send_file,
     Blueprint,
+    Response,
     current_app
 )
 from app.utils import (
-    suggestions,
-    has_conflict,
-    fetch_module_data,
+    find_conflict,
+    start_updates,
     search,
-    get_data_dictionary
+    get_snapshot,
+    get_search_index,
+    get_extension_index,
+    get_suggest_index,
+    get_bucket_slices,
+    get_description_index,
+    get_compatibility_graph,
+    get_module_resolver,
+    budgeted_suggestions
 )
+from app.streaming import (
+    encode_chunks,
+    iter_ndjson,
+    paginate,
+    parse_page_args,
+    pick_encoding,
+    precompressed_path,
+    release_rows
+)
+from app.incremental import clear_state
+from app.response_cache import normalize_query, selection_key
+from app.publish import activate_version, current_path, current_version, list_versions
+from app.profiling import SamplingProfiler
+from app.batch import item_error, run_batch
+from app.admission import Rejected
+from app.typeahead import DEFAULT_SUGGEST_LIMIT, MAX_SUGGEST_LIMIT
+from app.module_lines import validate_script
 
 routes_bp = Blueprint('routes', __name__)
 
+
+################################################################################
+# Instrumentation
+################################################################################
+@routes_bp.before_request
+def start_request_timer():
+    cfg = current_app.config["CUSTOM_CONFIG"]
+    g.request_started = time.perf_counter()
+    # Opt-in per request: `X-Profile: 1` samples the stack of this request
+    if cfg.profiling and request.headers.get("X-Profile"):
+        g.profiler = SamplingProfiler(cfg.profile_interval).start()
+
+
+def system_label(system):
+    """Metric label of a requested system; unknown names share one series."""
+    return system if system in current_app.config["CUSTOM_CONFIG"].systems else "unknown"
+
+
+def count_bytes(chunks, sizes):
+    for chunk in chunks:
+        sizes.append(len(chunk))
+        yield chunk
+
+
+@routes_bp.after_request
+def record_request(response):
+    cfg = current_app.config["CUSTOM_CONFIG"]
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    labels = {"route": route, "method": request.method, "status": response.status_code}
+    started = g.request_started
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        os.makedirs(cfg.profile_dir, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}-{route.strip('/').replace('/', '_') or 'index'}.txt"
+        response.headers["X-Profile"] = name
+
+    # Streamed bodies are only complete once the server closes them
+    sizes = []
+    if response.content_length is not None:
+        sizes.append(response.content_length)
+    elif response.is_streamed and not response.direct_passthrough:
+        response.response = count_bytes(response.response, sizes)
+
+    def finish():
+        cfg.metrics.observe("modscout_http_request_duration_seconds", time.perf_counter() - started, **labels)
+        cfg.metrics.observe("modscout_http_response_size_bytes", sum(sizes), **labels)
+        if profiler is not None:
+            profiler.stop()
+            profiler.write(os.path.join(cfg.profile_dir, name))
+
+    response.call_on_close(finish)
+    return response
+
+
+@routes_bp.route("/metrics", methods=["GET"])
+def metrics():
+    cfg = current_app.config["CUSTOM_CONFIG"]
+    jobs = cfg.jobs.status()
+    extra = {
+        "modscout_update_running": (
+            "gauge",
+            "1 while an update of the system is running.",
+            {(("system", system),): int(bool(job["is_running"])) for system, job in jobs.items()},
+        ),
+        "modscout_conflict_running": (
+            "gauge",
+            "Suggestion searches running in the worker answering the scrape.",
+            {(("worker", cfg.worker_id),): cfg.conflict_gate.running},
+        ),
+        "modscout_conflict_queued": (
+            "gauge",
+            "Suggestion searches waiting for a slot in the worker answering the scrape.",
+            {(("worker", cfg.worker_id),): cfg.conflict_gate.waiting},
+        ),
+    }
+    return Response(cfg.metrics.render(extra), mimetype="text/plain; version=0.0.4")
+
+
+@routes_bp.route("/debug/profile/<name>", methods=["GET"])
+def debug_profile(name):
+    cfg = current_app.config["CUSTOM_CONFIG"]
+    if not cfg.profiling:
+        return jsonify({"error": "Profiling is disabled"}), 404
+    path = os.path.join(cfg.profile_dir, os.path.basename(name))
+    if not os.path.isfile(path):
+        return jsonify({"error": f"Unknown profile {name}"}), 404
+    return send_file(path, mimetype="text/plain")
+
+
 ################################################################################
 # Routes
 ################################################################################
@@ -27,27 +143,36 @@ def index():
 
 @routes_bp.route("/update", methods=["GET"])
 def update():
-    app = current_app._get_current_object()
-    for sys in current_app.config["CUSTOM_CONFIG"].systems.keys():
-        print(f"Starting update for {sys}")
-        threading.Thread(target=fetch_module_data, args=(app, sys)).start()
+    start_updates(current_app._get_current_object())
     return jsonify({"message": "Update started"}), 202
 
 
 @routes_bp.route("/status", methods=["GET"])
 def get_status():
-    for i in current_app.config["CUSTOM_CONFIG"].update_job_status.keys():
-        if current_app.config["CUSTOM_CONFIG"].update_job_status[i]["is_running"]:
-            return jsonify(
-                {
-                    "status": "running",
-                    "last_run": current_app.config["CUSTOM_CONFIG"].update_job_status[i]["last_run"],
-                }
-            )
-        else:
-            job_status = "completed"
-            last_run = current_app.config["CUSTOM_CONFIG"].update_job_status[i]["last_run"]
-    return jsonify({"status": job_status, "last_run": last_run})
+    jobs = current_app.config["CUSTOM_CONFIG"].jobs.status()
+    running = any(job["is_running"] for job in jobs.values())
+    last_runs = [job["last_run"] for job in jobs.values() if job["last_run"] != "Never"]
+    return jsonify(
+        {
+            "status": "running" if running else "completed",
+            "last_run": max(last_runs, default="Never"),
+            "systems": jobs,
+        }
+    )
+
+
+@routes_bp.route("/status/ready", methods=["GET"])
+def get_ready():
+    """Readiness of the answering worker: 503 until its catalogs are warm."""
+    cfg = current_app.config["CUSTOM_CONFIG"]
+    status = dict(cfg.warmup.status(), worker=cfg.worker_id)
+    return jsonify(status), 200 if status["ready"] else 503
+
+
+@routes_bp.route("/status/cache", methods=["GET"])
+def get_cache_status():
+    cfg = current_app.config["CUSTOM_CONFIG"]
+    return jsonify({"catalog": cfg.catalog_cache.stats(), "responses": cfg.response_cache.stats()})
 
 
 @routes_bp.route("/module",methods=["GET"])
@@ -56,20 +181,189 @@ def module():
     return render_template("module.html", system=system)
 
 
+def catalog_etag(system, snapshot, *parts):
+    """Strong ETag of a response derived from one catalog version."""
+    version = snapshot.version if snapshot is not None else "empty"
+    return "-".join(str(p) for p in (system, version, *parts))
+
+
+def add_validators(response, etag, snapshot=None):
+    cfg = current_app.config["CUSTOM_CONFIG"]
+    response.set_etag(etag)
+    if snapshot is not None:
+        response.last_modified = snapshot.modified_at
+    response.cache_control.public = True
+    response.cache_control.max_age = cfg.http_max_age
+    return response
+
+
+def not_modified(etag, snapshot=None):
+    """Answer 304 before any work is done if the client already has `etag`."""
+    if request.if_none_match.contains(etag):
+        return add_validators(Response(status=304), etag, snapshot)
+    return None
+
+
+def cached_json(body, etag, snapshot=None):
+    response = add_validators(Response(body, mimetype="application/json"), etag, snapshot)
+    return response.make_conditional(request)
+
+
+def stream_rows(catalog, page, next_cursor, etag=None, snapshot=None):
+    """Stream catalog rows as NDJSON, compressed if the client accepts it."""
+    encoding = pick_encoding(request.accept_encodings)
+    response = Response(encode_chunks(iter_ndjson(catalog, page), encoding), mimetype="application/x-ndjson")
+    response.headers["Vary"] = "Accept-Encoding"
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    if etag is not None:
+        add_validators(response, f"{etag}-{encoding or 'identity'}", snapshot)
+    return response
+
+
 @routes_bp.route("/module/data", methods=["GET"])
 def module_data():
     system = request.args.get("system")
+    if request.args.get("format") == "ndjson":
+        try:
+            limit, cursor, releases = parse_page_args(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        snapshot = get_snapshot(system)
+        if snapshot is None or not snapshot.data:
+            return jsonify({"error": "Data file not found"}), 404
+        etag = catalog_etag(system, snapshot, "ndjson")
+        cached = not_modified(f"{etag}-{pick_encoding(request.accept_encodings) or 'identity'}", snapshot)
+        if cached is not None:
+            return cached
+        page, next_cursor = paginate(release_rows(snapshot.data, releases), cursor, limit)
+        return stream_rows(snapshot.data, page, next_cursor, etag, snapshot)
+
     try:
-        file_path = os.path.join(current_app.config["CUSTOM_CONFIG"].data_dir, f"processed_module_{system}.json")
-        return send_file(file_path, mimetype="application/json")
+        cfg = current_app.config["CUSTOM_CONFIG"]
+        data_dir = cfg.data_dir
+        # Resolve the pointer once so file, compressed copy and ETag belong to the same version
+        file_path = os.path.realpath(current_path(data_dir, system))
+        version = current_version(data_dir, system)
+        compressed_path, encoding = precompressed_path(file_path, request.accept_encodings)
+        if compressed_path is None:
+            return send_file(file_path, mimetype="application/json", etag=f"{system}-{version}", max_age=cfg.http_max_age)
+        response = send_file(
+            compressed_path, mimetype="application/json", etag=f"{system}-{version}-{encoding}", max_age=cfg.http_max_age
+        )
+        response.headers["Content-Encoding"] = encoding
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
     except FileNotFoundError:
         return jsonify({"error": "Data file not found"}), 404  
     
+@routes_bp.route("/module/skeleton", methods=["GET"])
+def module_skeleton():
+    """Release -> compiler buckets of a system with module and page counts."""
+    system = request.args.get("system")
+    snapshot = get_snapshot(system)
+    if snapshot is None:
+        return jsonify({"error": "Data file not found"}), 404
+    etag = catalog_etag(system, snapshot, "skeleton")
+    cached = not_modified(etag, snapshot)
+    if cached is not None:
+        return cached
+    return cached_json(get_bucket_slices(system, snapshot).skeleton_body, etag, snapshot)
+
+
+@routes_bp.route("/module/bucket", methods=["GET"])
+def module_bucket():
+    """One page of the modules of a release/compiler bucket, without descriptions."""
+    system = request.args.get("system")
+    release = request.args.get("release", "")
+    compiler = request.args.get("compiler", "")
+    try:
+        page = int(request.args.get("page", 0))
+    except ValueError:
+        return jsonify({"error": "page must be an integer"}), 400
+    snapshot = get_snapshot(system)
+    if snapshot is None:
+        return jsonify({"error": "Data file not found"}), 404
+    etag = catalog_etag(system, snapshot, "bucket", hashlib.sha1(f"{release}\n{compiler}".encode()).hexdigest()[:12], page)
+    cached = not_modified(etag, snapshot)
+    if cached is not None:
+        return cached
+    body = get_bucket_slices(system, snapshot).page(release, compiler, page)
+    if body is None:
+        return jsonify({"error": f"No page {page} of bucket {release!r} / {compiler!r}"}), 404
+    return cached_json(body, etag, snapshot)
+
+
+@routes_bp.route("/module/description", methods=["GET"])
+def module_description():
+    system = request.args.get("system")
+    name = request.args.get("name", "")
+    release = request.args.get("release", "")
+    compiler = request.args.get("compiler", "")
+    snapshot = get_snapshot(system)
+    record_id = get_description_index(system, snapshot).get((release, compiler, name))
+    if record_id is None:
+        return jsonify({"error": f"Unknown module {name} in {release!r} / {compiler!r}"}), 404
+    etag = catalog_etag(system, snapshot, "description", record_id)
+    cached = not_modified(etag, snapshot)
+    if cached is not None:
+        return cached
+    record = snapshot.data.records[record_id]
+    return add_validators(
+        jsonify({"name": record.name, "description": record.description, "url": record.url}), etag, snapshot
+    )
+
+
+@routes_bp.route("/module/versions", methods=["GET"])
+def module_versions():
+    system = request.args.get("system")
+    cfg = current_app.config["CUSTOM_CONFIG"]
+    if system not in cfg.systems:
+        return jsonify({"error": f"Unknown system {system}"}), 404
+    return jsonify(
+        {
+            "system": system,
+            "current": current_version(cfg.data_dir, system),
+            "versions": list_versions(cfg.data_dir, system),
+        }
+    )
+
+
+@routes_bp.route("/module/rollback", methods=["POST"])
+def module_rollback():
+    data = request.get_json(force=True, silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Body must be a JSON object with 'system' and 'version'"}), 400
+    system = data.get("system", "")
+    version = data.get("version", "")
+    if not isinstance(system, str) or not isinstance(version, str):
+        return jsonify({"error": "'system' and 'version' must be strings"}), 400
+    cfg = current_app.config["CUSTOM_CONFIG"]
+    if system not in cfg.systems:
+        return jsonify({"error": f"Unknown system {system}"}), 404
+    if version not in list_versions(cfg.data_dir, system):
+        return jsonify({"error": f"Unknown version {version} for {system}"}), 404
+    if not cfg.jobs.try_start(system, cfg.worker_id):
+        return jsonify({"error": f"An update of {system} is running"}), 409
+    try:
+        activate_version(cfg.data_dir, system, version)
+        # The build state describes the newest build, not the restored one
+        clear_state(cfg.data_dir, system)
+    finally:
+        cfg.jobs.release(system, cfg.worker_id)
+    # The cache notices the swapped pointer on its next lookup
+    snapshot = cfg.catalog_cache.get(system)
+    return jsonify({"system": system, "current": snapshot.version if snapshot else version})
+
+
 @routes_bp.route("/module/system_list", methods=["GET"])
 def module_system_list():
     try:
         systems = list(current_app.config["CUSTOM_CONFIG"].systems.keys())
-        return jsonify({"systems": systems})
+        etag = hashlib.sha1("\n".join(systems).encode()).hexdigest()[:16]
+        return add_validators(jsonify({"systems": systems}), etag).make_conditional(request)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -77,10 +371,120 @@ def module_system_list():
 @routes_bp.route("/module/search", methods=["GET"])
 def search_module():
     system = request.args.get("system")
-    search_query = request.args.get("query", "")
-    data = get_data_dictionary(system)
-    filtered_data = search(data, search_query)
-    return jsonify(filtered_data)
+    search_query = normalize_query(request.args.get("query", ""))
+    snapshot = get_snapshot(system)
+    if request.args.get("format") == "ndjson":
+        try:
+            limit, cursor, releases = parse_page_args(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        etag = catalog_etag(system, snapshot, "ndjson")
+        cached = not_modified(f"{etag}-{pick_encoding(request.accept_encodings) or 'identity'}", snapshot)
+        if cached is not None:
+            return cached
+        cfg = current_app.config["CUSTOM_CONFIG"]
+        index = get_search_index(system, snapshot)
+        relevance = request.args.get("order") == "relevance"
+        if relevance and not hasattr(index, "ranked_rows"):
+            return jsonify({"error": "order=relevance needs CATALOG_BACKEND=sqlite"}), 400
+        catalog = index.data
+        with cfg.metrics.time("modscout_search_seconds", system=system_label(system), format="ndjson"):
+            rows = index.ranked_rows(search_query) if relevance else index.rows(search_query)
+        if releases:
+            release_ids = {catalog.string_id(r) for r in releases}
+            rows = [row for row in rows if catalog.row_release[row] in release_ids]
+        if relevance:
+            # Ranked rows are not sorted by id, the cursor is an offset instead
+            stop = len(rows) if limit is None else cursor + limit
+            page, next_cursor = [rows[cursor:stop]], (stop if stop < len(rows) else None)
+        else:
+            page, next_cursor = paginate([rows], cursor, limit)
+        return stream_rows(catalog, page, next_cursor, etag, snapshot)
+
+    etag = catalog_etag(system, snapshot)
+    cached = not_modified(etag, snapshot)
+    if cached is not None:
+        return cached
+    return cached_json(search_body(system, snapshot, search_query), etag, snapshot)
+
+
+@routes_bp.route("/module/suggest", methods=["GET"])
+def suggest_module():
+    """Typeahead completions of a package or module name prefix."""
+    system = request.args.get("system")
+    query = request.args.get("query", "")
+    try:
+        limit = int(request.args.get("limit", DEFAULT_SUGGEST_LIMIT))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    if not 1 <= limit <= MAX_SUGGEST_LIMIT:
+        return jsonify({"error": f"limit must be between 1 and {MAX_SUGGEST_LIMIT}"}), 400
+    snapshot = get_snapshot(system)
+    etag = catalog_etag(system, snapshot, "suggest")
+    cached = not_modified(etag, snapshot)
+    if cached is not None:
+        return cached
+    cfg = current_app.config["CUSTOM_CONFIG"]
+    index = get_suggest_index(system, snapshot)
+    with cfg.metrics.time("modscout_search_seconds", system=system_label(system), format="suggest"):
+        suggestions = index.suggest(query, limit)
+    response = add_validators(jsonify({"query": query, "suggestions": suggestions}), etag, snapshot)
+    return response.make_conditional(request)
+
+
+def search_body(system, snapshot, search_query):
+    """JSON body of a normalized search query, from the response cache if possible."""
+    cfg = current_app.config["CUSTOM_CONFIG"]
+    version = snapshot.version if snapshot is not None else "empty"
+    body = cfg.response_cache.get(system, "search", search_query, version)
+    if body is None:
+        index = get_search_index(system, snapshot)
+        with cfg.metrics.time("modscout_search_seconds", system=system_label(system), format="json"):
+            result = search(index.data, search_query, index=index)
+        body = current_app.json.response(result).get_data()
+        cfg.response_cache.put(system, "search", search_query, version, body)
+    return body
+
+
+@routes_bp.route("/module/availability", methods=["GET"])
+def module_availability():
+    package = request.args.get("package", "").strip()
+    version = request.args.get("version", "").strip() or None
+    if not package:
+        return jsonify({"error": "package is required"}), 400
+    cfg = current_app.config["CUSTOM_CONFIG"]
+    # Looking the snapshots up reindexes every system whose catalog changed
+    snapshots = {system: get_snapshot(system) for system in cfg.systems}
+    versions = {system: snapshot.version if snapshot is not None else None for system, snapshot in snapshots.items()}
+    etag = hashlib.sha1(
+        "\n".join([package.lower(), version or "", *(f"{s}={v}" for s, v in sorted(versions.items()))]).encode()
+    ).hexdigest()[:16]
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+    body = {
+        "package": package,
+        "version": version,
+        "systems": versions,
+        "matrix": cfg.availability.lookup(package, version),
+    }
+    return add_validators(jsonify(body), etag)
+
+
+@routes_bp.route("/module/extension", methods=["GET"])
+def module_extension():
+    """Modules of a system providing an extension, e.g. `numpy` or `numpy/1.26`."""
+    system = request.args.get("system")
+    name = request.args.get("name", "").strip()
+    if not name:
+        return jsonify({"error": "name is required"}), 400
+    snapshot = get_snapshot(system)
+    etag = catalog_etag(system, snapshot, "extension")
+    cached = not_modified(etag, snapshot)
+    if cached is not None:
+        return cached
+    body = {"name": name, "providers": get_extension_index(system, snapshot).lookup(name)}
+    return add_validators(jsonify(body), etag, snapshot).make_conditional(request)
 
 
 @routes_bp.route("/module/conflict", methods=["POST"])
@@ -88,10 +492,264 @@ def conflict_check():
     data = request.get_json(force=True)
     selected_modules = data.get("selected", [])
     system = data.get("system", "")
-    conflict, msg = has_conflict(selected_modules)
+    cfg = current_app.config["CUSTOM_CONFIG"]
+    try:
+        max_suggestions = parse_max_suggestions(data.get("max_suggestions", cfg.max_suggestions))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    snapshot = get_snapshot(system)
+    key = selection_key(selected_modules, max_suggestions)
+    try:
+        body = conflict_body(system, snapshot, (key, selected_modules, max_suggestions))
+    except Rejected as e:
+        return rejected_response(e)
+    return Response(body, mimetype="application/json")
+
+
+def rejected_response(e):
+    response = jsonify({"error": str(e)})
+    response.status_code = e.status
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
+
+def parse_max_suggestions(value):
+    try:
+        max_suggestions = int(value)
+    except (TypeError, ValueError):
+        max_suggestions = 0
+    if max_suggestions < 1:
+        raise ValueError("max_suggestions must be a positive integer")
+    return max_suggestions
+
+
+def conflict_body(system, snapshot, request_args):
+    """JSON body of a conflict check, from the response cache if possible.
+
+    `request_args` is (selection_key, selected modules, max_suggestions).
+    """
+    cfg = current_app.config["CUSTOM_CONFIG"]
+    key, selected_modules, max_suggestions = request_args
+    version = snapshot.version if snapshot is not None else "empty"
+    body = cfg.response_cache.get(system, "conflict", key, version)
+    if body is None:
+        result = check_conflict(system, snapshot, selected_modules, max_suggestions)
+        body = current_app.json.response(result).get_data()
+        # A truncated answer depends on the load at the time, it is not reused
+        if not result["truncated"]:
+            cfg.response_cache.put(system, "conflict", key, version, body)
+    return body
+
+
+def check_conflict(system, snapshot, selected_modules, max_suggestions):
+    conflict, msg, offending = find_conflict(selected_modules, get_compatibility_graph(system, snapshot))
+    stats = {"truncated": False}
     if conflict:
-        all_modules = get_data_dictionary(system=system)
-        suggestions_list = suggestions(selected_modules, all_modules)
+        cfg = current_app.config["CUSTOM_CONFIG"]
+        gate = cfg.conflict_gate
+        label = system_label(system)
+        cfg.metrics.observe("modscout_conflict_queue_depth", gate.running + gate.waiting)
+        try:
+            with gate.admit() as admission:
+                cfg.metrics.observe("modscout_conflict_queue_wait_seconds", admission.waited)
+                with cfg.metrics.time("modscout_suggestion_seconds", system=label):
+                    suggestions_list = budgeted_suggestions(
+                        system, snapshot, selected_modules, max_suggestions, stats, admission
+                    )
+        except Rejected as e:
+            cfg.metrics.inc("modscout_conflict_rejected_total", reason=e.reason)
+            raise
+        cfg.metrics.observe("modscout_suggestion_combinations", stats["combinations"], system=label)
+        if stats["truncated"]:
+            cfg.metrics.inc("modscout_suggestion_truncated_total", system=label)
     else:
         suggestions_list = []
-    return jsonify({"conflict": conflict, "msg": msg, "suggestions": suggestions_list})
\ No newline at end of file
+    return {
+        "conflict": conflict,
+        "msg": msg,
+        "conflicting": [
+            {"name": m.get("name"), "release": m.get("release"), "compiler": m.get("compiler")}
+            for m in offending
+        ],
+        "suggestions": suggestions_list,
+        "truncated": stats["truncated"],
+    }
+
+
+@routes_bp.route("/module/validate", methods=["POST"])
+def validate_modules():
+    """Check the module commands of a job script.
+
+    The body is either the script itself (`--data-binary @job.sh`, with
+    `?system=`) or JSON with `system` and `script`.
+    """
+    cfg = current_app.config["CUSTOM_CONFIG"]
+    data = request.get_json(silent=True) if request.is_json else None
+    if isinstance(data, dict):
+        system = data.get("system", request.args.get("system"))
+        script = data.get("script")
+        max_suggestions = data.get("max_suggestions", cfg.max_suggestions)
+    else:
+        system = request.args.get("system")
+        script = request.get_data(as_text=True)
+        max_suggestions = request.args.get("max_suggestions", cfg.max_suggestions)
+    if not isinstance(system, str) or system not in cfg.systems:
+        return jsonify({"error": f"Unknown system {system}"}), 404
+    if not isinstance(script, str):
+        return jsonify({"error": "script must be a string"}), 400
+    try:
+        max_suggestions = parse_max_suggestions(max_suggestions)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    key = script_key(script, max_suggestions)
+    try:
+        body = validate_body(system, get_snapshot(system), (key, script, max_suggestions))
+    except Rejected as e:
+        return rejected_response(e)
+    return Response(body, mimetype="application/json")
+
+
+def script_key(script, max_suggestions):
+    return hashlib.sha1(f"{max_suggestions}\n{script}".encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def validate_body(system, snapshot, request_args):
+    """JSON body of a job script check, from the response cache if possible.
+
+    `request_args` is (script_key, script, max_suggestions). The modules the
+    script ends up with go through the same conflict check and suggestions
+    as `/module/conflict`.
+    """
+    cfg = current_app.config["CUSTOM_CONFIG"]
+    key, script, max_suggestions = request_args
+    version = snapshot.version if snapshot is not None else "empty"
+    body = cfg.response_cache.get(system, "validate", key, version)
+    if body is None:
+        resolver = get_module_resolver(system, snapshot)
+        with cfg.metrics.time("modscout_validate_seconds", system=system_label(system)):
+            report, rows = validate_script(resolver, script, get_suggest_index(system, snapshot))
+        selected = [resolver.catalog.entry(row) for row in rows]
+        result = check_conflict(system, snapshot, selected, max_suggestions)
+        body = current_app.json.response(
+            {"system": system, "valid": not report["errors"] and not result["conflict"], **report, **result}
+        ).get_data()
+        if not result["truncated"]:
+            cfg.response_cache.put(system, "validate", key, version, body)
+    return body
+
+
+################################################################################
+# Batch endpoints
+################################################################################
+def batch_items(data, field):
+    """The `field` list of a batch request body, or an error response."""
+    cfg = current_app.config["CUSTOM_CONFIG"]
+    items = data.get(field) if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        return None, (jsonify({"error": f"Body must contain a '{field}' list"}), 400)
+    if len(items) > cfg.batch_max_items:
+        return None, (jsonify({"error": f"At most {cfg.batch_max_items} items per batch"}), 413)
+    return items, None
+
+
+def batch_response(items, compute):
+    cfg = current_app.config["CUSTOM_CONFIG"]
+    body = run_batch(
+        current_app._get_current_object(),
+        items,
+        get_snapshot,
+        compute,
+        cfg.batch_pool,
+        cfg.batch_workers,
+        cfg.batch_parallel_min,
+    )
+    return Response(body, mimetype="application/json")
+
+
+@routes_bp.route("/module/search/batch", methods=["POST"])
+def search_batch():
+    data = request.get_json(force=True, silent=True)
+    queries, error = batch_items(data, "queries")
+    if error is not None:
+        return error
+    cfg = current_app.config["CUSTOM_CONFIG"]
+    items = []
+    for query in queries:
+        # A plain string is searched in the system given for the whole batch
+        if isinstance(query, str):
+            query = {"query": query}
+        if not isinstance(query, dict):
+            items.append(item_error("Query must be a string or an object"))
+            continue
+        system = query.get("system", data.get("system"))
+        if not isinstance(system, str) or system not in cfg.systems:
+            items.append(item_error(f"Unknown system {system}"))
+            continue
+        search_query = normalize_query(str(query.get("query", "")))
+        items.append((system, search_query, search_query, None))
+    return batch_response(items, search_body)
+
+
+@routes_bp.route("/module/conflict/batch", methods=["POST"])
+def conflict_batch():
+    data = request.get_json(force=True, silent=True)
+    selections, error = batch_items(data, "selections")
+    if error is not None:
+        return error
+    cfg = current_app.config["CUSTOM_CONFIG"]
+    items = []
+    for selection in selections:
+        # A plain list of modules is checked in the system given for the whole batch
+        if isinstance(selection, list):
+            selection = {"selected": selection}
+        if not isinstance(selection, dict) or not isinstance(selection.get("selected", []), list):
+            items.append(item_error("Selection must be a list of modules or an object with 'selected'"))
+            continue
+        system = selection.get("system", data.get("system"))
+        if not isinstance(system, str) or system not in cfg.systems:
+            items.append(item_error(f"Unknown system {system}"))
+            continue
+        selected_modules = [m for m in selection.get("selected", []) if isinstance(m, dict)]
+        try:
+            max_suggestions = parse_max_suggestions(
+                selection.get("max_suggestions", data.get("max_suggestions", cfg.max_suggestions))
+            )
+        except ValueError as e:
+            items.append(item_error(str(e)))
+            continue
+        key = selection_key(selected_modules, max_suggestions)
+        items.append((system, key, (key, selected_modules, max_suggestions), None))
+    return batch_response(items, conflict_body)
+
+
+@routes_bp.route("/module/validate/batch", methods=["POST"])
+def validate_batch():
+    data = request.get_json(force=True, silent=True)
+    scripts, error = batch_items(data, "scripts")
+    if error is not None:
+        return error
+    cfg = current_app.config["CUSTOM_CONFIG"]
+    items = []
+    for script in scripts:
+        # A plain string is checked on the system given for the whole batch
+        if isinstance(script, str):
+            script = {"script": script}
+        if not isinstance(script, dict) or not isinstance(script.get("script"), str):
+            items.append(item_error("Script must be a string or an object with a 'script' string"))
+            continue
+        system = script.get("system", data.get("system"))
+        if not isinstance(system, str) or system not in cfg.systems:
+            items.append(item_error(f"Unknown system {system}"))
+            continue
+        try:
+            max_suggestions = parse_max_suggestions(
+                script.get("max_suggestions", data.get("max_suggestions", cfg.max_suggestions))
+            )
+        except ValueError as e:
+            items.append(item_error(str(e)))
+            continue
+        key = script_key(script["script"], max_suggestions)
+        items.append((system, key, (key, script["script"], max_suggestions), None))
+    return batch_response(items, validate_body)
@@ -0,0 +1,211 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from app.catalog import CompactCatalog
+from app.extension_index import ExtensionIndex
+
+
+class SubstringIndex:
+    """Trigram index answering `needle in s` over a list of distinct strings."""
+
+    def __init__(self, strings: List[str]):
+        self.strings: List[str] = []
+        self._grams: Dict[str, Tuple[int, ...]] = {}
+        self._add(strings)
+
+    def _add(self, strings: List[str]):
+        additions: Dict[str, List[int]] = {}
+        for sid, s in enumerate(strings, start=len(self.strings)):
+            for gram in {s[i : i + 3] for i in range(len(s) - 2)}:
+                additions.setdefault(gram, []).append(sid)
+        self.strings += strings
+        for gram, sids in additions.items():
+            self._grams[gram] = self._grams.get(gram, ()) + tuple(sids)
+
+    def extended(self, strings: List[str]) -> "SubstringIndex":
+        """Copy of this index with `strings` appended; existing ids are kept."""
+        index = SubstringIndex([])
+        index.strings = list(self.strings)
+        index._grams = dict(self._grams)
+        index._add(strings)
+        return index
+
+    def lookup(self, needle: str) -> List[int]:
+        strings = self.strings
+        if len(needle) < 3:
+            # Too short for a trigram, only the distinct strings are scanned
+            return [sid for sid, s in enumerate(strings) if needle in s]
+
+        candidates = None
+        for i in range(len(needle) - 2):
+            postings = self._grams.get(needle[i : i + 3])
+            if not postings:
+                return []
+            if candidates is None or len(postings) < len(candidates):
+                candidates = postings
+        return [sid for sid in candidates if needle in strings[sid]]
+
+
+class BaseSearchIndex:
+    """Query evaluation shared by the search backends.
+
+    Subclasses provide `match(term)`, the rows matching one lower-cased term,
+    and `_dup_of`, mapping each row to the first equal row of its bucket.
+    When `extensions` is set, a term naming an extension also matches the
+    modules providing it.
+    """
+
+    data: CompactCatalog
+    _dup_of: Dict[int, int]
+    extensions: Optional[ExtensionIndex] = None
+
+    def match(self, term: str) -> Set[int]:
+        raise NotImplementedError
+
+    def _resolve(self, term: str) -> Set[int]:
+        matched = self.match(term)
+        if self.extensions is not None:
+            matched |= self.extensions.provider_rows(term)
+        return matched
+
+    def rows(self, query: str) -> Sequence[int]:
+        """Sorted rows matching any term of `query`, without in-bucket duplicates."""
+        if query is None or query == "":
+            return range(self.data.row_count)
+        matched: Set[int] = set()
+        for search_query in (q.strip() for q in query.split(",")):
+            if search_query:
+                matched.update(self._resolve(search_query.lower()))
+        return sorted(row for row in matched if row not in self._dup_of)
+
+    def search(self, query: str) -> Dict:
+        catalog = self.data
+        if query is None or query == "":
+            return catalog.to_tree()
+
+        filtered_data: Dict = {}
+        seen: Dict[Tuple[str, str], Set[int]] = {}
+        search_queries = [q.strip() for q in query.split(",") if q.strip()]
+        for search_query in search_queries:
+            for row in sorted(self._resolve(search_query.lower())):
+                release = catalog.strings[catalog.row_release[row]]
+                compiler = catalog.strings[catalog.row_compiler[row]]
+                bucket_seen = seen.setdefault((release, compiler), set())
+                first = self._dup_of.get(row, row)
+                if first in bucket_seen:
+                    continue
+                bucket_seen.add(first)
+                filtered_data.setdefault(release, {}).setdefault(compiler, []).append(catalog.entry(row))
+        return filtered_data
+
+
+class SearchIndex(BaseSearchIndex):
+    """Lookup structures over one compact catalog, used by `search`.
+
+    Rows are numbered in tree order (release -> compiler -> module). The index
+    keeps a map from each distinct lower-cased package name, version and
+    description to the rows using it, plus an inverted index from description
+    tokens to descriptions. Substring queries go through trigram indexes over
+    these distinct strings, so a lookup touches the matching modules only, not
+    the whole catalog.
+    """
+
+    def __init__(self, catalog: CompactCatalog, previous: Optional["SearchIndex"] = None):
+        self.data: CompactCatalog = catalog
+
+        self._package_ids: Dict[str, int] = {}
+        self._package_rows: List[List[int]] = []
+        self._version_ids: Dict[str, int] = {}
+        self._description_ids: Dict[str, int] = {}
+        self._description_rows: List[List[int]] = []
+        self._dup_of: Dict[int, int] = {}
+
+        record_package: List[int] = []
+        self._record_version: List[int] = []
+        record_description: List[int] = []
+        for record in catalog.records:
+            record_package.append(
+                self._intern(self._package_ids, record.package.lower(), self._package_rows)
+            )
+            self._record_version.append(self._intern(self._version_ids, record.version.lower()))
+            record_description.append(
+                self._intern(self._description_ids, record.description.lower(), self._description_rows)
+            )
+
+        for _, _, rows in catalog.buckets():
+            bucket_seen: Dict[Tuple, int] = {}
+            for row in rows:
+                # Equal modules in one bucket are reported only once
+                first = bucket_seen.setdefault(catalog.row_key(row), row)
+                if first != row:
+                    self._dup_of[row] = first
+
+                record_id = catalog.row_record[row]
+                self._package_rows[record_package[record_id]].append(row)
+                self._description_rows[record_description[record_id]].append(row)
+
+        # Inverted index: whitespace separated token -> descriptions containing it
+        postings: Dict[str, List[int]] = {}
+        self._descriptions: List[str] = list(self._description_ids)
+        for description_id, description in enumerate(self._descriptions):
+            for token in set(description.split()):
+                postings.setdefault(token, []).append(description_id)
+
+        self._packages = SubstringIndex(list(self._package_ids))
+        self._versions = SubstringIndex(list(self._version_ids))
+        # After an incremental rebuild most tokens are already in the previous
+        # trigram index, only new ones are added. Tokens that disappeared stay
+        # with empty postings until they make up half of the vocabulary.
+        vocabulary = previous._tokens if previous is not None else None
+        if vocabulary is not None and len(vocabulary.strings) <= 2 * len(postings):
+            known = set(vocabulary.strings)
+            self._tokens = vocabulary.extended([t for t in postings if t not in known])
+        else:
+            self._tokens = SubstringIndex(list(postings))
+        self._token_descriptions: List[List[int]] = [postings.get(t, []) for t in self._tokens.strings]
+
+    @staticmethod
+    def _intern(ids: Dict[str, int], value: str, postings: List[List[int]] = None) -> int:
+        item_id = ids.get(value)
+        if item_id is None:
+            item_id = ids[value] = len(ids)
+            if postings is not None:
+                postings.append([])
+        return item_id
+
+    def _match_packages(self, needle: str) -> Iterable[int]:
+        for package_id in self._packages.lookup(needle):
+            yield from self._package_rows[package_id]
+
+    def _match_descriptions(self, needle: str) -> Iterable[int]:
+        pieces = needle.split()
+        if not pieces:
+            description_ids = [did for did, d in enumerate(self._descriptions) if needle in d]
+        else:
+            # A needle without whitespace can only occur inside a single token.
+            # Otherwise its longest piece narrows the candidates down.
+            longest = max(pieces, key=len)
+            description_ids = {
+                did
+                for token_id in self._tokens.lookup(longest)
+                for did in self._token_descriptions[token_id]
+            }
+            if pieces != [needle]:
+                description_ids = [did for did in description_ids if needle in self._descriptions[did]]
+        for description_id in description_ids:
+            yield from self._description_rows[description_id]
+
+    def match(self, term: str) -> Set[int]:
+        """Rows matching one lower-cased search term."""
+        if "/" in term:
+            package_query, version_query = term.split("/", 1)
+            versions = set(self._versions.lookup(version_query))
+            record_version = self._record_version
+            row_record = self.data.row_record
+            return {
+                row
+                for row in self._match_packages(package_query)
+                if record_version[row_record[row]] in versions
+            }
+        matched = set(self._match_packages(term))
+        matched.update(self._match_descriptions(term))
+        return matched
@@ -0,0 +1,123 @@
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from app.catalog import CompactCatalog
+
+# Modules per precomputed bucket page
+PAGE_SIZE = 500
+
+# Fields left out of bucket pages, fetched per module with /module/description
+LAZY_FIELDS = ("description", "url")
+
+
+def _page_body(release: str, compiler: str, page: int, pages: int, count: int, modules: List[Dict]) -> bytes:
+    body = {"release": release, "compiler": compiler, "page": page, "pages": pages, "count": count, "modules": modules}
+    return json.dumps(body, separators=(",", ":")).encode("utf-8")
+
+
+def write_slices(catalog: CompactCatalog, path: str, page_size: int = PAGE_SIZE):
+    """Write the response bodies of the lazy browsing API for one catalog version.
+
+    The file starts with a one-line JSON skeleton holding, for every
+    release/compiler bucket, its module count and the byte range of each
+    page. The pages follow as ready-to-send JSON bodies. Modules equal within
+    a bucket are listed once, as in search results. Descriptions and URLs are
+    left out.
+    """
+    skeleton: Dict[str, Dict[str, Dict]] = {}
+    blobs: List[bytes] = []
+    offset = 0
+    for release, compiler, rows in catalog.buckets():
+        seen = set()
+        modules = []
+        for row in rows:
+            key = catalog.row_key(row)
+            if key in seen:
+                continue
+            seen.add(key)
+            entry = catalog.entry(row)
+            for field in LAZY_FIELDS:
+                entry.pop(field, None)
+            modules.append(entry)
+
+        pages = max(1, -(-len(modules) // page_size))
+        ranges = []
+        for page in range(pages):
+            blob = _page_body(
+                release, compiler, page, pages, len(modules), modules[page * page_size : (page + 1) * page_size]
+            )
+            ranges.append((offset, len(blob)))
+            blobs.append(blob)
+            offset += len(blob)
+        skeleton.setdefault(release, {})[compiler] = {"count": len(modules), "pages": ranges}
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(json.dumps({"page_size": page_size, "releases": skeleton}, separators=(",", ":")).encode("utf-8"))
+        f.write(b"\n")
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+
+
+class BucketSlices:
+    """Reader of a file written by `write_slices`.
+
+    Only the skeleton is parsed; a bucket page is a single `pread` of bytes
+    that are sent as they are.
+    """
+
+    def __init__(self, path: str):
+        self.path: str = path
+        self._fd = os.open(path, os.O_RDONLY)
+        with open(path, "rb") as f:
+            header = f.readline()
+        self._base: int = len(header)
+        skeleton = json.loads(header)
+        self.page_size: int = skeleton["page_size"]
+        self._pages: Dict[Tuple[str, str], List[Tuple[int, int]]] = {}
+        public: Dict[str, Dict[str, Dict]] = {}
+        for release, compilers in skeleton["releases"].items():
+            for compiler, bucket in compilers.items():
+                self._pages[(release, compiler)] = bucket["pages"]
+                public.setdefault(release, {})[compiler] = {"count": bucket["count"], "pages": len(bucket["pages"])}
+        # The skeleton response is the same for every request of this version
+        self.skeleton_body: bytes = json.dumps(
+            {"page_size": self.page_size, "releases": public}, separators=(",", ":")
+        ).encode("utf-8")
+
+    @classmethod
+    def open(cls, path: str, catalog: CompactCatalog) -> "BucketSlices":
+        """Open the slices of a catalog, writing them first if they are missing."""
+        if not os.path.exists(path):
+            write_slices(catalog, path)
+        return cls(path)
+
+    def page(self, release: str, compiler: str, page: int) -> Optional[bytes]:
+        """JSON body of one bucket page, None for an unknown bucket or page."""
+        pages = self._pages.get((release, compiler))
+        if pages is None or not 0 <= page < len(pages):
+            return None
+        offset, length = pages[page]
+        return os.pread(self._fd, length, self._base + offset)
+
+    def __del__(self):
+        fd = getattr(self, "_fd", None)
+        if fd is not None:
+            os.close(fd)
+
+
+def description_index(catalog: CompactCatalog) -> Dict[Tuple[str, str, str], int]:
+    """(release, compiler, module name) -> record id, for looking descriptions up.
+
+    A name alone is ambiguous: an extension provided by several modules, or
+    named like a module, has a record per provider. Extension buckets carry
+    their provider in the compiler name, so the bucket and name are unique.
+    """
+    index: Dict[Tuple[str, str, str], int] = {}
+    for release, compiler, rows in catalog.buckets():
+        for row in rows:
+            record_id = catalog.row_record[row]
+            index.setdefault((release, compiler, catalog.records[record_id].name), record_id)
+    return index
@@ -0,0 +1,199 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Set, Tuple
+
+from app.catalog import CompactCatalog
+from app.compatibility import toolchain_chain
+from app.search_index import BaseSearchIndex
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE records (
+    id INTEGER PRIMARY KEY,
+    package TEXT NOT NULL,
+    version TEXT NOT NULL,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    url TEXT NOT NULL,
+    package_lc TEXT NOT NULL,
+    version_lc TEXT NOT NULL,
+    description_lc TEXT NOT NULL
+);
+CREATE TABLE buckets (
+    id INTEGER PRIMARY KEY,
+    release TEXT NOT NULL,
+    compiler TEXT NOT NULL,
+    first_row INTEGER NOT NULL,
+    stop_row INTEGER NOT NULL
+);
+CREATE TABLE chain_modules (bucket INTEGER NOT NULL REFERENCES buckets(id), module TEXT NOT NULL);
+CREATE TABLE rows (
+    row INTEGER PRIMARY KEY,
+    bucket INTEGER NOT NULL REFERENCES buckets(id),
+    record INTEGER NOT NULL REFERENCES records(id),
+    parent TEXT,
+    is_extension INTEGER NOT NULL,
+    dup_of INTEGER,
+    override TEXT
+);
+CREATE INDEX rows_record ON rows(record);
+CREATE INDEX chain_modules_module ON chain_modules(module);
+CREATE VIEW extensions AS
+    SELECT rows.row, records.package, records.version, rows.parent, buckets.release, buckets.compiler
+    FROM rows JOIN records ON records.id = rows.record JOIN buckets ON buckets.id = rows.bucket
+    WHERE rows.is_extension = 1;
+"""
+
+# Trigram tokens make FTS5 answer substring queries of three or more characters
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE records_fts USING fts5(
+    package_lc, version_lc, description_lc,
+    content='records', content_rowid='id', tokenize='trigram case_sensitive 1'
+);
+INSERT INTO records_fts(records_fts) VALUES ('rebuild');
+"""
+
+
+def write_sqlite(catalog: CompactCatalog, path: str):
+    """Write a catalog into normalized SQLite tables with a full-text index.
+
+    Rows keep the ids of the compact catalog, so the database only answers
+    which rows match and entries are still built from the catalog.
+    """
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    db = sqlite3.connect(tmp_path)
+    try:
+        db.executescript(SCHEMA)
+        db.executemany(
+            "INSERT INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    record_id,
+                    r.package,
+                    r.version,
+                    r.name,
+                    r.description,
+                    r.url,
+                    r.package.lower(),
+                    r.version.lower(),
+                    r.description.lower(),
+                )
+                for record_id, r in enumerate(catalog.records)
+            ),
+        )
+        for bucket_id, (release, compiler, rows) in enumerate(catalog.buckets()):
+            db.execute("INSERT INTO buckets VALUES (?, ?, ?, ?, ?)", (bucket_id, release, compiler, rows.start, rows.stop))
+            db.executemany(
+                "INSERT INTO chain_modules VALUES (?, ?)", ((bucket_id, m) for m in sorted(toolchain_chain(compiler)))
+            )
+            bucket_seen: Dict[Tuple, int] = {}
+            values = []
+            for row in rows:
+                # Same rule as SearchIndex: equal modules in one bucket are reported once
+                first = bucket_seen.setdefault(catalog.row_key(row), row)
+                parent = catalog.row_parent[row]
+                override = catalog.row_overrides.get(row)
+                values.append(
+                    (
+                        row,
+                        bucket_id,
+                        catalog.row_record[row],
+                        catalog.strings[parent] if parent >= 0 else None,
+                        int(catalog.row_flags[row] & 1),
+                        first if first != row else None,
+                        json.dumps(override) if override is not None else None,
+                    )
+                )
+            db.executemany("INSERT INTO rows VALUES (?, ?, ?, ?, ?, ?, ?)", values)
+
+        try:
+            db.executescript(FTS_SCHEMA)
+            fts = "1"
+        except sqlite3.OperationalError as e:
+            print(f"[!] SQLite without FTS5 trigram support, search falls back to scans: {e}")
+            fts = "0"
+        db.executemany("INSERT INTO meta VALUES (?, ?)", [("format", "1"), ("fts", fts)])
+        db.commit()
+    finally:
+        db.close()
+    os.replace(tmp_path, path)
+
+
+def _phrase(needle: str) -> str:
+    return '"' + needle.replace('"', '""') + '"'
+
+
+class SqliteSearchIndex(BaseSearchIndex):
+    """Search backend answering queries from the SQLite copy of a catalog.
+
+    Only the in-bucket duplicate map is held in memory; matching runs as
+    indexed queries, so the search index does not grow with the catalog and
+    every worker reads the same file. Each thread uses its own read-only
+    connection. This replaces search only: conflict checks and suggestions
+    keep their in-memory structures with this backend too.
+    """
+
+    def __init__(self, path: str, catalog: CompactCatalog):
+        self.data: CompactCatalog = catalog
+        self.path: str = path
+        self._local = threading.local()
+        db = self._db()
+        self._fts: bool = dict(db.execute("SELECT key, value FROM meta")).get("fts") == "1"
+        self._dup_of: Dict[int, int] = dict(db.execute("SELECT row, dup_of FROM rows WHERE dup_of IS NOT NULL"))
+
+    @classmethod
+    def open(cls, path: str, catalog: CompactCatalog) -> "SqliteSearchIndex":
+        """Open the database of a catalog, writing it first if it is missing."""
+        if not os.path.exists(path):
+            write_sqlite(catalog, path)
+        return cls(path, catalog)
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        return db
+
+    def _records(self, column: str, needle: str) -> Tuple[str, Tuple]:
+        """SQL selecting the records whose lower-cased `column` contains `needle`."""
+        if needle == "":
+            return "SELECT id FROM records", ()
+        if self._fts and len(needle) >= 3:
+            return "SELECT rowid FROM records_fts WHERE records_fts MATCH ?", (f"{column} : {_phrase(needle)}",)
+        return f"SELECT id FROM records WHERE instr({column}, ?) > 0", (needle,)
+
+    def match(self, term: str) -> Set[int]:
+        if "/" in term:
+            package_query, version_query = term.split("/", 1)
+            packages, package_params = self._records("package_lc", package_query)
+            versions, version_params = self._records("version_lc", version_query)
+            sql = f"SELECT row FROM rows WHERE record IN ({packages}) AND record IN ({versions})"
+            params = package_params + version_params
+        else:
+            packages, package_params = self._records("package_lc", term)
+            descriptions, description_params = self._records("description_lc", term)
+            sql = f"SELECT row FROM rows WHERE record IN ({packages}) OR record IN ({descriptions})"
+            params = package_params + description_params
+        return {row for (row,) in self._db().execute(sql, params)}
+
+    def ranked_rows(self, query: str) -> List[int]:
+        """Rows of `query` ordered by BM25 relevance, best first.
+
+        Terms too short for the full-text index do not contribute to the score.
+        """
+        scores: Dict[int, float] = {}
+        if self._fts:
+            for term in (q.strip().lower() for q in (query or "").split(",")):
+                needle = term.split("/", 1)[0]
+                if len(needle) < 3:
+                    continue
+                for record, score in self._db().execute(
+                    "SELECT rowid, bm25(records_fts) FROM records_fts WHERE records_fts MATCH ?", (_phrase(needle),)
+                ):
+                    scores[record] = min(score, scores.get(record, 0.0))
+        row_record = self.data.row_record
+        return sorted(self.rows(query), key=lambda row: (scores.get(row_record[row], 0.0), row))
@@ -2,13 +2,16 @@ import { fetchJson } from "./common.js";
 
 document.addEventListener("DOMContentLoaded", () => {
   const state = {
-    tree: {},
+    // Release -> compiler -> {count, pages}, the modules are loaded per bucket
+    skeleton: {},
+    buckets: {},
     search: "",
     selected: [],
   };
 
   // DOM Elements
   const searchInput = document.getElementById("searchInput");
+  const suggestList = document.getElementById("suggestList");
   const clearBtn = document.getElementById("clearBtn");
   const resultsArea = document.getElementById("resultsArea");
   const selectionList = document.getElementById("selectionList");
@@ -30,12 +33,12 @@ document.addEventListener("DOMContentLoaded", () => {
     const urlParams = new URLSearchParams(window.location.search);
     const systemName = urlParams.get("system") || "processed_module_rapids"; // Default fallback
 
-    fetchJson(`/module/data?system=${systemName}`)
+    fetchJson(`/module/skeleton?system=${systemName}`)
       .then((data) => {
         if (data.error) {
           throw new Error(data.error);
         }
-        state.tree = data;
+        state.skeleton = data.releases;
         document.title += `: ${systemName.replace(/_/g, " ").toUpperCase()}`;
         render();
       })
@@ -67,6 +70,85 @@ document.addEventListener("DOMContentLoaded", () => {
     );
   }
 
+  function bucketKey(release, compiler) {
+    return `${release}\n${compiler}`;
+  }
+
+  function sortCompilers(compilers) {
+    return compilers.sort((a, b) => {
+      if (a.toLowerCase() === "none" || a.trim() === "") return -1;
+      if (b.toLowerCase() === "none" || b.trim() === "") return 1;
+      return a.localeCompare(b);
+    });
+  }
+
+  function compilerTitle(compiler) {
+    if (compiler.toUpperCase().endsWith("_EXT")) {
+      return `Extenstions - ${compiler.replace("_EXT", "").replace("_Ext", "")}`;
+    }
+    if (compiler.toLowerCase() === "none" || compiler.trim() === "") {
+      return "Standalone";
+    }
+    return compiler;
+  }
+
+  // Load the next page of a release/compiler bucket
+  async function loadBucketPage(release, compiler) {
+    const systemName = new URLSearchParams(window.location.search).get("system");
+    const key = bucketKey(release, compiler);
+    const bucket = state.buckets[key] || { modules: [], pages: 0, open: true };
+    state.buckets[key] = bucket;
+    const params = new URLSearchParams({
+      system: systemName,
+      release: release,
+      compiler: compiler,
+      page: bucket.pages,
+    });
+    const data = await fetchJson(`/module/bucket?${params}`);
+    if (data.error) {
+      throw new Error(data.error);
+    }
+    bucket.modules.push(...data.modules);
+    bucket.pages = data.page + 1;
+  }
+
+  // Descriptions are not part of bucket pages, fetch them once a module is selected
+  async function loadDescription(mod, element) {
+    const systemName = new URLSearchParams(window.location.search).get("system");
+    const params = new URLSearchParams({
+      system: systemName,
+      release: mod.release,
+      compiler: mod.compiler,
+      name: mod.name,
+    });
+    const data = await fetchJson(`/module/description?${params}`);
+    mod.description = data.description || "";
+    mod.url = data.url || "";
+    element.textContent = mod.description;
+  }
+
+  // Typeahead completions of the last comma separated term of the search
+  async function renderSuggestions(value) {
+    const systemName = new URLSearchParams(window.location.search).get("system");
+    const head = value.includes(",") ? value.slice(0, value.lastIndexOf(",") + 1) + " " : "";
+    const term = value.slice(head.trimEnd().length).trim();
+    if (term === "") {
+      suggestList.innerHTML = "";
+      return;
+    }
+    const params = new URLSearchParams({ system: systemName, query: term });
+    const data = await fetchJson(`/module/suggest?${params}`);
+    suggestList.innerHTML = "";
+    (data.suggestions || []).forEach((item) => {
+      const option = document.createElement("option");
+      option.value = head + item.text;
+      option.label = item.extension
+        ? `${item.text} (extension)`
+        : `${item.text} (${item.releases} releases)`;
+      suggestList.appendChild(option);
+    });
+  }
+
   async function hasConflict(selectedModules, system) {
     const data = await fetchJson("/module/conflict", {
       method: "POST",
@@ -189,8 +271,82 @@ document.addEventListener("DOMContentLoaded", () => {
       .catch((error) => console.error("Error fetching system names:", error));
   }
 
+  function moduleGrid(modules, isExtension) {
+    const grid = document.createElement("div");
+    grid.className = "module-grid";
+    modules.forEach((mod) => {
+      const btn = document.createElement("button");
+      if (isExtension) {
+        btn.className = `module-card extension ${isSelected(mod) ? "selected" : ""}`;
+        btn.innerHTML = `
+                <span class="pkg-name">${mod.package} <span class="floating-alpha">(E)</span></span>
+                <span class="pkg-ver">${mod.version}</span>
+                `;
+      } else {
+        btn.className = `module-card ${isSelected(mod) ? "selected" : ""}`;
+        btn.innerHTML = `<span class="pkg-name">${mod.package}</span><span class="pkg-ver">${mod.version}</span>`;
+      }
+      btn.onclick = () => toggleModule(mod);
+      grid.appendChild(btn);
+    });
+    return grid;
+  }
+
+  // Rendering the release/compiler tree, a bucket's modules are fetched when it is opened
+  function renderSkeleton() {
+    resultsArea.innerHTML = "";
+    Object.keys(state.skeleton)
+      .sort()
+      .reverse()
+      .forEach((release) => {
+        const section = document.createElement("section");
+        section.className = "release-group";
+        section.innerHTML = `<h2>${release}</h2>`;
+
+        const compilers = state.skeleton[release];
+        sortCompilers(Object.keys(compilers)).forEach((compiler) => {
+          const { count, pages } = compilers[compiler];
+          const bucket = state.buckets[bucketKey(release, compiler)];
+
+          const group = document.createElement("details");
+          group.className = "compiler-group";
+          group.open = Boolean(bucket && bucket.open);
+          group.innerHTML = `<summary><h3>${compilerTitle(compiler)} (${count})</h3></summary>`;
+          if (bucket) {
+            group.appendChild(moduleGrid(bucket.modules, compiler.toUpperCase().endsWith("_EXT")));
+            if (bucket.pages < pages) {
+              const more = document.createElement("button");
+              more.className = "clear-button";
+              more.textContent = `Load more (${bucket.modules.length} of ${count})`;
+              more.onclick = () =>
+                loadBucketPage(release, compiler)
+                  .then(renderSkeleton)
+                  .catch((e) => console.error("Failed to load modules", e));
+              group.appendChild(more);
+            }
+          }
+          group.addEventListener("toggle", () => {
+            const loaded = state.buckets[bucketKey(release, compiler)];
+            if (loaded || !group.open) {
+              if (loaded) loaded.open = group.open;
+              return;
+            }
+            loadBucketPage(release, compiler)
+              .then(renderSkeleton)
+              .catch((e) => console.error("Failed to load modules", e));
+          });
+          section.appendChild(group);
+        });
+        resultsArea.appendChild(section);
+      });
+  }
+
   // Rendering search results
   function renderResults() {
+    if (state.search === "") {
+      renderSkeleton();
+      return;
+    }
     const query = state.search;
     const urlParams = new URLSearchParams(window.location.search);
     const systemName = urlParams.get("system");
@@ -212,68 +368,14 @@ document.addEventListener("DOMContentLoaded", () => {
           section.innerHTML = `<h2>${release}</h2>`;
           // section.innerHTML = `<summary style="cursor: pointer; font-weight: bold;"><h2>${release}</h2></summary>`;
 
-          const sortedCompilers_key = Object.keys(compiler).sort((a, b) => {
-            if (a.toLowerCase() === "none" || a.trim() === "") return -1;
-            if (b.toLowerCase() === "none" || b.trim() === "") return 1;
-            return a.localeCompare(b);
-          });
-          const sortedCompilerEntries = sortedCompilers_key.map((key) => [
-            key,
-            compiler[key],
-          ]);
-
-          sortedCompilerEntries.forEach((compiler_item) => {
-            let compiler = compiler_item[0];
-            let modules = compiler_item[1];
-            
-            
-
-            if (!compiler.toUpperCase().endsWith("_EXT")) {
-              if (compiler.toLowerCase() === "none" || compiler.trim() === "") {
-                compiler = "Standalone";
-              }
-
-              const group = document.createElement("div");
-              group.className = "compiler-group";
-              group.innerHTML = `<h3>${compiler}</h3>`;
-
-              const grid = document.createElement("div");
-              grid.className = "module-grid";
-              modules.forEach((mod) => {
-                const btn = document.createElement("button");
-                btn.className = `module-card ${isSelected(mod) ? "selected" : ""}`;
-                btn.innerHTML = `<span class="pkg-name">${mod.package}</span><span class="pkg-ver">${mod.version}</span>`;
-                btn.onclick = () => toggleModule(mod);
-                grid.appendChild(btn);
-              });
-
-              group.appendChild(grid);
-              section.appendChild(group);
-            } else if (compiler.toUpperCase().endsWith("_EXT")) {
-              compiler = compiler.replace("_EXT","").replace("_Ext","")
-              const group = document.createElement("div");
-              group.className = "compiler-group";
-              group.innerHTML = `<h3>Extenstions - ${compiler}</h3>`;
-
-              const grid = document.createElement("div");
-              grid.className = "module-grid";
-              modules.forEach((mod) => {
-                const btn = document.createElement("button");
-                btn.className = `module-card extension ${isSelected(mod) ? "selected" : ""}`;
-                btn.innerHTML = `
-                <span class="pkg-name">${mod.package} <span class="floating-alpha">(E)</span></span>
-                <span class="pkg-ver">${mod.version}</span>
-                `;
-                btn.onclick = () => toggleModule(mod);
-                grid.appendChild(btn);
-              });
-
-              group.appendChild(grid);
-              section.appendChild(group);
-              
-            }
-
-
+          sortCompilers(Object.keys(compiler)).forEach((compilerName) => {
+            const group = document.createElement("div");
+            group.className = "compiler-group";
+            group.innerHTML = `<h3>${compilerTitle(compilerName)}</h3>`;
+            group.appendChild(
+              moduleGrid(compiler[compilerName], compilerName.toUpperCase().endsWith("_EXT")),
+            );
+            section.appendChild(group);
           });
           // section.innerHTML = `<details ${true ? 'open' : ''}>${section.innerHTML}</details>`;
           resultsArea.appendChild(section);
@@ -328,14 +430,31 @@ document.addEventListener("DOMContentLoaded", () => {
             `;
       }
       item.querySelector(".remove-btn").onclick = () => toggleModule(mod);
+      if (mod.description === undefined) {
+        loadDescription(mod, item.querySelector(".item-description")).catch((e) =>
+          console.error("Failed to load description", e),
+        );
+      }
       selectionList.appendChild(item);
     });
 
     const {
       conflict: conflict,
       msg: conflict_msg,
+      conflicting: conflicting,
       suggestions: suggestions,
     } = await hasConflict(state.selected, system);
+
+    // Highlight the selected modules that break the selection
+    state.selected.forEach((mod, idx) => {
+      const isConflicting = (conflicting || []).some(
+        (m) =>
+          m.name === mod.name &&
+          m.compiler === mod.compiler &&
+          m.release === mod.release,
+      );
+      selectionList.children[idx]?.classList.toggle("conflicting", isConflicting);
+    });
     conflictAlert.style.display = conflict ? "block" : "none";
     errorModuleSelection.innerText = conflict_msg;
     conflictSuggestions.style.display = conflict ? "block" : "none";
@@ -374,8 +493,14 @@ document.addEventListener("DOMContentLoaded", () => {
   // Render results for each typed character with a debounce (delay) to improve
   // performance by reducing requests while typing.
   let searchTimeout;
+  let suggestTimeout;
   searchInput.addEventListener("input", (e) => {
     clearTimeout(searchTimeout);
+    clearTimeout(suggestTimeout);
+    const value = e.target.value;
+    suggestTimeout = setTimeout(() => {
+      renderSuggestions(value).catch((err) => console.error("Failed to load suggestions", err));
+    }, 100);
     state.search = e.target.value.trim();
     searchTimeout = setTimeout(() => {
       render();
@@ -0,0 +1,142 @@
+import gzip
+import json
+import os
+import shutil
+import zlib
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+if TYPE_CHECKING:
+    from app.catalog import CompactCatalog
+
+CHUNK_SIZE = 64 * 1024
+
+PRECOMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def parse_page_args(args) -> Tuple[Optional[int], int, List[str]]:
+    """Read `limit`, `cursor` and `release` from the query string.
+
+    Raises ValueError for malformed values.
+    """
+    limit = args.get("limit")
+    limit = int(limit) if limit not in (None, "") else None
+    cursor = int(args.get("cursor") or 0)
+    if (limit is not None and limit < 0) or cursor < 0:
+        raise ValueError("limit and cursor must be non-negative integers")
+    releases = [r for value in args.getlist("release") for r in value.split(",") if r]
+    return limit, cursor, releases
+
+
+def paginate(
+    sequences: Iterable[Sequence[int]], cursor: int = 0, limit: Optional[int] = None
+) -> Tuple[List[Sequence[int]], Optional[int]]:
+    """Clip sorted row sequences to one page.
+
+    Returns the row sequences of the page and the cursor of the next page,
+    which is None on the last page. Rows are catalog row ids, so a cursor stays
+    valid for as long as the same catalog version is served.
+    """
+    page: List[Sequence[int]] = []
+    remaining = limit
+    for rows in sequences:
+        rows = rows[bisect_left(rows, cursor):]
+        if not rows:
+            continue
+        if remaining is not None:
+            if remaining == 0:
+                return page, rows[0]
+            if len(rows) > remaining:
+                page.append(rows[:remaining])
+                return page, rows[remaining]
+            remaining -= len(rows)
+        page.append(rows)
+    return page, None
+
+
+def release_rows(catalog: "CompactCatalog", releases: List[str]) -> Iterator[range]:
+    for release, _, rows in catalog.buckets():
+        if not releases or release in releases:
+            yield rows
+
+
+def iter_ndjson(catalog: "CompactCatalog", page: List[Sequence[int]]) -> Iterator[str]:
+    for rows in page:
+        for row in rows:
+            yield json.dumps(catalog.entry(row)) + "\n"
+
+
+def pick_encoding(accept_encodings) -> Optional[str]:
+    if brotli is not None and accept_encodings["br"]:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def encode_chunks(lines: Iterable[str], encoding: Optional[str]) -> Iterator[bytes]:
+    """Batch text into ~64 KiB chunks and compress them on the fly.
+
+    Every chunk is flushed through the compressor so it reaches the client
+    right away instead of waiting in the compressor's window.
+    """
+    if encoding == "br":
+        compressor = brotli.Compressor()
+        compress = lambda data: compressor.process(data) + compressor.flush()
+        flush = compressor.finish
+    elif encoding == "gzip":
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        compress = lambda data: compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        flush = compressor.flush
+    else:
+        compress, flush = None, None
+
+    buffer: List[str] = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            data = "".join(buffer).encode()
+            buffer, size = [], 0
+            data = compress(data) if compress else data
+            if data:
+                yield data
+    data = "".join(buffer).encode()
+    if compress:
+        data = compress(data) + flush()
+    if data:
+        yield data
+
+
+def write_precompressed(path: str):
+    """Write gzip (and brotli, if installed) copies next to a JSON file."""
+    with open(path, "rb") as src, gzip.open(f"{path}.gz.tmp", "wb", compresslevel=9) as dst:
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+    os.replace(f"{path}.gz.tmp", f"{path}.gz")
+
+    if brotli is not None:
+        with open(path, "rb") as src:
+            data = brotli.compress(src.read())
+        with open(f"{path}.br.tmp", "wb") as dst:
+            dst.write(data)
+        os.replace(f"{path}.br.tmp", f"{path}.br")
+
+
+def precompressed_path(path: str, accept_encodings) -> Tuple[Optional[str], Optional[str]]:
+    """Return an up to date compressed copy of `path` the client accepts."""
+    for encoding, suffix in PRECOMPRESSED_SUFFIXES.items():
+        if not accept_encodings[encoding]:
+            continue
+        candidate = path + suffix
+        try:
+            if os.stat(candidate).st_mtime_ns >= os.stat(path).st_mtime_ns:
+                return candidate, encoding
+        except OSError:
+            continue
+    return None, None
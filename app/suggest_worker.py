@@ -0,0 +1,77 @@
+"""Conflict suggestions in worker processes.
+
+Like `processing`, nothing here imports Flask state: the functions run in the
+processes of `AppConfig.suggest_pool`, so a long suggestion search takes a
+core of its own instead of the GIL of the web worker. Each process keeps the
+suggestion engine of the catalog version it last served per system.
+"""
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.catalog import Signature, open_catalog
+from app.extension_index import ExtensionIndex
+from app.suggestion_engine import SuggestionEngine
+
+# Seconds a process that built its engine waits for the others of a warm-up round
+WARM_BARRIER_TIMEOUT = 60
+
+# system -> (signature, engine) of this process
+_engines: Dict[str, Tuple[Signature, SuggestionEngine]] = {}
+# Shared by the processes of one pool, see `warm`
+_warm_barrier = None
+
+
+def init_process(niceness: int, warm_barrier):
+    """Pool initializer: keep the warm-up barrier and let the web workers win the CPU over suggestion searches."""
+    global _warm_barrier
+    _warm_barrier = warm_barrier
+    if niceness > 0 and hasattr(os, "nice"):
+        os.nice(niceness)
+
+
+def _engine(system: str, signature: Signature) -> SuggestionEngine:
+    cached = _engines.get(system)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    catalog = open_catalog(signature[0])
+    engine = SuggestionEngine(catalog, extensions=ExtensionIndex(catalog))
+    _engines[system] = (signature, engine)
+    return engine
+
+
+def suggest(
+    system: str,
+    signature: Signature,
+    selected: List[Dict],
+    max_suggestions: Optional[int],
+    deadline: float,
+    max_combinations: Optional[int],
+) -> Tuple[List[List[Dict]], Dict]:
+    """`SuggestionEngine.suggest` on the catalog version of `signature`, and its stats.
+
+    `deadline` is a `time.monotonic()` value, which is shared by the
+    processes of one machine.
+    """
+    stats: Dict = {"combinations": 0, "truncated": True}
+    if time.monotonic() >= deadline:
+        return [], stats
+    engine = _engine(system, signature)
+    found = engine.suggest(selected, max_suggestions, stats, deadline, max_combinations)
+    return found, stats
+
+
+def warm(system: str, signature: Signature):
+    """Build the engine of a catalog version ahead of the first request.
+
+    One task per pool process is submitted at a time. Once its engine is
+    built a task waits at the pool's barrier until every task has been
+    picked up, so no process runs two of them and every process gets one.
+    """
+    _engine(system, signature)
+    try:
+        _warm_barrier.wait(WARM_BARRIER_TIMEOUT)
+    except threading.BrokenBarrierError:
+        # A process was busy for too long; it builds the engine on its first search
+        pass
@@ -0,0 +1,185 @@
+import re
+import time
+from heapq import heappop, heappush, merge
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.catalog import CompactCatalog
+
+_VERSION_PART = re.compile(r"\d+|[^\W\d_]+")
+
+# Combinations enumerated between two looks at the clock
+DEADLINE_CHECK_EVERY = 64
+
+
+def version_key(version: str) -> Tuple:
+    """Sort key for version strings, numeric parts compare as numbers."""
+    return tuple(
+        (1, int(part)) if part.isdigit() else (0, part.lower())
+        for part in _VERSION_PART.findall(version)
+    )
+
+
+def version_matches(version: str, wanted: Optional[str]) -> bool:
+    """`wanted` is the whole version or a prefix ending at a `.` or `-`, like `3.3` for `3.3.10`."""
+    if not wanted:
+        return True
+    version = version.lower()
+    return version == wanted or version.startswith((f"{wanted}.", f"{wanted}-"))
+
+
+def ranked_combinations(lists: Sequence[Sequence[int]]) -> Iterator[Tuple[int, Tuple[int, ...]]]:
+    """Lazily yield index tuples over `lists` by increasing sum of indices.
+
+    Each list is ordered best candidate first, so the first tuples yielded
+    combine the best candidates. Only the frontier of the enumeration is kept
+    in memory, never the full Cartesian product.
+    """
+    start = (0,) * len(lists)
+    heap = [(0, start)]
+    seen = {start}
+    while heap:
+        rank, indices = heappop(heap)
+        yield rank, indices
+        for i, index in enumerate(indices):
+            if index + 1 < len(lists[i]):
+                successor = indices[:i] + (index + 1,) + indices[i + 1 :]
+                if successor not in seen:
+                    seen.add(successor)
+                    heappush(heap, (rank + 1, successor))
+
+
+class SuggestionEngine:
+    """Finds alternative module combinations in one catalog.
+
+    For each (release, compiler chain) bucket the catalog rows are grouped by
+    package, newest version first, with the release's standalone ("") modules
+    added to every bucket. A request only looks at the buckets holding all the
+    requested packages and enumerates their combinations best first, so the
+    cost is bounded by the number of suggestions asked for.
+
+    With an `ExtensionIndex`, the extensions provided by the modules of a
+    chain are candidates in its bucket too, so an extension can be suggested
+    together with regular modules.
+    """
+
+    def __init__(self, catalog: CompactCatalog, extensions=None):
+        self.catalog: CompactCatalog = catalog
+        # release -> [(compiler, {package: rows newest first}, core)], releases newest first.
+        # `core` holds the standalone modules of the release, for packages the bucket lacks.
+        self._releases: List[Tuple[str, List[Tuple[str, Dict[str, List[int]], Dict[str, List[int]]]]]] = []
+
+        records = catalog.records
+        row_record = catalog.row_record
+        record_keys: Dict[int, Tuple] = {}
+
+        def row_key(row: int) -> Tuple:
+            record = row_record[row]
+            key = record_keys.get(record)
+            if key is None:
+                key = record_keys[record] = version_key(records[record].version)
+            return key
+
+        def by_package(rows) -> Dict[str, List[int]]:
+            packages: Dict[str, List[int]] = {}
+            for row in rows:
+                packages.setdefault(records[row_record[row]].package.strip(), []).append(row)
+            for candidates in packages.values():
+                candidates.sort(key=row_key, reverse=True)
+            return packages
+
+        def bucket_rows(release: str, compiler: str) -> Sequence[int]:
+            rows = catalog.rows(release, compiler)
+            if extensions is not None:
+                return [*rows, *extensions.chain_rows(release, compiler)]
+            return rows
+
+        for release in sorted(catalog, reverse=True):
+            # The standalone modules are sorted once and shared by every bucket. They
+            # are merged into a bucket only for the packages it has rows of too,
+            # a bucket's own rows go first among equal versions
+            core = by_package(bucket_rows(release, "")) if "" in catalog[release] else {}
+            buckets = []
+            for compiler in catalog[release]:
+                packages = by_package(bucket_rows(release, compiler))
+                if compiler == "":
+                    buckets.append((compiler, packages, {}))
+                    continue
+                for package, own in packages.items():
+                    candidates = core.get(package)
+                    if candidates:
+                        packages[package] = list(merge(own, candidates, key=row_key, reverse=True))
+                buckets.append((compiler, packages, core))
+            self._releases.append((release, buckets))
+
+    @staticmethod
+    def _bucket_stream(position: int, lists: List[List[int]]) -> Iterator[Tuple[int, int, Tuple[int, ...]]]:
+        for rank, indices in ranked_combinations(lists):
+            yield rank, position, tuple(lists[i][index] for i, index in enumerate(indices))
+
+    def suggest(
+        self,
+        selected: List[Dict],
+        max_suggestions: Optional[int] = None,
+        stats: Optional[Dict] = None,
+        deadline: Optional[float] = None,
+        max_combinations: Optional[int] = None,
+    ) -> List[List[Dict]]:
+        """Return up to `max_suggestions` module groups matching `selected`.
+
+        Groups come newest release first; within a release, groups built from
+        newer versions come first. The search stops early at `deadline` (a
+        `time.monotonic()` value) or after `max_combinations` combinations,
+        returning the groups found so far. The number of combinations looked
+        at and whether the search stopped early are stored in
+        `stats["combinations"]` and `stats["truncated"]` when a dict is passed.
+        """
+        if stats is None:
+            stats = {}
+        stats["combinations"] = 0
+        stats["truncated"] = False
+        required = [s.get("package", "") for s in selected]
+        if not required:
+            return []
+
+        records = self.catalog.records
+        row_record = self.catalog.row_record
+        found: List[List[Dict]] = []
+        seen = set()
+        for _, buckets in self._releases:
+            if deadline is not None and time.monotonic() >= deadline:
+                stats["truncated"] = True
+                return found
+            streams = []
+            for position, (_, packages, core) in enumerate(buckets):
+                lists = []
+                for package in required:
+                    name = package.strip()
+                    candidates = [
+                        row
+                        for row in packages.get(name) or core.get(name, ())
+                        if records[row_record[row]].package == package
+                    ]
+                    if not candidates:
+                        break
+                    lists.append(candidates)
+                else:
+                    streams.append(self._bucket_stream(position, lists))
+
+            for _, _, rows in merge(*streams):
+                combinations = stats["combinations"]
+                if (max_combinations is not None and combinations >= max_combinations) or (
+                    deadline is not None
+                    and combinations % DEADLINE_CHECK_EVERY == 0
+                    and time.monotonic() >= deadline
+                ):
+                    stats["truncated"] = True
+                    return found
+                stats["combinations"] += 1
+                key = tuple(self.catalog.row_key(row) for row in rows)
+                if key in seen:
+                    continue
+                seen.add(key)
+                found.append([self.catalog.entry(row) for row in rows])
+                if max_suggestions is not None and len(found) >= max_suggestions:
+                    return found
+        return found
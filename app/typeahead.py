@@ -0,0 +1,93 @@
+import heapq
+from bisect import bisect_left
+from typing import Dict, List, Set, Tuple
+
+from app.catalog import IS_EXTENSION, CompactCatalog
+from app.suggestion_engine import version_key
+
+DEFAULT_SUGGEST_LIMIT = 10
+MAX_SUGGEST_LIMIT = 50
+
+# Prefixes matching at least this many completions keep their ranked top entries
+MEMO_MIN_MATCHES = 256
+
+
+class SuggestIndex:
+    """Ranked prefix completion over the module names of one catalog.
+
+    Completions are package names, `package/version` names and the names of
+    extensions, lower-cased and held in a sorted array, so the completions of
+    a prefix are the contiguous range found by two bisections. Within that
+    range an exact match comes first, then packages before versions, then
+    completions available in more releases, then newer versions. The ranked
+    top of a prefix with a large range (short prefixes) is computed once.
+    """
+
+    def __init__(self, catalog: CompactCatalog):
+        record_releases: Dict[int, Set[int]] = {}
+        record_regular: Set[int] = set()
+        for record_id, release_id, flags in zip(catalog.row_record, catalog.row_release, catalog.row_flags):
+            record_releases.setdefault(record_id, set()).add(release_id)
+            if not flags & IS_EXTENSION:
+                record_regular.add(record_id)
+
+        # lower-cased text -> [text, package, newest version, its key, releases, extension only]
+        completions: Dict[str, List] = {}
+        version_keys: Dict[str, Tuple] = {}
+        for record_id, releases in record_releases.items():
+            record = catalog.records[record_id]
+            extension = record_id not in record_regular
+            key = version_keys.get(record.version)
+            if key is None:
+                key = version_keys[record.version] = version_key(record.version)
+            for text in (record.package, record.name):
+                if not text:
+                    continue
+                completion = completions.get(text.lower())
+                if completion is None:
+                    completions[text.lower()] = [text, record.package, record.version, key, set(releases), extension]
+                    continue
+                if key > completion[3]:
+                    completion[2:4] = record.version, key
+                completion[4] |= releases
+                completion[5] = completion[5] and extension
+
+        self._keys: List[str] = sorted(completions)
+        self._items: List[Dict] = []
+        self._rank: List[Tuple] = []
+        for key in self._keys:
+            text, package, version, newest, releases, extension = completions[key]
+            is_package = text == package
+            self._items.append(
+                {
+                    "text": text,
+                    "kind": "package" if is_package else "module",
+                    "package": package,
+                    "version": version,
+                    "releases": len(releases),
+                    "extension": extension,
+                }
+            )
+            self._rank.append((is_package, len(releases), newest))
+        self._top: Dict[str, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def suggest(self, prefix: str, limit: int = DEFAULT_SUGGEST_LIMIT) -> List[Dict]:
+        """Best `limit` completions starting with `prefix`, case-insensitive."""
+        prefix = prefix.strip().lower()
+        if not prefix or limit < 1:
+            return []
+        keys = self._keys
+        lo = bisect_left(keys, prefix)
+        hi = bisect_left(keys, prefix + "\U0010ffff", lo)
+        top = self._top.get(prefix)
+        if top is None:
+            top = heapq.nlargest(MAX_SUGGEST_LIMIT, range(lo, hi), key=self._rank.__getitem__)
+            if hi - lo >= MEMO_MIN_MATCHES:
+                self._top[prefix] = top
+        # The prefix itself sorts first in its range
+        if lo < hi and keys[lo] == prefix:
+            top = [lo] + [i for i in top if i != lo]
+        return [self._items[i] for i in top[:limit]]
@@ -1,194 +1,458 @@
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 from datetime import datetime
+import gc
+import threading
 import time
-import json
 import os
-import subprocess
-from itertools import combinations, product
-import threading
+from itertools import combinations
 from flask import app, current_app
 import schedule
-import re
+from app.catalog import CatalogSnapshot, CompactCatalog
+from app import jsonio, suggest_worker
+from app.incremental import (
+    keyed_entries,
+    load_state,
+    module_delta,
+    save_state,
+    write_delta
+)
+from app.compatibility import CompatibilityGraph
+from app.fetch import fetch_raw
+from app.processing import process_entries
+from app.extension_index import ExtensionIndex
+from app.module_lines import ModuleResolver
+from app.search_index import SearchIndex
+from app.suggestion_engine import SuggestionEngine
+from app.index_snapshot import read_index_snapshot, write_index_snapshot
+from app.publish import (
+    BINARY_SUFFIX,
+    INDEX_SUFFIX,
+    SLICES_SUFFIX,
+    SQLITE_SUFFIX,
+    current_path,
+    current_version,
+    publish_version,
+)
+from app.slices import BucketSlices, description_index, write_slices
+from app.sqlite_store import SqliteSearchIndex, write_sqlite
+from app.typeahead import SuggestIndex
+
+
+def get_snapshot(system):
+    """Current catalog snapshot of a system; pass it on to answer a request from one version."""
+    return current_app.config["CUSTOM_CONFIG"].catalog_cache.get(system)
 
 
 def get_data_dictionary(system):
-    cfg = current_app.config["CUSTOM_CONFIG"]
-    file_path = os.path.join(cfg.data_dir, f"processed_module_{system}.json")
-    if os.path.exists(file_path):
-        with open(file_path, "r") as f:
-            data = json.load(f)
-        cfg.data_dictionary[system] = data
-    return cfg.data_dictionary.get(system, {})
+    snapshot = get_snapshot(system)
+    return snapshot.data if snapshot is not None else {}
 
 
-def process_data(system_name):
-    system_data_file = os.path.join(
-        current_app.config["CUSTOM_CONFIG"].data_dir, f"raw_{system_name}.json"
+def prebuilt(snapshot, name):
+    """Structure `name` as serialized with the catalog version, None if it was not."""
+    return snapshot.derived("index_snapshot", load_index_snapshot).get(name)
+
+
+def load_index_snapshot(snapshot):
+    return read_index_snapshot(snapshot.signature[0] + INDEX_SUFFIX, snapshot.data)
+
+
+def derive(snapshot, name, builder):
+    """`snapshot.derived`, taking the structure from the version's index snapshot when it has one."""
+
+    def build(s):
+        value = prebuilt(s, name)
+        return value if value is not None else builder(s)
+
+    return snapshot.derived(name, build)
+
+
+def get_search_index(system, snapshot=None):
+    snapshot = snapshot or get_snapshot(system)
+    if snapshot is None:
+        return SearchIndex(CompactCatalog())
+    # Built once per loaded catalog version and shared by all requests
+    return snapshot.derived("search_index", build_search_index)
+
+
+def build_search_index(snapshot, previous=None):
+    """Search index of a snapshot for the configured CATALOG_BACKEND."""
+    if current_app.config["CUSTOM_CONFIG"].catalog_backend == "sqlite":
+        index = SqliteSearchIndex.open(snapshot.signature[0] + SQLITE_SUFFIX, snapshot.data)
+    else:
+        index = prebuilt(snapshot, "search_index")
+        if isinstance(index, SearchIndex):
+            return index
+        previous_index = previous.peek("search_index") if previous is not None else None
+        if not isinstance(previous_index, SearchIndex):
+            previous_index = None
+        index = SearchIndex(snapshot.data, previous=previous_index)
+    index.extensions = get_extension_index(None, snapshot)
+    return index
+
+
+def get_extension_index(system, snapshot=None):
+    snapshot = snapshot or get_snapshot(system)
+    if snapshot is None:
+        return ExtensionIndex(CompactCatalog())
+    return derive(snapshot, "extension_index", lambda s: ExtensionIndex(s.data))
+
+
+def get_suggest_index(system, snapshot=None):
+    snapshot = snapshot or get_snapshot(system)
+    if snapshot is None:
+        return SuggestIndex(CompactCatalog())
+    return derive(snapshot, "suggest_index", lambda s: SuggestIndex(s.data))
+
+
+def get_module_resolver(system, snapshot=None):
+    snapshot = snapshot or get_snapshot(system)
+    if snapshot is None:
+        return ModuleResolver(CompactCatalog())
+    return derive(
+        snapshot, "module_resolver", lambda s: ModuleResolver(s.data, extensions=get_extension_index(None, s))
     )
-    
-    with open(system_data_file, "r",) as f:
-        raw_data = json.load(f)
 
+
+def get_compatibility_graph(system, snapshot=None):
+    snapshot = snapshot or get_snapshot(system)
+    if snapshot is None:
+        return None
+    return derive(snapshot, "compatibility_graph", lambda s: CompatibilityGraph.from_catalog(s.data))
+
+
+def get_suggestion_engine(system, snapshot=None):
+    snapshot = snapshot or get_snapshot(system)
+    if snapshot is None:
+        return SuggestionEngine(CompactCatalog())
+    return snapshot.derived("suggestion_engine", build_suggestion_engine)
+
+
+def build_suggestion_engine(snapshot):
+    return SuggestionEngine(snapshot.data, extensions=get_extension_index(None, snapshot))
+
+
+def get_bucket_slices(system, snapshot=None):
+    snapshot = snapshot or get_snapshot(system)
+    if snapshot is None:
+        return None
+    # Versions published before slices existed get them on first use
+    return snapshot.derived("bucket_slices", lambda s: BucketSlices.open(s.signature[0] + SLICES_SUFFIX, s.data))
+
+
+def get_description_index(system, snapshot=None):
+    snapshot = snapshot or get_snapshot(system)
+    if snapshot is None:
+        return {}
+    return snapshot.derived("description_index", lambda s: description_index(s.data))
+
+
+def build_tree(fragments):
     tree = {}
-    for entry in raw_data:
-        package = entry["package"]
-        # description = entry.get("description", "No description available.")
-        url = entry.get("url", "No URL available.").strip()
-        for version in entry["versions"]:
-            v_name = version["versionName"]
-            full_name = f"{package}/{v_name}"
-
-            extenstions = version.get("provides", [])
-
-            description = version.get("help", "No description available.") \
-                                .replace("\n", " ") \
-                                .replace("\r", " ").strip() \
-                                .replace("  ", " ").strip()
-            description = re.sub(r"^Description =========== ", r"Description\n===========\n", description, flags=re.IGNORECASE)
-            description = re.sub(r" More information ================ ", r"\n\nMore information\n================\n", description, flags=re.IGNORECASE)
-            description = re.sub(r" Included extensions ===================.*", r"\n\nIncluded extensions\n===================\n", description, flags=re.IGNORECASE)
-            description = description + f"{"\n".join(extenstions)}"
-
-            for parent_set in version.get("parent", []):
-                release = parent_set[0] if len(parent_set) > 0 else "Core"
-                compiler = " ".join(parent_set[1:]) if len(parent_set) > 1 else ""
-
-                if release not in tree:
-                    tree[release] = {}
-                if compiler not in tree[release]:
-                    tree[release][compiler] = []
-
-                tree[release][compiler].append(
-                    {
-                        "package": package,
-                        "version": v_name,
-                        "name": full_name,
-                        "description": description,
-                        "url": url,
-                        "release": release,
-                        "compiler": compiler,
-                        "load_cmd": f"module load {release} {compiler} {full_name}",
-                        # "extension_list": extenstions,
-                        "is_extension": False,
-                    }
-                )
-
-            if len(extenstions) == 0:
+    for fragment in fragments:
+        for release, compiler, module in fragment:
+            if release not in tree:
+                tree[release] = {}
+            if compiler not in tree[release]:
+                tree[release][compiler] = []
+            tree[release][compiler].append(module)
+    return tree
+
+
+_gc_pause_lock = threading.Lock()
+_gc_pauses = 0
+_gc_was_enabled = False
+
+
+@contextmanager
+def gc_paused():
+    """Build long-lived catalog structures without cyclic garbage collection.
+
+    Every full collection walks all tracked objects. While a catalog is built
+    the heap grows by millions of them, and each of the resulting collections
+    stalls request threads for a few hundred ms. Collection is paused for the
+    build; at the end one collection frees the cyclic garbage of the pause,
+    also that of concurrent requests. Nothing is frozen here, see
+    `warm_systems` for the one `gc.freeze` of a worker.
+
+    The pause is process-wide: use it in the update and warm-up threads only,
+    never on the request path. Nested and concurrent pauses end with the
+    last one, which restores collection only if it was enabled before.
+    """
+    global _gc_pauses, _gc_was_enabled
+    with _gc_pause_lock:
+        if _gc_pauses == 0:
+            _gc_was_enabled = gc.isenabled()
+            gc.disable()
+        _gc_pauses += 1
+    try:
+        yield
+    finally:
+        with _gc_pause_lock:
+            _gc_pauses -= 1
+            if _gc_pauses == 0 and _gc_was_enabled:
+                gc.collect()
+                gc.enable()
+
+
+def warm_catalog(snapshot, previous=None):
+    """Build the lookup structures of a freshly published catalog.
+
+    The previous snapshot's search index is reused for the parts that did not
+    change.
+    """
+    snapshot.derived("search_index", lambda s: build_search_index(s, previous))
+    get_compatibility_graph(None, snapshot)
+    if current_app.config["CUSTOM_CONFIG"].suggest_pool is None:
+        # Otherwise suggestions are computed in the suggestion processes
+        snapshot.derived("suggestion_engine", build_suggestion_engine)
+    get_suggest_index(None, snapshot)
+    get_module_resolver(None, snapshot)
+    get_bucket_slices(None, snapshot)
+
+
+def index_structures(snapshot, previous=None):
+    """The derived structures of a catalog version that are written to its index snapshot.
+
+    The suggestion engine is left out: it is built in the suggestion
+    processes, in the background.
+    """
+    structures = {
+        "extension_index": get_extension_index(None, snapshot),
+        "compatibility_graph": get_compatibility_graph(None, snapshot),
+        "suggest_index": get_suggest_index(None, snapshot),
+        "module_resolver": get_module_resolver(None, snapshot),
+    }
+    if current_app.config["CUSTOM_CONFIG"].catalog_backend == "json":
+        structures["search_index"] = snapshot.derived("search_index", lambda s: build_search_index(s, previous))
+    return structures
+
+
+def warm_systems(app):
+    """Load and index the catalog of every configured system ahead of the first request.
+
+    Runs in a background thread at startup. Versions with an index snapshot
+    load their indexes from it instead of building them. Progress is reported
+    by `/status/ready`. Once all systems are loaded the heap is collected and
+    frozen (`gc.freeze`), so later collections skip the startup catalogs.
+    This happens once per worker, as it starts taking traffic; catalogs of
+    later updates are not frozen, nor are objects of later requests.
+    """
+    cfg = app.config["CUSTOM_CONFIG"]
+    with app.app_context():
+        for system in cfg.systems:
+            cfg.warmup.start(system)
+            started = time.perf_counter()
+            try:
+                with gc_paused():
+                    snapshot = get_snapshot(system)
+                    if snapshot is not None:
+                        warm_catalog(snapshot)
+                if snapshot is None:
+                    cfg.warmup.missing(system)
+                    continue
+                # Ready only once the suggestion processes have their engine too
+                cfg.warm_suggest_processes(system, snapshot.signature)
+            except Exception as e:
+                print(f"[!] Warm-up of {system} failed: {e}")
+                cfg.warmup.failed(system, str(e))
                 continue
-            else:
-                if compiler != "":
-                    extension_compiler = f"{compiler} {full_name}_Ext"
-                else:
-                    extension_compiler = f"{full_name}_Ext"
-            
-                if extension_compiler not in tree[release]:
-                    tree[release][extension_compiler] = []
-                
-                for extension_i in extenstions:    
-                    if extension_i not in tree[release][extension_compiler]:
-                        extension_package = extension_i.split("/")
-                        if len(extension_package) > 1:
-                            extension_package_full = extension_package[0]
-                            extension_version = extension_package[1]
-                        else:
-                            extension_package_full = extension_i
-                            extension_version = ""
-                        tree[release][extension_compiler].append(
-                            {
-                                "package": extension_package_full,
-                                "version": extension_version,
-                                "name": extension_i,
-                                "description": f"This is an extension automatically available by loading {full_name} module.",
-                                "url": "",
-                                "release": release,
-                                "compiler": extension_compiler,
-                                "parent": full_name,
-                                "is_extension": True,
-                                "load_cmd": f"module load {release} {compiler} {full_name}"
-                            }
-                        )
-
-    with open(
-        os.path.join(
-            current_app.config["CUSTOM_CONFIG"].data_dir,
-            f"processed_module_{system_name}.json",
-        ),
-        "w",
-    ) as f:
-        json.dump(tree, f, indent=4)
+            seconds = time.perf_counter() - started
+            source = "snapshot" if snapshot.peek("index_snapshot") else "built"
+            cfg.metrics.observe("modscout_warmup_seconds", seconds, system=system, source=source)
+            cfg.warmup.done(system, snapshot.version, seconds, source)
+        gc.collect()
+        gc.freeze()
+
+
+def process_data(system_name):
+    """Rebuild the processed catalog, reprocessing only packages that changed.
+
+    Every raw package entry is fingerprinted and compared with the previous
+    build. Unchanged packages reuse their processed placements. Only this
+    step and the search index vocabulary are incremental: when anything
+    changed, the artifacts and indexes of the new version are built in full.
+    Returns the delta record that is also written to `delta_<system>.json`.
+    """
+    cfg = current_app.config["CUSTOM_CONFIG"]
+    started = time.perf_counter()
+    system_data_file = os.path.join(cfg.data_dir, f"raw_{system_name}.json")
+
+    with open(system_data_file, "rb") as f:
+        raw_data = jsonio.load(f)
+
+    processed_path = current_path(cfg.data_dir, system_name)
+    previous_state = load_state(cfg.data_dir, system_name) if os.path.exists(processed_path) else {}
+    state = {}
+    delta = {"added": [], "removed": [], "changed": []}
+    entries_touched = 0
+    packages_reprocessed = 0
+    # Fingerprinting and processing run in the process pool, shard by shard
+    entries = [
+        (key, entry, previous_state[key][0] if key in previous_state else None)
+        for key, entry in keyed_entries(raw_data)
+    ]
+    try:
+        processed = process_entries(entries, cfg.process_pool, cfg.process_workers)
+    except BrokenProcessPool:
+        # A pool process died (e.g. killed for memory); start a fresh pool and retry once
+        print(f"[!] Processing pool of {system_name} broke, restarting it")
+        cfg.process_pool = cfg.new_process_pool()
+        processed = process_entries(entries, cfg.process_pool, cfg.process_workers)
+    for key, entry_fingerprint, fragment in processed:
+        previous = previous_state.get(key)
+        if fragment is None:
+            state[key] = previous
+            continue
+        state[key] = (entry_fingerprint, fragment)
+        packages_reprocessed += 1
+        entries_touched += len(fragment) + (len(previous[1]) if previous is not None else 0)
+        for kind, names in module_delta(previous[1] if previous is not None else [], fragment).items():
+            delta[kind] += names
+    for key, (_, fragment) in previous_state.items():
+        if key not in state:
+            entries_touched += len(fragment)
+            delta["removed"] += module_delta(fragment, [])["removed"]
+
+    changed = packages_reprocessed > 0 or len(state) != len(previous_state)
+    if changed:
+        with gc_paused():
+            tree = build_tree(fragment for _, fragment in state.values())
+            catalog = CompactCatalog.from_tree(tree)
+            cfg.metrics.observe(
+                "modscout_update_stage_seconds", time.perf_counter() - started, system=system_name, stage="process"
+            )
+            previous_snapshot = cfg.catalog_cache.peek(system_name)
+
+            def write_indexes(path):
+                # Built on the fresh catalog, loaded on its mapped copy by every worker
+                staged = CatalogSnapshot(system_name, catalog, (path[: -len(INDEX_SUFFIX)], 0, 0))
+                write_index_snapshot(index_structures(staged, previous_snapshot), catalog, path)
+
+            artifacts = {BINARY_SUFFIX: catalog.write_binary, SLICES_SUFFIX: lambda path: write_slices(catalog, path)}
+            if cfg.catalog_backend == "sqlite":
+                artifacts[SQLITE_SUFFIX] = lambda path: write_sqlite(catalog, path)
+            artifacts[INDEX_SUFFIX] = write_indexes
+            with cfg.metrics.time("modscout_update_stage_seconds", system=system_name, stage="write"):
+                version = publish_version(cfg.data_dir, system_name, tree, cfg.keep_versions, artifacts)
+            delta["version"] = version
+
+            # Hand the fresh catalog to the in-memory cache so the JSON is not parsed again
+            with cfg.metrics.time("modscout_update_stage_seconds", system=system_name, stage="publish"):
+                snapshot = cfg.catalog_cache.publish(system_name, catalog)
+                warm_catalog(snapshot, previous_snapshot)
+                save_state(cfg.data_dir, system_name, state)
+    else:
+        cfg.metrics.observe(
+            "modscout_update_stage_seconds", time.perf_counter() - started, system=system_name, stage="process"
+        )
+
+    delta.update(
+        {
+            "system": system_name,
+            "built_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "full_rebuild": not previous_state,
+            "packages_total": len(state),
+            "packages_reprocessed": packages_reprocessed,
+            "entries_touched": entries_touched,
+            "duration_seconds": round(time.perf_counter() - started, 3),
+        }
+    )
+    write_delta(cfg.data_dir, system_name, delta)
+    print(
+        f"{str(system_name).capitalize()} catalog rebuilt in {delta['duration_seconds']}s: "
+        f"{packages_reprocessed}/{len(state)} packages reprocessed, {entries_touched} entries touched, "
+        f"{len(delta['added'])} added, {len(delta['removed'])} removed, {len(delta['changed'])} changed modules"
+    )
+    return delta
 
 
 def fetch_module_data(app, system_name):
     with app.app_context():
         cfg = app.config["CUSTOM_CONFIG"]
-        if cfg.update_job_status[system_name]["is_running"]:
+        if not cfg.jobs.try_start(system_name, cfg.worker_id):
+            print(f"{str(system_name).capitalize()} update is already running, skipped")
             return
 
-        cfg.update_job_status[system_name]["is_running"] = True
         print(
             f"{str(system_name).capitalize()} system module data update started at {datetime.now()}"
         )
 
         # Fetch normal data
-        local_path = os.path.join(
-            current_app.config["CUSTOM_CONFIG"].data_dir, f"raw_{system_name}.json"
-        )
-        remote_cmd = "$LMOD_DIR/spider -o jsonSoftwarePage $MODULEPATH"
+        local_path = os.path.join(cfg.data_dir, f"raw_{system_name}.json")
+        error = None
+        progress = {}
         try:
-            # Native SSH call
-            result = subprocess.run(
-                [
-                    "ssh",
-                    "-i",
-                    f"{cfg.hpc_ssh_key}",
-                    f"{cfg.hpc_username}@{cfg.systems[system_name]['host']}",
-                    remote_cmd,
-                ],
-                capture_output=True,
-                text=True,
-                check=True,
+            with cfg.metrics.time("modscout_update_stage_seconds", system=system_name, stage="fetch"):
+                progress["bytes_fetched"] = fetch_raw(cfg, system_name, local_path)
+            cfg.metrics.inc("modscout_update_bytes_total", progress["bytes_fetched"], system=system_name)
+            print(f"{str(system_name).capitalize()} spider output fetched ({progress['bytes_fetched']} bytes)")
+            cfg.jobs.heartbeat(system_name, cfg.worker_id, **progress)
+            process_data(system_name)
+            print(
+                f"{str(system_name).capitalize()} system module data update completed at {datetime.now()}"
             )
-            with open(local_path, "w") as f:
-                f.write(result.stdout)
-
         except Exception as e:
+            # Keep serving the previous catalog, a failed fetch is never processed
+            error = str(e)
             print(f"[!] Error on {system_name}: {e}")
+        finally:
+            progress["version"] = current_version(cfg.data_dir, system_name)
+            cfg.jobs.finish(system_name, cfg.worker_id, error, **progress)
+            cfg.metrics.inc("modscout_updates_total", system=system_name, result="error" if error else "success")
+            # Updates are rare, don't wait for the next request to publish them
+            cfg.metrics.flush()
 
-        process_data(system_name)
-        print(
-            f"{str(system_name).capitalize()} system module data update completed at {datetime.now()}"
-        )
 
-        # Fetching extension information
-
-        # Set update task status
-        cfg.update_job_status[system_name]["last_run"] = datetime.now().strftime(
-            "%Y-%m-%d %H:%M:%S"
-        )
-        cfg.update_job_status[system_name]["is_running"] = False
+def start_updates(app):
+    """Queue an update of every system on the bounded update pool."""
+    cfg = app.config["CUSTOM_CONFIG"]
+    for sys in cfg.systems.keys():
+        print(f"Starting update for {sys}")
+        cfg.update_pool.submit(fetch_module_data, app, sys)
 
 
 def auto_update(app):
-    with app.app_context():
-        cfg = app.config["CUSTOM_CONFIG"]
-        for sys in cfg.systems.keys():
-            print(f"Starting update for {sys}")
-            threading.Thread(target=fetch_module_data, args=(app, sys)).start()
+    cfg = app.config["CUSTOM_CONFIG"]
+    # A worker taking over the schedule may still see a run as due that the
+    # previous leader already started
+    if cfg.jobs.claim_once(f"scheduled-update:{datetime.now():%Y-%m-%d}", cfg.worker_id):
+        start_updates(app)
 
 
 def background_scheduler(app):
+    """Run the update schedule in the one worker holding the scheduler lease.
+
+    Every worker runs this loop; the others keep trying to take the lease over
+    in case the leader dies.
+    """
     with app.app_context():
         cfg = app.config["CUSTOM_CONFIG"]
         cfg.day_map[cfg.update_day.lower()].at(cfg.update_time).do(auto_update, app)
 
+        is_leader = False
+        renew_at = 0.0
         while True:
             try:
-                schedule.run_pending()
+                if time.time() >= renew_at:
+                    was_leader = is_leader
+                    is_leader = cfg.jobs.acquire_lease("scheduler", cfg.worker_id, cfg.scheduler_lease_ttl)
+                    renew_at = time.time() + cfg.scheduler_lease_ttl / 3
+                    if is_leader and not was_leader:
+                        print(f"Worker {cfg.worker_id} runs the update schedule")
+                if is_leader:
+                    schedule.run_pending()
                 time.sleep(1)
             except Exception as e:
                 print(f"Error in background_scheduler: {e}")
 
 
-def search(data, query):
+def search(data, query, index=None):
+    if index is not None:
+        return index.search(query)
+
     filtered_data = {}
 
     if query is None or query == "":
@@ -257,18 +521,21 @@ def get_version(m):
     return m.get("version", "").split("-")[0].strip()
 
 
-def has_conflict(selected):
+def find_conflict(selected, graph=None):
+    """Check `selected` for conflicts and also return the modules causing them."""
     if len(selected) < 2:
-        return False, ""
+        return False, "", []
 
     # For different release
-    for m_i, m_ii in combinations(selected, 2):
-        if get_release(m_i) != get_release(m_ii):
-            return True, "Modules must share the same releases."
+    release = get_release(selected[0])
+    for m in selected[1:]:
+        if get_release(m) != release:
+            return True, "Modules must share the same releases.", [m]
 
     # If releases are same
     # Standalone
     msg = ""
+    offending = []
     for m_i, m_ii in combinations(selected, 2):
         if (
             get_compiler(m_i) == get_compiler(m_ii)
@@ -280,100 +547,32 @@ def has_conflict(selected):
                 f"Same modules ({get_package(m_i)}) with different versions "
                 f"{versions} cannot be loaded together.\n"
             )
+            offending += [m for m in (m_i, m_ii) if m not in offending]
     if msg != "":
-        return True, msg
-
-    pkgs_with_compiler = [
-        set(l.get("compiler").split(" "))
-        for l in selected
-        if l
-        if get_compiler(l) != ""
-    ]
-
-    if len(pkgs_with_compiler) < 2:
-        return False, ""
-
-    for i in range(len(pkgs_with_compiler) - 1):
-        current_set = pkgs_with_compiler[i]
-
-        next_set = pkgs_with_compiler[i + 1]
-
-        is_subset = current_set.issubset(next_set) or next_set == set([""])
-        is_superset = current_set.issuperset(next_set) or next_set == set([""])
-
-        if not (is_subset or is_superset):
-            return True, "Modules must share the same dependencies."
-
-    return False, ""
-
-
-def clean_up_suggestion(suggestions, selected):
-    selected_pkgs = [item["package"] for item in selected]
-
-    # Deduplication
-    seen = []
-    filtered_pkgs = []
-
-    for group in suggestions:
-        # print(f"Evaluating group: {[item['load_cmd'] for item in group]}")  # Debug print
-        # Deduplication: Check if we've processed this exact group before
-        if group not in seen:
-            # print(f"Adding above group to seen list.")  # Debug print
-            seen.append(group)
-
-            # Only keep if the packages match the selected list
-            current_pkgs = [item["package"] for item in group]
-            # print(f"Current packages: {current_pkgs}, Selected packages: {selected_pkgs}")  # Debug print
-            if current_pkgs == selected_pkgs:
-                # print(f"Group matches selected packages. Keeping it.")  # Debug print
-                filtered_pkgs.append(group)
-
-    return filtered_pkgs
-
-
-def find_module_variant_mpackage(selected, all_modules):
-    mpackage = []
-
-    # Extract just the package names we are looking for (e.g., 'gcc', 'llvm')
-    required_pkg_names = [get_package(s) for s in selected]
-    # print(f"Required package names: {required_pkg_names}")  # Debug print
-
-    for release_i in all_modules:
-        for compiler_i in all_modules[release_i]:
-            # print(f"Checking release: {release_i}, compiler: {compiler_i}")  # Debug print
-
-            modules_in_bucket = all_modules[release_i][compiler_i]
-            modules_in_bucket += all_modules[release_i][""]  # Include 'None' compiler modules from same release
-            # Group available modules by package name
-            # Example: {'gcc': ['gcc/9.1', 'gcc/9.2', 'gcc/9.3'], 'llvm': ['llvm/10', 'llvm/11']}
-            candidates = {name: [] for name in required_pkg_names}
-            # print(f"candidates: {candidates}")  # Debug print
-
-            for module in modules_in_bucket:
-                pkg_name = get_package(module)
-                if pkg_name in candidates:
-                    candidates[pkg_name].append(module)
-
-            # Ensure ALL requested packages exist in this bucket
-            # If we found 3 GCCs but 0 LLVMs, this bucket is invalid for the user's request.
-            if all(len(variants) > 0 for variants in candidates.values()):
-
-                # We create a list of lists: [[gcc1, gcc2...], [llvm1, llvm2...]]
-                lists_to_combine = [candidates[name] for name in required_pkg_names]
-
-                # Generate Cartesian Product (The gcc_num x llvm_num combinations)
-                # C(gcc1, llvm1), (gcc1, llvm2), (gcc2, llvm1)...
-                for combination in product(*lists_to_combine):
-                    variant_list = list(combination)
+        return True, msg, offending
+
+    # Each module maps to the bitset of toolchain environments it can be loaded
+    # in, the selection is loadable if some environment is common to all.
+    if graph is None or not graph.knows(release):
+        graph = CompatibilityGraph.from_selection(selected)
+    common = None
+    for m in selected:
+        mask = graph.mask(release, get_compiler(m))
+        common = mask if common is None else common & mask
+        if not common:
+            return (
+                True,
+                "Modules must share the same dependencies.\n"
+                f"{m.get('name')} ({get_compiler(m)}) cannot be loaded together with the modules selected before it.",
+                [m],
+            )
 
-                    if variant_list not in mpackage:
-                        mpackage.append(variant_list)
+    return False, "", []
 
-    mpackage.sort(
-        reverse=True, key=lambda x: [get_release(m) for m in x]
-    )  # Sort by release in descending order
 
-    return mpackage
+def has_conflict(selected, graph=None):
+    conflict, msg, _ = find_conflict(selected, graph)
+    return conflict, msg
 
 
 def format_suggestions(suggestions):
@@ -405,15 +604,50 @@ def format_suggestions(suggestions):
     return suggestions_parsed
 
 
-def suggestions(selected, all_modules):
-    suggestions = []
+def suggestions(selected, engine, max_suggestions=None, stats=None):
+    # Find combinations in all releases, best ranked first
+    return suggestion_result(engine.suggest(selected, max_suggestions, stats))
+
 
-    # Find combinations in different releases
-    match = find_module_variant_mpackage(selected, all_modules)
-    # print( "Different releases match results:", [match_ii.get("load_cmd") for match_i in match for match_ii in match_i])  # Debug print
-    if match not in suggestions:
-        suggestions += match
+def budgeted_suggestions(system, snapshot, selected, max_suggestions, stats, admission=None):
+    """`suggestions` within the SUGGEST_TIMEOUT and SUGGEST_MAX_COMBINATIONS budget.
 
+    The search runs in the suggestion pool when there is one. If the budget
+    runs out, the groups found so far are returned and `stats["truncated"]`
+    is set. A search given up on while it still runs in the pool keeps the
+    `admission` slot of its request until it ends.
+    """
+    cfg = current_app.config["CUSTOM_CONFIG"]
+    deadline = time.monotonic() + cfg.suggest_timeout
+    if cfg.suggest_pool is None or snapshot is None:
+        engine = get_suggestion_engine(system, snapshot)
+        found = engine.suggest(selected, max_suggestions, stats, deadline, cfg.suggest_max_combinations)
+        return suggestion_result(found)
+
+    args = (system, snapshot.signature, selected, max_suggestions, deadline, cfg.suggest_max_combinations)
+    for attempt in range(2):
+        try:
+            future = cfg.suggest_pool.submit(suggest_worker.suggest, *args)
+            # The worker stops at the deadline itself, the margin covers the round trip
+            found, worker_stats = future.result(timeout=max(0.0, deadline - time.monotonic()) + 1)
+            break
+        except FutureTimeout:
+            future.cancel()
+            if admission is not None:
+                admission.hold_until(future)
+            found, worker_stats = [], {"combinations": 0, "truncated": True}
+            break
+        except BrokenProcessPool:
+            # A pool process died (e.g. killed for memory); start a fresh pool and retry once
+            if attempt:
+                raise
+            print("[!] Suggestion pool broke, restarting it")
+            cfg.suggest_pool = cfg.new_suggest_pool()
+    stats.update(worker_stats)
+    return suggestion_result(found)
+
+
+def suggestion_result(suggestions):
     if suggestions == []:
         return dict(
             {
@@ -424,9 +658,6 @@ def suggestions(selected, all_modules):
             }
         )
 
-    # print(f"Total suggestions before cleanup: {len(suggestions)}")  # Debug print
-    suggestions = clean_up_suggestion(suggestions, selected)
-    # print(f"Total suggestions after cleanup: {len(suggestions)}")  # Debug print
     suggestions_parsed = format_suggestions(suggestions)
 
     return dict(
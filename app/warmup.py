@@ -0,0 +1,47 @@
+import threading
+import time
+from typing import Dict, Iterable
+
+# States a system goes through while a worker warms up; the last four are final
+PENDING, WARMING, READY, MISSING, FAILED, LAZY = "pending", "warming", "ready", "missing", "failed", "lazy"
+SERVING = (READY, MISSING, LAZY)
+
+
+class WarmupState:
+    """Warm-up progress of the catalogs of one worker, reported by `/status/ready`.
+
+    A system is `ready` once its catalog and indexes are loaded, `missing`
+    when it has no published catalog yet and `failed` when loading raised.
+    With warm-up disabled systems are `lazy`: loaded by their first request.
+    The worker is ready when no system is still pending, warming or failed.
+    """
+
+    def __init__(self, systems: Iterable[str], enabled: bool):
+        self.started_at: float = time.time()
+        self._systems: Dict[str, Dict] = {system: {"state": PENDING if enabled else LAZY} for system in systems}
+        self._lock = threading.Lock()
+
+    def _set(self, system: str, **fields):
+        with self._lock:
+            self._systems.setdefault(system, {}).update(fields)
+
+    def start(self, system: str):
+        self._set(system, state=WARMING)
+
+    def done(self, system: str, version: str, seconds: float, source: str):
+        self._set(system, state=READY, version=version, seconds=round(seconds, 3), source=source)
+
+    def missing(self, system: str):
+        self._set(system, state=MISSING)
+
+    def failed(self, system: str, error: str):
+        self._set(system, state=FAILED, error=error)
+
+    def status(self) -> Dict:
+        with self._lock:
+            systems = {system: dict(info) for system, info in self._systems.items()}
+        return {
+            "ready": all(info["state"] in SERVING for info in systems.values()),
+            "uptime_seconds": round(time.time() - self.started_at, 3),
+            "systems": systems,
+        }
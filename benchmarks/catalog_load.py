@@ -0,0 +1,106 @@
+"""Compare the JSON and memory-mapped catalog paths across worker processes.
+
+Every worker is a fresh interpreter that loads one processed catalog, builds
+the search index and answers one query, like a gunicorn worker serving its
+first request. Reported per mode: cold-start time, and RSS/PSS per worker while
+all workers are alive. PSS splits shared pages between the processes mapping
+them, so it shows what N workers really cost together (Linux only).
+
+    python -m benchmarks.catalog_load data/processed_module_<system>.json --workers 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.catalog import CompactCatalog, MappedCatalog  # noqa: E402
+from app.search_index import SearchIndex  # noqa: E402
+
+
+def memory_kb(pid: str = "self"):
+    """(RSS, PSS) of a process in kB, None where /proc does not provide it."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            fields = {line.split(":")[0]: int(line.split()[1]) for line in f if line.split()[-1] == "kB"}
+        return fields.get("Rss"), fields.get("Pss")
+    except OSError:
+        return None, None
+
+
+def child(mode: str, path: str, query: str):
+    started = time.perf_counter()
+    if mode == "json":
+        with open(path) as f:
+            catalog = CompactCatalog.from_tree(json.load(f))
+    else:
+        catalog = MappedCatalog(path)
+    loaded = time.perf_counter()
+    SearchIndex(catalog).search(query)
+    print(json.dumps({"load_s": loaded - started, "first_search_s": time.perf_counter() - started}), flush=True)
+    # Stay alive until the parent has measured every worker
+    sys.stdin.read()
+
+
+def run_mode(mode: str, path: str, workers: int, query: str):
+    procs = [
+        subprocess.Popen(
+            [sys.executable, __file__, "--child", mode, path, "--query", query],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for _ in range(workers)
+    ]
+    timings = [json.loads(p.stdout.readline()) for p in procs]
+    memory = [memory_kb(str(p.pid)) for p in procs]
+    for p in procs:
+        p.communicate("")
+
+    def mean(values):
+        values = [v for v in values if v is not None]
+        return round(sum(values) / len(values), 4) if values else None
+
+    return {
+        "mode": mode,
+        "workers": workers,
+        "load_s": mean(t["load_s"] for t in timings),
+        "first_search_s": mean(t["first_search_s"] for t in timings),
+        "rss_kb_per_worker": mean(m[0] for m in memory),
+        "pss_kb_per_worker": mean(m[1] for m in memory),
+        "pss_kb_total": sum(m[1] for m in memory) if all(m[1] is not None for m in memory) else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="processed_module_<system>.json")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--query", default="python")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.path, args.query)
+        return
+
+    path = os.path.realpath(args.path)
+    with tempfile.TemporaryDirectory() as tmp:
+        binary = path + ".bin"
+        if not os.path.exists(binary):
+            with open(path) as f:
+                binary = os.path.join(tmp, "catalog.bin")
+                CompactCatalog.from_tree(json.load(f)).write_binary(binary)
+        results = [
+            run_mode("json", path, args.workers, args.query),
+            run_mode("mapped", binary, args.workers, args.query),
+        ]
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""Load test: light requests while heavy conflict checks hammer the server.
+
+Serves a synthetic catalog from a threaded HTTP server in this process and
+runs two phases: light requests alone (search, suggest, status), then the
+same light load next to clients sending conflict checks that ask for huge
+numbers of suggestions. Reported per phase: light request p50/p99, and for
+the heavy requests their latency and outcome (complete, truncated, 429, 503).
+Run it once with SUGGEST_WORKERS=0 and once with the default to compare
+suggestions in the request thread with the suggestion pool.
+
+    python -m benchmarks.conflict_load --packages 3000 --heavy-clients 4
+    SUGGEST_WORKERS=0 python -m benchmarks.conflict_load --packages 3000
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.spider_gen import add_arguments, generate_from_args  # noqa: E402
+
+SYSTEM = "bench"
+
+
+def percentiles(timings: List[float]) -> Dict:
+    if not timings:
+        return {"n": 0}
+    timings = sorted(timings)
+
+    def percentile(p: float) -> float:
+        return round(timings[min(len(timings) - 1, int(p * len(timings)))], 3)
+
+    return {"n": len(timings), "p50_ms": percentile(0.50), "p99_ms": percentile(0.99), "max_ms": percentile(1.0)}
+
+
+def request(url: str, body=None):
+    """(status, parsed JSON body, milliseconds) of one request."""
+    data = json.dumps(body).encode() if body is not None else None
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data, headers=headers), timeout=60) as response:
+            status, payload = response.status, response.read()
+    except urllib.error.HTTPError as e:
+        status, payload = e.code, e.read()
+    elapsed = (time.perf_counter() - started) * 1000
+    try:
+        return status, json.loads(payload), elapsed
+    except ValueError:
+        return status, None, elapsed
+
+
+def start_server(app):
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def light_urls(base: str, packages: List[str], n: int, seed: int) -> List[str]:
+    rnd = random.Random(seed)
+    urls = []
+    for i in range(n):
+        package = rnd.choice(packages)
+        kind = i % 3
+        if kind == 0:
+            urls.append(f"{base}/module/search?" + urllib.parse.urlencode({"system": SYSTEM, "query": package}))
+        elif kind == 1:
+            urls.append(f"{base}/module/suggest?" + urllib.parse.urlencode({"system": SYSTEM, "query": package[:3]}))
+        else:
+            urls.append(f"{base}/status")
+    return urls
+
+
+def heavy_selections(catalog, size: int, seed: int) -> List[List[Dict]]:
+    """Conflicting selections of `size` versions of one of the most common packages.
+
+    Every candidate of each selected module is combined with every candidate
+    of the others, so the number of combinations grows exponentially with
+    `size`. One module moved to another release makes each selection conflict.
+    """
+    rnd = random.Random(seed)
+    releases = sorted(catalog)
+    by_package: Dict[str, List[int]] = {}
+    for row in range(catalog.row_count):
+        if not catalog.row_flags[row] & 1:
+            by_package.setdefault(catalog.records[catalog.row_record[row]].package, []).append(row)
+    common = sorted(by_package, key=lambda package: len(by_package[package]), reverse=True)[:10]
+    selections = []
+    for _ in range(50):
+        rows = rnd.choices(by_package[rnd.choice(common)], k=size)
+        selection = [catalog.entry(row) for row in rows]
+        # Move one module to another release so the selection conflicts
+        other = [r for r in releases if r != selection[0]["release"]]
+        if other:
+            selection[-1] = dict(selection[-1], release=rnd.choice(other))
+        selections.append(selection)
+    return selections
+
+
+def run_phase(base: str, urls: List[str], selections: List[List[Dict]], heavy_clients: int, seconds: float) -> Dict:
+    stop = threading.Event()
+    light: List[float] = []
+    heavy: List[float] = []
+    outcomes: Counter = Counter()
+    lock = threading.Lock()
+
+    def light_client():
+        i = 0
+        while not stop.is_set():
+            _, _, ms = request(urls[i % len(urls)])
+            with lock:
+                light.append(ms)
+            i += 1
+            time.sleep(0.01)
+
+    def heavy_client(seed: int):
+        rnd = random.Random(seed)
+        while not stop.is_set():
+            body = {"system": SYSTEM, "selected": rnd.choice(selections), "max_suggestions": rnd.randint(10**5, 10**6)}
+            status, payload, ms = request(f"{base}/module/conflict", body)
+            with lock:
+                heavy.append(ms)
+                if status != 200:
+                    outcomes[str(status)] += 1
+                else:
+                    outcomes["truncated" if payload.get("truncated") else "complete"] += 1
+
+    threads = [threading.Thread(target=light_client)]
+    threads += [threading.Thread(target=heavy_client, args=(i,)) for i in range(heavy_clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    result = {"light": percentiles(light)}
+    if heavy_clients:
+        result["heavy"] = percentiles(heavy)
+        result["heavy_outcomes"] = dict(outcomes)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    parser.add_argument("--heavy-clients", type=int, default=4, help="clients sending heavy conflict checks")
+    parser.add_argument("--selection-size", type=int, default=6)
+    parser.add_argument("--seconds", type=float, default=20, help="duration of each phase")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="modscout-load-") as data_dir:
+        from app import create_app
+
+        for key in [k for k in os.environ if k.startswith("SYSTEM_")]:
+            del os.environ[key]
+        os.environ.update(
+            {
+                "DATA_DIR": data_dir,
+                "SYSTEM_1_NAME": SYSTEM,
+                "UPDATE_SCHEDULE": os.environ.get("UPDATE_SCHEDULE", "sunday 03:00"),
+                "AUTO_UPDATE_DATABASE": "False",
+            }
+        )
+        app = create_app()
+        cfg = app.config["CUSTOM_CONFIG"]
+        spider = generate_from_args(args)
+        with open(os.path.join(data_dir, f"raw_{SYSTEM}.json"), "w") as f:
+            json.dump(spider, f)
+        with app.app_context():
+            from app.utils import process_data
+
+            process_data(SYSTEM)
+        catalog = cfg.catalog_cache.peek(SYSTEM).data
+
+        server, base = start_server(app)
+        urls = light_urls(base, sorted({entry["package"] for entry in spider}), 500, args.seed)
+        selections = heavy_selections(catalog, args.selection_size, args.seed)
+        # Let the suggestion processes load the catalog before measuring
+        request(f"{base}/module/conflict", {"system": SYSTEM, "selected": selections[0], "max_suggestions": 1})
+
+        results = {
+            "meta": {
+                "packages": args.packages,
+                "rows": catalog.row_count,
+                "suggest_workers": cfg.suggest_workers,
+                "suggest_timeout": cfg.suggest_timeout,
+                "conflict_concurrency": cfg.conflict_gate.limit,
+                "heavy_clients": args.heavy_clients,
+            },
+            "light_only": run_phase(base, urls, selections, 0, args.seconds),
+            "with_heavy": run_phase(base, urls, selections, args.heavy_clients, args.seconds),
+        }
+        server.shutdown()
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Synthetic Lmod spider output for benchmarks.
+
+Emits a JSON list shaped like `spider -o jsonSoftwarePage` as consumed by
+`process_package`: packages with versions, help text, parent chains
+(release, compiler, MPI/CUDA) and `provides` extensions. Output is fully
+determined by the arguments, so runs on different commits see the same data.
+
+    python -m benchmarks.spider_gen --packages 5000 > data/raw_bench.json
+"""
+import argparse
+import json
+import random
+import sys
+from typing import Dict, List
+
+WORDS = (
+    "library toolkit solver parallel distributed linear algebra sparse dense fast fourier transform "
+    "mesh finite element molecular dynamics quantum chemistry climate model io format compression "
+    "python bindings interface numerical optimization statistics visualization genomics alignment "
+    "GPU accelerated MPI OpenMP hybrid benchmark framework compiler runtime debugger profiler"
+).split()
+
+NAME_PARTS = (
+    "FFTW HDF5 netCDF Boost OpenBLAS ScaLAPACK PETSc SLEPc Trilinos GROMACS LAMMPS CP2K Quantum "
+    "ESPResSo Python R Julia numpy SciPy pandas matplotlib TensorFlow PyTorch CUDA cuDNN zlib bzip2 "
+    "xz libxml2 GSL METIS ParMETIS SuiteSparse Eigen GDAL PROJ VTK ParaView OpenFOAM WRF BLAST SAMtools"
+).split()
+
+
+def toolchains(n_releases: int, compilers_per_release: int) -> Dict[str, List[List[str]]]:
+    """Parent chains per release: Core, GCCcore, GCC, GCC+MPI and GCC+CUDA(+MPI)."""
+    chains: Dict[str, List[List[str]]] = {}
+    for r in range(n_releases):
+        release = f"release/{22 + r // 2}.{'04' if r % 2 == 0 else '10'}"
+        release_chains: List[List[str]] = [[]]
+        for c in range(compilers_per_release):
+            gcc = f"{11 + r // 2 + c}.{(r + c) % 4}.0"
+            mpi = f"4.1.{(r + c) % 7}"
+            cuda = f"12.{(r + c) % 5}"
+            release_chains += [
+                [f"GCCcore/{gcc}"],
+                [f"GCC/{gcc}"],
+                [f"GCC/{gcc}", f"OpenMPI/{mpi}"],
+                [f"GCC/{gcc}", f"CUDA/{cuda}"],
+                [f"GCC/{gcc}", f"CUDA/{cuda}", f"OpenMPI/{mpi}"],
+            ]
+        chains[release] = release_chains
+    return chains
+
+
+def generate(
+    packages: int = 2000,
+    max_versions: int = 4,
+    releases: int = 3,
+    compilers_per_release: int = 2,
+    max_placements: int = 3,
+    extension_ratio: float = 0.15,
+    max_extensions: int = 40,
+    help_words: int = 60,
+    seed: int = 1,
+) -> List[Dict]:
+    rnd = random.Random(seed)
+    chains = toolchains(releases, compilers_per_release)
+    release_names = list(chains)
+    spider = []
+    for p in range(packages):
+        name = NAME_PARTS[p % len(NAME_PARTS)] + ("" if p < len(NAME_PARTS) else f"-{p // len(NAME_PARTS)}")
+        versions = []
+        for _ in range(rnd.randint(1, max_versions)):
+            version_name = f"{rnd.randint(0, 9)}.{rnd.randint(0, 20)}.{rnd.randint(0, 5)}"
+            help_text = (
+                "Description =========== "
+                + " ".join(rnd.choice(WORDS) for _ in range(help_words))
+                + f"  More information ================ - Homepage: https://example.org/{name}"
+            )
+            version = {"versionName": version_name, "help": help_text, "parent": []}
+            for _ in range(rnd.randint(1, max_placements)):
+                release = rnd.choice(release_names)
+                version["parent"].append([release] + rnd.choice(chains[release]))
+            if rnd.random() < extension_ratio:
+                version["provides"] = [
+                    f"{rnd.choice(NAME_PARTS).lower()}-ext{rnd.randint(0, 500)}/{rnd.randint(0, 5)}.{rnd.randint(0, 9)}"
+                    for _ in range(rnd.randint(1, max_extensions))
+                ]
+            versions.append(version)
+        spider.append({"package": name, "url": f"https://example.org/{name}", "versions": versions})
+    return spider
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--packages", type=int, default=2000)
+    parser.add_argument("--max-versions", type=int, default=4)
+    parser.add_argument("--releases", type=int, default=3)
+    parser.add_argument("--compilers-per-release", type=int, default=2)
+    parser.add_argument("--max-placements", type=int, default=3)
+    parser.add_argument("--extension-ratio", type=float, default=0.15)
+    parser.add_argument("--max-extensions", type=int, default=40)
+    parser.add_argument("--help-words", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=1)
+
+
+def generate_from_args(args: argparse.Namespace) -> List[Dict]:
+    return generate(
+        packages=args.packages,
+        max_versions=args.max_versions,
+        releases=args.releases,
+        compilers_per_release=args.compilers_per_release,
+        max_placements=args.max_placements,
+        extension_ratio=args.extension_ratio,
+        max_extensions=args.max_extensions,
+        help_words=args.help_words,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    json.dump(generate_from_args(parser.parse_args()), sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Time to the first fast request after a worker restart.
+
+Publishes a synthetic catalog once, then starts fresh server processes on it,
+like gunicorn replacing a worker, in four modes: with and without the startup
+warm-up (WARMUP_ON_START) and with and without the index snapshot written
+next to each catalog version. Rounds of distinct search, typeahead and
+conflict requests are sent as soon as the server reports ready on
+`/status/ready`, as behind a load balancer probing readiness; without warm-up
+that is as soon as it listens. Reported per mode: when the server listened
+and became ready, the latency of the first request per route, and when a
+whole round first came back under `--fast-ms`, all in seconds since the
+process was started.
+
+    python -m benchmarks.startup --packages 5000
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.conflict_load import SYSTEM, request, start_server  # noqa: E402
+from benchmarks.spider_gen import add_arguments, generate_from_args  # noqa: E402
+
+MODES = (
+    ("warm+snapshot", True, True),
+    ("lazy+snapshot", False, True),
+    ("warm", True, False),
+    ("lazy", False, False),
+)
+
+
+def app_env(data_dir: str, warmup: bool) -> Dict[str, str]:
+    env = {k: v for k, v in os.environ.items() if not k.startswith("SYSTEM_")}
+    env.update(
+        {
+            "DATA_DIR": data_dir,
+            "SYSTEM_1_NAME": SYSTEM,
+            "UPDATE_SCHEDULE": os.environ.get("UPDATE_SCHEDULE", "sunday 03:00"),
+            "AUTO_UPDATE_DATABASE": "False",
+            "WARMUP_ON_START": str(warmup),
+        }
+    )
+    return env
+
+
+def serve():
+    """Child process: serve the app until stdin is closed."""
+    from app import create_app
+
+    server, base = start_server(create_app())
+    print(base, flush=True)
+    sys.stdin.read()
+    server.shutdown()
+
+
+def publish(args: argparse.Namespace, data_dir: str):
+    """Process the synthetic spider output into DATA_DIR, like an update would."""
+    from app import create_app
+
+    os.environ.update(app_env(data_dir, False))
+    app = create_app()
+    with open(os.path.join(data_dir, f"raw_{SYSTEM}.json"), "w") as f:
+        json.dump(generate_from_args(args), f)
+    with app.app_context():
+        from app.utils import process_data
+
+        process_data(SYSTEM)
+    return app.config["CUSTOM_CONFIG"].catalog_cache.peek(SYSTEM).data
+
+
+def request_rounds(catalog, n: int, seed: int) -> List[List]:
+    """`n` rounds of a search, a typeahead and a conflict request, none repeated."""
+    rnd = random.Random(seed)
+    releases = sorted(catalog)
+    rows_by_release: Dict[str, List[int]] = {}
+    for row in range(catalog.row_count):
+        if not catalog.row_flags[row] & 1:
+            rows_by_release.setdefault(catalog.strings[catalog.row_release[row]], []).append(row)
+    packages = sorted({record.package for record in catalog.records})
+    rounds = []
+    for i in range(n):
+        package = rnd.choice(packages)
+        a = catalog.entry(rnd.choice(rows_by_release[releases[0]]))
+        b = catalog.entry(rnd.choice(rows_by_release[releases[-1]]))
+        rounds.append(
+            [
+                ("search", "/module/search?" + urllib.parse.urlencode({"system": SYSTEM, "query": package}), None),
+                (
+                    "suggest",
+                    "/module/suggest?" + urllib.parse.urlencode({"system": SYSTEM, "query": package[: 2 + i % 3]}),
+                    None,
+                ),
+                ("conflict", "/module/conflict", {"system": SYSTEM, "selected": [a, b], "max_suggestions": 5 + i}),
+            ]
+        )
+    return rounds
+
+
+def run_mode(data_dir: str, warmup: bool, rounds: List[List], fast_ms: float, timeout: float) -> Dict:
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.startup", "--serve"],
+        cwd=ROOT,
+        env=app_env(data_dir, warmup),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+
+    def since_start() -> float:
+        return round(time.perf_counter() - started, 3)
+
+    try:
+        base = proc.stdout.readline().strip()
+        result: Dict = {"listening_s": since_start(), "ready_s": None, "first_request_ms": {}, "first_fast_s": None}
+        while since_start() < timeout:
+            status, ready, _ = request(f"{base}/status/ready")
+            if status == 200:
+                result["ready_s"] = since_start()
+                result["warmup"] = ready["systems"][SYSTEM]
+                break
+            time.sleep(0.02)
+        for requests in rounds:
+            if since_start() > timeout:
+                break
+            timings = {}
+            for route, path, body in requests:
+                _, _, ms = request(base + path, body)
+                timings[route] = round(ms, 3)
+                result["first_request_ms"].setdefault(route, timings[route])
+            if all(ms < fast_ms for ms in timings.values()):
+                result["first_fast_s"] = since_start()
+                break
+            time.sleep(0.01)
+        return result
+    finally:
+        proc.communicate("")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    parser.add_argument("--fast-ms", type=float, default=50, help="latency under which a request counts as fast")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds to wait for fast requests per mode")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve()
+        return
+
+    with tempfile.TemporaryDirectory(prefix="modscout-startup-") as data_dir:
+        catalog = publish(args, data_dir)
+        rounds = request_rounds(catalog, 2000, args.seed)
+        results = {"meta": {"packages": args.packages, "rows": catalog.row_count, "fast_ms": args.fast_ms}}
+        for name, warmup, snapshot in MODES:
+            if not snapshot:
+                for path in glob.glob(os.path.join(data_dir, "versions", SYSTEM, "*.index")):
+                    os.remove(path)
+            results[name] = run_mode(data_dir, warmup, rounds, args.fast_ms, args.timeout)
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
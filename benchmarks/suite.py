@@ -0,0 +1,301 @@
+"""Benchmark suite over synthetic spider data.
+
+Runs the real processing, search and conflict code on a generated catalog
+and writes the results as JSON:
+
+- processing: full build, unchanged rebuild and a rebuild with 1% of the
+  packages changed (`process_data`), in packages and rows per second
+- search: index build time and p50/p99 latency of `search()` per query shape
+  (`pkg`, `pkg/`, `pkg/ver`, multi-term, description words) per backend
+- suggest: typeahead index build time and latency per prefix length
+- conflict: latency of the conflict check plus suggestions per selection size
+- memory: peak RSS after each phase
+
+    python -m benchmarks.suite --packages 5000 --output bench-new.json
+    python -m benchmarks.suite --compare bench-old.json bench-new.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.spider_gen import add_arguments, generate_from_args  # noqa: E402
+
+SYSTEM = "bench"
+WORDS = ("parallel", "fourier", "linear algebra", "quantum", "gpu accelerated", "io format")
+
+
+def peak_rss_kb() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def latency(fn: Callable, inputs: List) -> Dict:
+    timings = []
+    for value in inputs:
+        started = time.perf_counter()
+        fn(value)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+
+    def percentile(p: float) -> float:
+        return round(timings[min(len(timings) - 1, int(p * len(timings)))], 3)
+
+    return {
+        "n": len(timings),
+        "mean_ms": round(sum(timings) / len(timings), 3),
+        "p50_ms": percentile(0.50),
+        "p99_ms": percentile(0.99),
+        "max_ms": round(timings[-1], 3),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def bench_processing(app, spider: List[Dict], data_dir: str) -> Dict:
+    from app.utils import process_data
+
+    raw_path = os.path.join(data_dir, f"raw_{SYSTEM}.json")
+    results = {}
+
+    def run(label: str):
+        with app.app_context():
+            started = time.perf_counter()
+            delta = process_data(SYSTEM)
+            elapsed = time.perf_counter() - started
+        snapshot = app.config["CUSTOM_CONFIG"].catalog_cache.peek(SYSTEM)
+        results[label] = {
+            "seconds": round(elapsed, 4),
+            "packages_per_s": round(len(spider) / elapsed, 1),
+            "rows_per_s": round(snapshot.data.row_count / elapsed, 1),
+            "packages_reprocessed": delta["packages_reprocessed"],
+        }
+
+    with open(raw_path, "w") as f:
+        json.dump(spider, f)
+    run("full")
+    run("unchanged")
+
+    rnd = random.Random(0)
+    for entry in rnd.sample(spider, max(1, len(spider) // 100)):
+        entry["versions"][0]["help"] += " patched"
+    with open(raw_path, "w") as f:
+        json.dump(spider, f)
+    run("one_percent_changed")
+
+    snapshot = app.config["CUSTOM_CONFIG"].catalog_cache.peek(SYSTEM)
+    results["rows"] = snapshot.data.row_count
+    results["records"] = len(snapshot.data.records)
+    return results
+
+
+def query_shapes(catalog, n: int, seed: int) -> Dict[str, List[str]]:
+    rnd = random.Random(seed)
+    records = [catalog.records[catalog.row_record[row]] for row in range(0, catalog.row_count, 7)]
+    records = [r for r in records if r.version]
+
+    def pick():
+        return rnd.choice(records)
+
+    return {
+        "pkg": [pick().package for _ in range(n)],
+        "pkg/": [f"{pick().package}/" for _ in range(n)],
+        "pkg/ver": [f"{r.package}/{r.version}" for r in (pick() for _ in range(n))],
+        "multi_term": [", ".join(pick().package for _ in range(3)) for _ in range(n)],
+        "description": [rnd.choice(WORDS) for _ in range(n)],
+    }
+
+
+def bench_search(app, backends: List[str], queries: int, seed: int) -> Dict:
+    from app.search_index import SearchIndex
+    from app.sqlite_store import SqliteSearchIndex, write_sqlite
+
+    snapshot = app.config["CUSTOM_CONFIG"].catalog_cache.peek(SYSTEM)
+    shapes = query_shapes(snapshot.data, queries, seed)
+    results = {}
+    for backend in backends:
+        started = time.perf_counter()
+        if backend == "sqlite":
+            path = snapshot.signature[0] + ".bench.sqlite3"
+            write_sqlite(snapshot.data, path)
+            index = SqliteSearchIndex(path, snapshot.data)
+        else:
+            index = SearchIndex(snapshot.data)
+        results[backend] = {"build_s": round(time.perf_counter() - started, 4)}
+        for shape, inputs in shapes.items():
+            results[backend][shape] = latency(index.search, inputs)
+    return results
+
+
+def bench_suggest(app, queries: int, seed: int) -> Dict:
+    from app.typeahead import SuggestIndex
+
+    snapshot = app.config["CUSTOM_CONFIG"].catalog_cache.peek(SYSTEM)
+    packages = [record.package for record in snapshot.data.records if record.version]
+    rnd = random.Random(seed)
+    started = time.perf_counter()
+    index = SuggestIndex(snapshot.data)
+    results = {"build_s": round(time.perf_counter() - started, 4), "completions": len(index)}
+    picks = [rnd.choice(packages) for _ in range(queries)]
+    for length in (1, 2, 4):
+        results[f"prefix{length}"] = latency(index.suggest, [p[:length] for p in picks])
+    results["pkg/"] = latency(index.suggest, [f"{p}/" for p in picks])
+    return results
+
+
+def bench_conflict(app, sizes: List[int], samples: int, seed: int) -> Dict:
+    from app.utils import find_conflict, get_compatibility_graph, get_suggestion_engine, suggestions
+
+    cfg = app.config["CUSTOM_CONFIG"]
+    snapshot = cfg.catalog_cache.peek(SYSTEM)
+    catalog = snapshot.data
+    rows = [row for row in range(catalog.row_count) if not catalog.row_flags[row] & 1]
+    rnd = random.Random(seed)
+    results = {}
+    with app.app_context():
+        graph = get_compatibility_graph(SYSTEM, snapshot)
+        engine = get_suggestion_engine(SYSTEM, snapshot)
+        for size in sizes:
+            selections = [[catalog.entry(row) for row in rnd.sample(rows, size)] for _ in range(samples)]
+            conflicts = sum(find_conflict(s, graph)[0] for s in selections)
+
+            def check(selected):
+                if find_conflict(selected, graph)[0]:
+                    suggestions(selected, engine, cfg.max_suggestions)
+
+            results[str(size)] = latency(check, selections)
+            results[str(size)]["conflict_ratio"] = round(conflicts / samples, 3)
+    return results
+
+
+def run_suite(args: argparse.Namespace, data_dir: str) -> Dict:
+    # Importing the app loads .env, the benchmark settings are applied afterwards
+    from app import create_app
+
+    for key in [k for k in os.environ if k.startswith("SYSTEM_")]:
+        del os.environ[key]
+    os.environ.update(
+        {
+            "DATA_DIR": data_dir,
+            "SYSTEM_1_NAME": SYSTEM,
+            "UPDATE_SCHEDULE": os.environ.get("UPDATE_SCHEDULE", "sunday 03:00"),
+            "AUTO_UPDATE_DATABASE": "False",
+            "CATALOG_BACKEND": "json",
+        }
+    )
+    app = create_app()
+    memory = {"start": peak_rss_kb()}
+
+    started = time.perf_counter()
+    spider = generate_from_args(args)
+    generate_s = round(time.perf_counter() - started, 4)
+
+    processing = bench_processing(app, spider, data_dir)
+    memory["processing"] = peak_rss_kb()
+    search = bench_search(app, args.backends, args.queries, args.seed)
+    memory["search"] = peak_rss_kb()
+    suggest = bench_suggest(app, args.queries, args.seed)
+    memory["suggest"] = peak_rss_kb()
+    conflict = bench_conflict(app, args.selection_sizes, args.samples, args.seed)
+    memory["conflict"] = peak_rss_kb()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "arguments": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "threshold", "min_ms")},
+            "generate_s": generate_s,
+        },
+        "processing": processing,
+        "search": search,
+        "suggest": suggest,
+        "conflict": conflict,
+        "memory": {"peak_rss_kb": memory},
+    }
+
+
+def flatten(results: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        if key == "meta":
+            continue
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(old_path: str, new_path: str, threshold: float, min_ms: float) -> int:
+    """Print old vs new for every metric; returns the number of regressions."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']}")
+    old_flat, new_flat = flatten(old), flatten(new)
+    regressions = 0
+    for name in sorted(old_flat.keys() & new_flat.keys()):
+        before, after = old_flat[name], new_flat[name]
+        ratio = after / before if before else float("inf") if after else 1.0
+        # Time and memory should go down, throughput up
+        lower_is_better = name.endswith(("_ms", "_s", "seconds", "_kb")) or ".peak_rss_kb." in name
+        higher_is_better = name.endswith("_per_s")
+        regressed = (lower_is_better and ratio > threshold) or (higher_is_better and ratio < 1 / threshold)
+        # Sub-millisecond timings are mostly noise
+        if name.endswith("_ms") and after - before < min_ms:
+            regressed = False
+        regressions += regressed
+        print(f"{'!' if regressed else ' '} {name:55} {before:>14} {after:>14} {ratio:8.2f}x")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    parser.add_argument("--queries", type=int, default=200, help="queries per search shape")
+    parser.add_argument("--samples", type=int, default=100, help="selections per conflict size")
+    parser.add_argument("--selection-sizes", type=int, nargs="+", default=[1, 2, 3, 4, 5])
+    parser.add_argument("--backends", nargs="+", choices=["json", "sqlite"], default=["json", "sqlite"])
+    parser.add_argument("--output", default=None, help="JSON file for the results (default: stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    parser.add_argument("--threshold", type=float, default=1.10, help="ratio reported as a regression")
+    parser.add_argument("--min-ms", type=float, default=0.05, help="smaller latency increases are ignored")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold, args.min_ms) else 0)
+
+    with tempfile.TemporaryDirectory(prefix="modscout-bench-") as data_dir:
+        results = run_suite(args, data_dir)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+        print(f"Results written to {args.output}")
+    else:
+        print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
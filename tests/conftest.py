@@ -0,0 +1,66 @@
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.spider_gen import generate  # noqa: E402
+
+SYSTEM = "test"
+
+
+def provider(package, version, provides, help_text):
+    chain = ["release/22.04", "GCC/11.0.0"]
+    versions = [{"versionName": version, "help": help_text, "parent": [chain], "provides": provides}]
+    return {"package": package, "url": f"https://example.org/{package}", "versions": versions}
+
+
+@pytest.fixture(scope="session")
+def spider():
+    """Synthetic spider output, plus an extension provided by two modules and one named like a module."""
+    return generate(packages=150, releases=2, extension_ratio=0.3, max_extensions=5, help_words=8, seed=3) + [
+        provider("Provider", "1.0", ["shared-ext/1.0"], "Description =========== first provider"),
+        provider("Bundle", "2.0", ["shared-ext/1.0", "Provider/1.0"], "Description =========== second provider"),
+    ]
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory, spider):
+    """An app serving one system, published from synthetic spider output without processes or threads."""
+    data_dir = str(tmp_path_factory.mktemp("data"))
+    for key in [k for k in os.environ if k.startswith("SYSTEM_")]:
+        del os.environ[key]
+    os.environ.update(
+        {
+            "DATA_DIR": data_dir,
+            "SYSTEM_1_NAME": SYSTEM,
+            "UPDATE_SCHEDULE": "sunday 03:00",
+            "AUTO_UPDATE_DATABASE": "False",
+            "WARMUP_ON_START": "False",
+            "PROCESS_WORKERS": "0",
+            "SUGGEST_WORKERS": "0",
+            "BATCH_WORKERS": "1",
+        }
+    )
+    from app import create_app
+    from app.utils import process_data
+
+    app = create_app()
+    with open(os.path.join(data_dir, f"raw_{SYSTEM}.json"), "w") as f:
+        json.dump(spider, f)
+    with app.app_context():
+        process_data(SYSTEM)
+    return app
+
+
+@pytest.fixture(scope="session")
+def catalog(app):
+    return app.config["CUSTOM_CONFIG"].catalog_cache.peek(SYSTEM).data
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
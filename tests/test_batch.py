@@ -0,0 +1,27 @@
+from tests.conftest import SYSTEM
+
+
+def modules_of_releases(catalog):
+    """A non-extension module of the oldest and of the newest release."""
+    releases = sorted(catalog)
+    first = {}
+    for row in range(catalog.row_count):
+        release = catalog.strings[catalog.row_release[row]]
+        if not catalog.row_flags[row] & 1:
+            first.setdefault(release, catalog.entry(row))
+    return first[releases[0]], first[releases[-1]]
+
+
+def test_conflict_batch_keeps_selection_order(client, catalog):
+    a, b = modules_of_releases(catalog)
+    singles = [
+        client.post("/module/conflict", json={"system": SYSTEM, "selected": selected}).get_json()
+        for selected in ([a, b], [b, a])
+    ]
+    assert singles[0]["conflict"] and singles[0]["conflicting"] != singles[1]["conflicting"]
+
+    batch = client.post(
+        "/module/conflict/batch", json={"system": SYSTEM, "selections": [[a, b], [b, a], [a, b]]}
+    ).get_json()
+    results = [item["result"] for item in batch["results"]]
+    assert results == [singles[0], singles[1], singles[0]]
@@ -0,0 +1,25 @@
+from tests.conftest import SYSTEM
+
+
+def validate(client, script):
+    return client.post("/module/validate", json={"system": SYSTEM, "script": script}).get_json()
+
+
+def statuses(body):
+    return [(module["token"], module["status"]) for line in body["lines"] for module in line["modules"]]
+
+
+def test_extension_is_not_an_error(client):
+    body = validate(client, "module load release/22.04 GCC/11.0.0 Provider/1.0\nmodule load shared-ext/1.0\n")
+    assert body["valid"] and body["errors"] == 0 and body["warnings"] == 1
+    assert statuses(body)[-1] == ("shared-ext/1.0", "extension")
+    providers = {provider["provided_by"] for provider in body["lines"][-1]["modules"][0]["alternatives"]}
+    assert providers == {"Provider/1.0", "Bundle/2.0"}
+    assert body["loaded"] == ["Provider/1.0"]
+
+
+def test_unknown_module_is_an_error(client):
+    body = validate(client, "module load release/22.04 GCC/11.0.0\nmodule load Provider/9.9 no-such-module\n")
+    assert not body["valid"] and body["errors"] == 2
+    assert statuses(body)[-2:] == [("Provider/9.9", "not_found"), ("no-such-module", "not_found")]
+    assert [module["name"] for module in body["lines"][-1]["modules"][0]["alternatives"]] == ["Provider/1.0"]
@@ -0,0 +1,28 @@
+import pytest
+
+BODIES = [b"", b"not json", b"[1, 2]", b'"text"', b'{"system": ["a"], "version": 1}']
+
+
+@pytest.mark.parametrize("body", BODIES)
+def test_rollback_rejects_invalid_bodies(client, body):
+    response = client.post("/module/rollback", data=body, content_type="application/json")
+    assert response.status_code == 400 and "error" in response.get_json()
+
+
+@pytest.mark.parametrize("path", ["/module/search/batch", "/module/conflict/batch", "/module/validate/batch"])
+@pytest.mark.parametrize("body", BODIES)
+def test_batch_rejects_invalid_bodies(client, path, body):
+    response = client.post(path, data=body, content_type="application/json")
+    assert response.status_code == 400 and "error" in response.get_json()
+
+
+def test_batch_item_with_invalid_system(client):
+    body = {"system": ["a"], "queries": ["fftw"], "selections": [[]], "scripts": [""]}
+    for path in ("/module/search/batch", "/module/conflict/batch", "/module/validate/batch"):
+        results = client.post(path, json=body).get_json()["results"]
+        assert results == [{"error": "Unknown system ['a']"}]
+
+
+def test_validate_with_invalid_system(client):
+    response = client.post("/module/validate", json={"system": ["a"], "script": ""})
+    assert response.status_code == 404 and "error" in response.get_json()
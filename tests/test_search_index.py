@@ -0,0 +1,115 @@
+import json
+
+import pytest
+
+from app.search_index import SearchIndex
+from app.suggestion_engine import version_matches
+from app.utils import search
+from tests.conftest import SYSTEM
+
+QUERIES = [
+    "fftw",
+    "FFTW",
+    "hdf5,boost",
+    "python, numpy ,scipy",
+    " gromacs ",
+    "  ,fftw,, ",
+    "fftw/3",
+    "fftw/",
+    "/1.",
+    "python-1/",
+    "hdf5/1.1,netcdf",
+    "linear algebra",
+    "fast  fourier",
+    "solver",
+    "a",
+    "py",
+    "x",
+    "1",
+    "/",
+    "-",
+    "ext",
+    "shared-ext",
+    "nothing-matches-this",
+]
+
+
+@pytest.fixture(scope="module")
+def index(catalog):
+    return SearchIndex(catalog)
+
+
+@pytest.fixture(scope="module")
+def tree(catalog):
+    return catalog.to_tree()
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_index_matches_linear_search(index, tree, query):
+    expected = search(tree, query)
+    actual = search(tree, query, index)
+    # Same releases, buckets and modules, in the same order
+    assert json.dumps(actual) == json.dumps(expected)
+
+
+def test_queries_cover_results(index, tree):
+    assert sum(bool(search(tree, query)) for query in QUERIES) > len(QUERIES) // 2
+
+
+def provider_keys(tree, term):
+    """(release, chain, module name) of the modules providing the extensions named by `term`."""
+    package, _, version = term.partition("/")
+    keys = set()
+    for release, compilers in tree.items():
+        for compiler, modules in compilers.items():
+            for module in modules:
+                if (
+                    module.get("is_extension")
+                    and module["package"].lower() == package
+                    and version_matches(module["version"], version or None)
+                ):
+                    keys.add((release, " ".join(compiler.split()[:-1]), module["parent"]))
+    return keys
+
+
+def search_with_providers(tree, query):
+    """The linear search, where a term naming an extension also matches the modules providing it."""
+    result = {}
+    for term in [q.strip().lower() for q in query.split(",") if q.strip()]:
+        matched = search(tree, term)
+        providers = provider_keys(tree, term)
+        for release, compilers in tree.items():
+            for compiler, modules in compilers.items():
+                for module in modules:
+                    if module in matched.get(release, {}).get(compiler, []) or (
+                        not module.get("is_extension") and (release, compiler, module["name"]) in providers
+                    ):
+                        bucket = result.setdefault(release, {}).setdefault(compiler, [])
+                        if module not in bucket:
+                            bucket.append(module)
+    return result
+
+
+def extension_queries(tree):
+    packages = sorted(
+        {
+            module["package"].lower()
+            for compilers in tree.values()
+            for modules in compilers.values()
+            for module in modules
+            if module.get("is_extension")
+        }
+    )
+    return packages[::7] + ["shared-ext", "shared-ext/1", "shared-ext/1.0", "shared-ext/2", "provider/1.0", "fftw,shared-ext"]
+
+
+def test_search_route_matches_linear_search_with_providers(client, tree):
+    # /module/search uses the index of get_search_index, which expands extensions to their providers
+    queries = extension_queries(tree) + QUERIES
+    expanded = 0
+    for query in queries:
+        body = client.get("/module/search", query_string={"system": SYSTEM, "query": query}).get_json()
+        expected = search_with_providers(tree, query)
+        assert json.dumps(body, sort_keys=True) == json.dumps(expected, sort_keys=True), query
+        expanded += expected != search(tree, query)
+    assert expanded
@@ -0,0 +1,29 @@
+from collections import defaultdict
+
+from tests.conftest import SYSTEM
+
+
+def test_description_of_duplicated_name(client, catalog):
+    # Names with more than one description, e.g. extensions provided by several modules
+    rows_by_name = defaultdict(list)
+    for row in range(catalog.row_count):
+        rows_by_name[catalog.records[catalog.row_record[row]].name].append(row)
+    duplicated = [
+        rows
+        for rows in rows_by_name.values()
+        if len({catalog.entry(row)["description"] for row in rows}) > 1
+    ]
+    assert duplicated
+
+    for rows in duplicated[:20]:
+        for row in rows:
+            entry = catalog.entry(row)
+            params = {"system": SYSTEM, "release": entry["release"], "compiler": entry["compiler"], "name": entry["name"]}
+            body = client.get("/module/description", query_string=params).get_json()
+            assert (body["description"], body["url"]) == (entry["description"], entry["url"])
+
+
+def test_description_of_unknown_bucket(client, catalog):
+    entry = catalog.entry(0)
+    params = {"system": SYSTEM, "release": entry["release"], "compiler": "nope", "name": entry["name"]}
+    assert client.get("/module/description", query_string=params).status_code == 404